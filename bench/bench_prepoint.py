@@ -0,0 +1,691 @@
+""" bench_prepoint.py
+    Throughput benchmarks for prepoint calculations.
+    Run from repo root:  python bench/bench_prepoint.py"""
+
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+import ephem
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'test'))
+import prepoint.util as u
+import prepoint.batch as b
+from prepoint.table import PointingTable
+import reference_parsers  # util's angle parsers before ANGLE_PATTERN (test/).
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+SEED = 2018
+IMPORT_BUDGET_MS = 50  # for each of LIGHT_MODULES (no ephem, tkinter or numpy), cold start.
+LIGHT_MODULES = ('prepoint.util', 'prepoint.moves', 'prepoint.__main__')
+
+
+def best_time(function, repeat=3):
+    """ Returns best wall-clock seconds of repeat calls of function(). """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def random_sky(n, seed=SEED):
+    """ Returns n random (longitude, latitude, ra, dec, datetime64) as numpy arrays,
+        uniform over the sphere and over 2000-2050. """
+    rng = np.random.default_rng(seed)
+    longitude = rng.uniform(-180, 180, n)
+    latitude = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    ra = rng.uniform(0, 360, n)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    seconds = rng.uniform(0, 50 * 365.25 * 86400, n)
+    times = np.datetime64('2000-01-01T00:00:00', 'us') + \
+        (seconds * 1e6).astype('timedelta64[us]')
+    return longitude, latitude, ra, dec, times
+
+
+def bench_calc_az_alt_array(n=10**6, n_scalar=20000):
+    """ calc_az_alt_array() vs. calc_az_alt() per position. """
+    longitude, latitude, ra, dec, times = random_sky(n)
+    datetimes = [t.astype(datetime).replace(tzinfo=timezone.utc) for t in times[:n_scalar]]
+    scalar_args = list(zip(longitude[:n_scalar].tolist(), latitude[:n_scalar].tolist(),
+                           ra[:n_scalar].tolist(), dec[:n_scalar].tolist(), datetimes))
+    scalar_seconds = best_time(lambda: [u.calc_az_alt(*args) for args in scalar_args], 1)
+    scalar_rate = n_scalar / scalar_seconds
+    print('calc_az_alt          {:12,.0f} positions/s'.format(scalar_rate))
+
+    seconds = best_time(lambda: b.calc_az_alt_array(longitude, latitude, ra, dec, times))
+    print('calc_az_alt_array    {:12,.0f} positions/s  ({:.0f}x)  all distinct sites & times'
+          .format(n / seconds, n / seconds / scalar_rate))
+    seconds = best_time(lambda: b.calc_az_alt_array(longitude[0], latitude[0], ra, dec,
+                                                    times[0]))
+    print('calc_az_alt_array    {:12,.0f} positions/s  ({:.0f}x)  one site, one time'
+          .format(n / seconds, n / seconds / scalar_rate))
+    grid_times = times[0] + np.arange(1000) * np.timedelta64(1, 's')
+    seconds = best_time(lambda: b.calc_az_alt_array(longitude[:1000, np.newaxis],
+                                                    latitude[:1000, np.newaxis],
+                                                    ra[0], dec[0], grid_times))
+    print('calc_az_alt_array    {:12,.0f} positions/s  ({:.0f}x)  1000 sites x 1000 times'
+          .format(10**6 / seconds, 10**6 / seconds / scalar_rate))
+    seconds = best_time(lambda: b.calc_az_alt_array(longitude, latitude, ra, dec, times,
+                                                    tier='fast'))
+    print('calc_az_alt_array    {:12,.0f} positions/s  ({:.0f}x)  all distinct, tier fast'
+          .format(n / seconds, n / seconds / scalar_rate))
+
+
+def _calc_az_alt_via_hex_strings(longitude, latitude, ra, dec, datetime_utc):
+    """ calc_az_alt() as it was before float-native ephem inputs, for comparison. """
+    obs = ephem.Observer()
+    obs.lon = u.degrees_as_hex(longitude)
+    obs.lat = u.degrees_as_hex(latitude)
+    obs.date = datetime_utc
+    target_ephem = ephem.FixedBody()
+    target_ephem._epoch = '2000'
+    target_ephem._ra = u.ra_as_hours(ra)
+    target_ephem._dec = u.degrees_as_hex(dec)
+    target_ephem.compute(obs)
+    return target_ephem.az * 180 / math.pi, target_ephem.alt * 180 / math.pi
+
+
+def bench_calc_az_alt_float_inputs(n=20000):
+    """ calc_az_alt() with float radians to ephem vs. with hex strings to ephem. """
+    longitude, latitude, ra, dec, times = random_sky(n)
+    datetimes = [t.astype(datetime).replace(tzinfo=timezone.utc) for t in times]
+    args = list(zip(longitude.tolist(), latitude.tolist(), ra.tolist(), dec.tolist(),
+                    datetimes))
+    string_seconds = best_time(lambda: [_calc_az_alt_via_hex_strings(*a) for a in args])
+    float_seconds = best_time(lambda: [u.calc_az_alt(*a) for a in args])
+    print('calc_az_alt via hex strings  {:7.2f} us/call'.format(1e6 * string_seconds / n))
+    print('calc_az_alt via float rad    {:7.2f} us/call  ({:.2f} us saved)'
+          .format(1e6 * float_seconds / n, 1e6 * (string_seconds - float_seconds) / n))
+    string_results = np.array([_calc_az_alt_via_hex_strings(*a) for a in args])
+    float_results = np.array([u.calc_az_alt(*a) for a in args])
+    d_az = (string_results[:, 0] - float_results[:, 0] + 180) % 360 - 180
+    d_az_sky = d_az * np.cos(np.radians(float_results[:, 1]))
+    d_alt = string_results[:, 1] - float_results[:, 1]
+    print('hex-string rounding error    max {:.4f}, rms {:.4f} arcsec (az on sky, alt)'
+          .format(3600 * np.hypot(d_az_sky, d_alt).max(),
+                  3600 * np.sqrt(np.mean(d_az_sky ** 2 + d_alt ** 2))))
+
+
+def bench_pointing_session(n=20000):
+    """ PointingSession vs. calc_az_alt() per update, as the app's callbacks use them. """
+    longitude, latitude, ra, dec = -106.5, 35.1, 100.0, 20.0
+    occ_time = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    image_times = [occ_time - timedelta(seconds=600 - i / 100) for i in range(n)]
+    plate_ra_decs = [(ra - 1 + i / n, dec + 1 - i / n) for i in range(n)]
+    session = u.PointingSession(longitude, latitude)
+    session.set_target(ra, dec, occ_time)
+
+    def report(label, calc_function, session_function):
+        calc_seconds = best_time(calc_function)
+        session_seconds = best_time(session_function)
+        print('{:28s} calc_az_alt {:7.2f} us/update   PointingSession {:7.2f} us/update'
+              .format(label, 1e6 * calc_seconds / n, 1e6 * session_seconds / n))
+
+    report('target, unchanged',
+           lambda: [u.calc_az_alt(longitude, latitude, ra, dec, occ_time) for _ in range(n)],
+           lambda: [session.target_az_alt() for _ in range(n)])
+    report('plate, new image time',
+           lambda: [u.calc_az_alt(longitude, latitude, ra, dec, t) for t in image_times],
+           lambda: [session.plate_az_alt(ra, dec, t) for t in image_times])
+    report('plate, new RA/Dec & time',
+           lambda: [u.calc_az_alt(longitude, latitude, r, d, t)
+                    for (r, d), t in zip(plate_ra_decs, image_times)],
+           lambda: [session.plate_az_alt(r, d, t)
+                    for (r, d), t in zip(plate_ra_decs, image_times)])
+
+
+def bench_pointing_table(hours=3, n_queries=20000):
+    """ PointingTable build time, lookup latency, and interpolation error
+        vs. direct calc_az_alt(). """
+    occ_time = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    start_time = occ_time - timedelta(hours=hours)
+    rng = np.random.default_rng(SEED)
+    query_times = [occ_time - timedelta(seconds=s)
+                   for s in rng.uniform(0, hours * 3600, n_queries)]
+    for latitude, dec in ((35.1, 20.0), (35.1, 80.0), (-30.0, -60.0)):
+        build_seconds = best_time(lambda: PointingTable(-106.5, latitude, 100.0, dec,
+                                                        start_time, occ_time))
+        table = PointingTable(-106.5, latitude, 100.0, dec, start_time, occ_time)
+        table_seconds = best_time(lambda: [table.az_alt(t) for t in query_times])
+        calc_seconds = best_time(lambda: [u.calc_az_alt(-106.5, latitude, 100.0, dec, t)
+                                          for t in query_times])
+        table_results = np.array([table.az_alt(t) for t in query_times])
+        calc_results = np.array([u.calc_az_alt(-106.5, latitude, 100.0, dec, t)
+                                 for t in query_times])
+        d_az = (table_results[:, 0] - calc_results[:, 0] + 180) % 360 - 180
+        d_az_sky = d_az * np.cos(np.radians(calc_results[:, 1]))
+        d_alt = table_results[:, 1] - calc_results[:, 1]
+        print('PointingTable lat {:5.1f} dec {:5.1f}: {:,} rows built in {:.1f} ms; '
+              'lookup {:.2f} us (calc_az_alt {:.2f} us); error vs calc_az_alt '
+              'max {:.3f}, rms {:.3f} arcsec'
+              .format(latitude, dec, len(table), 1e3 * build_seconds,
+                      1e6 * table_seconds / n_queries, 1e6 * calc_seconds / n_queries,
+                      3600 * np.hypot(d_az_sky, d_alt).max(),
+                      3600 * np.sqrt(np.mean(d_az_sky ** 2 + d_alt ** 2))))
+
+
+def bench_pointing_table_file(hours=12):
+    """ A night's pointing table: computed at startup vs. opened from a table file. """
+    import tempfile
+    occ_time = datetime(2018, 9, 1, 10, 0, tzinfo=timezone.utc)
+    start_time = occ_time - timedelta(hours=hours)
+    build_seconds = best_time(lambda: PointingTable(-105.5, 35.1, 188.7, 23.75,
+                                                    start_time, occ_time))
+    table = PointingTable(-105.5, 35.1, 188.7, 23.75, start_time, occ_time)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'night.table')
+        save_seconds = best_time(lambda: table.save(path))
+        load_seconds = best_time(lambda: PointingTable.load(path))
+        loaded = PointingTable.load(path)
+        t = start_time + timedelta(hours=hours / 2, seconds=0.3)
+        lookup_seconds = best_time(lambda: [loaded.az_alt(t) for _ in range(10000)]) / 10000
+        print('PointingTable {:,d} rows ({:.0f} kB file): build {:7.2f} ms, save {:6.2f} ms, '
+              'load {:6.3f} ms; lookup in loaded table {:5.2f} us'
+              .format(len(table), os.path.getsize(path) / 1024, build_seconds * 1000,
+                      save_seconds * 1000, load_seconds * 1000, lookup_seconds * 1e6))
+        del loaded
+
+
+def bench_az_alt_cache(n=20000):
+    """ AzAltCache hit and miss latency, vs. calc_az_alt(). """
+    t = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    ras = [100.0 + i / n for i in range(n)]
+    calc_seconds = best_time(lambda: [u.calc_az_alt(-106.5, 35.1, ra, 20.0, t)
+                                      for ra in ras])
+    cache = u.AzAltCache(max_size=n)
+    miss_seconds = best_time(lambda: [cache.az_alt(-106.5, 35.1, ra, 20.0, t)
+                                      for ra in ras], 1)
+    hit_seconds = best_time(lambda: [cache.az_alt(-106.5, 35.1, ra, 20.0, t)
+                                     for ra in ras])
+    print('AzAltCache: calc_az_alt {:.2f} us, miss {:.2f} us, hit {:.2f} us;  {}'
+          .format(1e6 * calc_seconds / n, 1e6 * miss_seconds / n, 1e6 * hit_seconds / n,
+                  cache.cache_info()))
+
+
+def catalog_angle_texts(n, seed=SEED):
+    """ Returns n (ra_text, dec_text) pairs as in target and site lists,
+        in hex with colons or spaces, or (dec only) decimal degrees. """
+    longitude, latitude, ra, dec, times = random_sky(n, seed)
+    ra_texts = [u.ra_as_hours(r) for r in ra.tolist()]
+    dec_texts = [u.degrees_as_hex(d, 1) for d in dec.tolist()]
+    ra_texts[1::2] = [text.replace(':', ' ') for text in ra_texts[1::2]]
+    dec_texts[1::3] = [text.replace(':', ' ') for text in dec_texts[1::3]]
+    dec_texts[2::3] = ['{:.5f}'.format(d) for d in dec[2::3].tolist()]
+    return ra_texts, dec_texts
+
+
+def bench_angle_parsers(n=10**6):
+    """ ra_as_degrees(), hex_degrees_as_degrees() vs. their parse_hex() versions. """
+    ra_texts, dec_texts = catalog_angle_texts(n)
+    for name, function, via_parse_hex, texts in (
+            ('ra_as_degrees', u.ra_as_degrees, reference_parsers.ra_as_degrees, ra_texts),
+            ('hex_degrees_as_degrees', u.hex_degrees_as_degrees,
+             reference_parsers.hex_degrees_as_degrees, dec_texts)):
+        parse_hex_seconds = best_time(lambda: [via_parse_hex(text) for text in texts])
+        seconds = best_time(lambda: [function(text) for text in texts])
+        print('{:24s} {:10,.0f} strings/s  (via parse_hex: {:10,.0f} strings/s)'
+              .format(name, n / seconds, n / parse_hex_seconds))
+
+
+def bench_angle_texts_as_degrees(n=10**6):
+    """ batch.angle_texts_as_degrees() on whole columns vs. the util functions per string. """
+    ra_texts, dec_texts = catalog_angle_texts(n)
+    for kind, function, texts in (('ra', u.ra_as_degrees, ra_texts),
+                                  ('dec', u.dec_as_degrees, dec_texts)):
+        column = np.array(texts)
+        scalar_seconds = best_time(lambda: [function(text) for text in texts], repeat=1)
+        seconds = best_time(lambda: b.angle_texts_as_degrees(column, kind))
+        print('angle_texts_as_degrees {:5s} {:12,.0f} rows/s  (util per string: {:10,.0f}/s)'
+              .format(kind, n / seconds, n / scalar_seconds))
+
+
+def bench_formatter_arrays(n=10**6):
+    """ batch formatter arrays vs. util formatters called per value. """
+    rng = np.random.default_rng(SEED)
+    angles = rng.uniform(0, 360, n)
+    times = np.datetime64('2018-09-01') + \
+        (rng.uniform(0, 1e8, n) * 1e6).astype('timedelta64[us]')
+    datetimes = times.astype(datetime).tolist()
+    for name, function, array_function, values, array_values in (
+            ('ra_as_hours', u.ra_as_hours, b.ra_as_hours_array, angles.tolist(), angles),
+            ('degrees_as_hex', u.degrees_as_hex, b.degrees_as_hex_array,
+             angles.tolist(), angles),
+            ('datetime_as_string', u.datetime_as_string, b.datetime_as_string_array,
+             datetimes, times)):
+        scalar_seconds = best_time(lambda: [function(value) for value in values], repeat=1)
+        seconds = best_time(lambda: array_function(array_values))
+        print('{:24s} {:12,.0f} values/s as array  (per value: {:10,.0f}/s)'
+              .format(name, n / seconds, n / scalar_seconds))
+
+
+def bench_compute_moves(n=10000, cold_starts=5):
+    """ Headless moves: CLI cold start (subprocess), and per-call latency of compute_moves(). """
+    import subprocess
+    from prepoint.moves import compute_moves
+    arguments = ['--longitude=-105:30:00', '--latitude=35:06:00', '--ra=12:34:48',
+                 '--dec=+23:45:00', '--occ-time=2018-09-01T04:30:00', '--plate-ra=12:30:00',
+                 '--plate-dec=+23:00:00', '--image-time=2018-09-01T03:58:12']
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    tk_check = 'import sys, prepoint.__main__; print("tkinter" in sys.modules)'
+    tk_imported = subprocess.run([sys.executable, '-c', tk_check], cwd=root,
+                                 capture_output=True, text=True).stdout.strip()
+    cold_seconds = best_time(lambda: subprocess.run([sys.executable, '-m', 'prepoint'] +
+                                                    arguments, cwd=root, check=True,
+                                                    capture_output=True), repeat=cold_starts)
+    print('python -m prepoint cold start {:8.1f} ms  (tkinter imported: {})'
+          .format(cold_seconds * 1000, tk_imported))
+
+    site, target = (-105.5, 35.1), (188.7, 23.75)
+    occ_time = datetime(2018, 9, 1, 4, 30, tzinfo=timezone.utc)
+    image_times = [occ_time - timedelta(seconds=i) for i in range(1, n + 1)]
+    session = u.PointingSession()
+    for name, session_or_none in (('new session each call', None),
+                                  ('one session', session)):
+        seconds = best_time(lambda: [compute_moves(site, target, occ_time, 187.5, 23.0,
+                                                   image_time, session_or_none)
+                                     for image_time in image_times])
+        print('compute_moves ({:21s}) {:8.1f} us/call'.format(name, seconds / n * 1e6))
+
+
+def bench_mount_fit(solution_counts=(1, 2, 12, 30, 100), n_repeats=500):
+    """ Least-squares mount model (zero points and base tilt) over N plate solutions. """
+    from prepoint.mount import MountModel, fit_mount_model, mount_to_sky
+    rng = np.random.default_rng(SEED)
+    mount = MountModel(12.0, -1.5, 1.2, -0.8, 0.0, 0)
+    for n in solution_counts:
+        mount_az, mount_alt = rng.uniform(0, 360, n), rng.uniform(15, 80, n)
+        sky_az, sky_alt = mount_to_sky(mount, mount_az, mount_alt)
+        sky_az, sky_alt = sky_az + rng.normal(0, 0.01, n), sky_alt + rng.normal(0, 0.01, n)
+        seconds = best_time(lambda: [fit_mount_model(mount_az, mount_alt, sky_az, sky_alt)
+                                     for _ in range(n_repeats)])
+        print('fit_mount_model {:4d} solutions  {:8.1f} us/fit'
+              .format(n, seconds / n_repeats * 1e6))
+
+
+def bench_pointing_service(client_counts=(1, 10, 50, 200), requests_per_client=100):
+    """ Synthetic load on the pointing service (python -m prepoint.service, in its own
+        process, on loopback): N clients at once, each sending a request and awaiting its
+        response, then the next (az_alt and moves requests, mixed). Client-side latency
+        percentiles, and the service's own report (latency, requests per batch). """
+    import asyncio
+    import json
+    import signal
+    import subprocess
+    rng = np.random.default_rng(SEED)
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    server = subprocess.Popen([sys.executable, '-m', 'prepoint.service', '--port', '0'],
+                              cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              text=True)
+    host, port = server.stdout.readline().split()[-1].rsplit(':', 1)
+
+    def random_request(i):
+        request = {'id': i, 'longitude': rng.uniform(-180, 180),
+                   'latitude': rng.uniform(-60, 60), 'ra': rng.uniform(0, 360),
+                   'dec': rng.uniform(-60, 60)}
+        if i % 2:
+            request.update(op='az_alt', time='2024-03-01T05:{:02d}:00'.format(i % 60))
+        else:
+            request.update(op='moves', occ_time='2024-03-01T05:30:00',
+                           image_time='2024-03-01T05:{:02d}:00'.format(i % 30),
+                           plate_ra=rng.uniform(0, 360), plate_dec=rng.uniform(-60, 60))
+        return (json.dumps(request) + '\n').encode()
+
+    async def client(requests, latencies):
+        reader, writer = await asyncio.open_connection(host, int(port))
+        for request in requests:
+            start = time.perf_counter_ns()
+            writer.write(request)
+            assert 'error' not in json.loads(await reader.readline())
+            latencies.append(time.perf_counter_ns() - start)
+        writer.close()
+        await writer.wait_closed()
+
+    async def load(n_clients):
+        requests = [[random_request(i) for i in range(requests_per_client)]
+                    for _ in range(n_clients)]
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(client(these, latencies) for these in requests))
+        return time.perf_counter() - start, np.array(latencies) / 1000.0
+
+    try:
+        asyncio.run(load(1))  # warm-up.
+        for n_clients in client_counts:
+            seconds, latencies = asyncio.run(load(n_clients))
+            p50, p99 = np.percentile(latencies, (50, 99))
+            print('pointing service {:4d} clients: {:8,.0f} requests/s  latency p50 {:8.1f} us'
+                  '  p99 {:8.1f} us'.format(n_clients, len(latencies) / seconds, p50, p99))
+    finally:
+        server.send_signal(signal.SIGINT)
+        print('service report (incl. warm-up):\n' + server.communicate(timeout=30)[1].strip())
+
+
+def bench_station_manager(station_counts=(1, 10, 50, 200), n_repeats=200):
+    """ Moves for N stations sharing one target, in one batched pass, vs. one station's
+        moves as computed today (compute_moves(), new session). """
+    from prepoint.moves import compute_moves
+    from prepoint.stations import StationManager
+    occ_time = datetime(2018, 9, 1, 4, 30, tzinfo=timezone.utc)
+    one_seconds = best_time(lambda: [compute_moves((-105.5, 35.1), (300.0, 30.0), occ_time,
+                                                   298.5, 29.0, occ_time - timedelta(hours=1))
+                                     for _ in range(n_repeats)]) / n_repeats
+    print('one station, compute_moves():      {:8.1f} us'.format(one_seconds * 1e6))
+    rng = np.random.default_rng(SEED)
+    for n_stations in station_counts:
+        manager = StationManager(300.0, 30.0, occ_time)  # high in the sky.
+        for i in range(n_stations):
+            name = 'scope {}'.format(i)
+            manager.add_station(name, -105.5 + rng.uniform(-1, 1), 35.1 + rng.uniform(-1, 1))
+            manager.set_plate_solution(name, 298.5 + rng.uniform(-2, 2),
+                                       29.0 + rng.uniform(-2, 2),
+                                       occ_time - timedelta(seconds=rng.uniform(60, 7200)))
+        seconds = best_time(lambda: [manager.compute_moves()
+                                     for _ in range(n_repeats)]) / n_repeats
+        print('{:4d} stations, one batched pass:  {:8.1f} us  ({:.1f}x one station)'
+              .format(n_stations, seconds * 1e6, seconds / one_seconds))
+
+
+def bench_plan_chords(site_counts=(1000, 10000, 100000)):
+    """ Target's az/alt at occ time and altitude flags, for candidate sites along a line. """
+    from prepoint.chords import plan_chords, polyline_sites
+    occ_time = datetime(2018, 9, 1, 4, 30, tzinfo=timezone.utc)
+    for n_sites in site_counts:
+        spacing_km = 600.0 / n_sites  # a 600 km line across the path.
+        seconds = best_time(lambda: plan_chords(*polyline_sites([-108.0, -105.0, -103.0],
+                                                                [33.0, 35.0, 35.0], spacing_km),
+                                                300.0, 30.0, occ_time))
+        print('plan_chords {:7,d} sites (incl. polyline) {:8.2f} ms'
+              .format(n_sites, seconds * 1000))
+
+
+def bench_screen_events(n_events=20000, n_stations=50, process_counts=(1, 2, 4, 8)):
+    """ Catalog screening, events x stations, by number of worker processes; vs. calc_az_alt
+        once per (event, site) pair. Scaling is limited by the cores actually present. """
+    from prepoint.catalog import Events, Stations, screen_events
+    rng = np.random.default_rng(SEED)
+    start = np.datetime64('2018-09-01T00:00:00', 'us')
+    seconds_into_month = rng.uniform(0, 30 * 86400, n_events)
+    events = Events(np.array(['event {}'.format(i) for i in range(n_events)]),
+                    rng.uniform(0, 360, n_events),
+                    np.degrees(np.arcsin(rng.uniform(-1, 1, n_events))),
+                    start + (seconds_into_month * 1e6).astype('timedelta64[us]'))
+    stations = Stations(np.array(['station {}'.format(i) for i in range(n_stations)]),
+                        rng.uniform(-125, -70, n_stations), rng.uniform(25, 50, n_stations))
+    n_pairs = n_events * n_stations
+    n_scalar = 2000
+    scalar_seconds = best_time(lambda: [u.calc_az_alt(stations.longitude[i % n_stations],
+                                                      stations.latitude[i % n_stations],
+                                                      events.ra[i], events.dec[i],
+                                                      events.occ_time[i].astype(datetime))
+                                        for i in range(n_scalar)], repeat=1) / n_scalar
+    print('screen {:,d} events x {} stations: calc_az_alt per pair {:10,.0f} pairs/s  '
+          '({} CPU cores here)'.format(n_events, n_stations, 1 / scalar_seconds, os.cpu_count()))
+    one_process_seconds = None
+    for processes in process_counts:
+        seconds = best_time(lambda: screen_events(events, stations, processes=processes,
+                                                  chunk_events=n_events // (4 * processes)),
+                            repeat=1)
+        one_process_seconds = one_process_seconds or seconds
+        print('    {} process(es): {:8.3f} s  {:12,.0f} pairs/s  speedup {:.2f}x'
+              .format(processes, seconds, n_pairs / seconds, one_process_seconds / seconds))
+
+
+def bench_timing_overhead(n=100000):
+    """ Cost of timing instrumentation per call of a wrapped function (when enabled; when
+        not, nothing is wrapped), and share of a typical util call. """
+    import types
+    import prepoint.timing as timing
+    module = types.ModuleType('bench_timed')
+    exec('def nothing():\n    pass\n', module.__dict__)
+    plain_seconds = best_time(lambda: [module.nothing() for _ in range(n)]) / n
+    plain_ra_seconds = best_time(lambda: [u.ra_as_degrees('12:34:56.7') for _ in range(n)]) / n
+    timings = timing.Timings()
+    timing.instrument_module(module, timings)
+    ra_as_degrees = timing.timed(u.ra_as_degrees, 'ra_as_degrees', timings)
+    timed_seconds = best_time(lambda: [module.nothing() for _ in range(n)]) / n
+    timed_ra_seconds = best_time(lambda: [ra_as_degrees('12:34:56.7') for _ in range(n)]) / n
+    print('timing overhead per wrapped call {:6.3f} us;  ra_as_degrees {:6.3f} -> {:6.3f} us '
+          '(+{:.0f}%)'.format((timed_seconds - plain_seconds) * 1e6, plain_ra_seconds * 1e6,
+                              timed_ra_seconds * 1e6,
+                              100 * (timed_ra_seconds / plain_ra_seconds - 1)))
+
+
+def bench_import_times(module_names=('prepoint.util', 'prepoint.moves', 'prepoint.__main__',
+                                     'prepoint.batch', 'ephem'), repeat=5):
+    """ Cumulative import time of each module in fresh interpreters, by python -X importtime
+        (best of repeat); the light modules' times are checked against IMPORT_BUDGET_MS. """
+    import subprocess
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    for module_name in module_names:
+        best_microseconds = None
+        for _ in range(repeat):
+            stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                                     'import ' + module_name], cwd=root, check=True,
+                                    capture_output=True, text=True).stderr
+            microseconds = [int(line.split('|')[1]) for line in stderr.splitlines()
+                            if line.split('|')[-1].strip() == module_name][0]
+            best_microseconds = min(microseconds, best_microseconds or microseconds)
+        milliseconds = best_microseconds / 1000
+        over = module_name in LIGHT_MODULES and milliseconds > IMPORT_BUDGET_MS
+        print('import {:20s} {:8.1f} ms{}'.format(module_name, milliseconds,
+                                                  '  OVER {} ms BUDGET'.format(IMPORT_BUDGET_MS)
+                                                  if over else ''))
+
+
+def bench_clipboard_reader(n=200):
+    """ Clipboard read through a new Tk root each time (old get_windows_clipboard()) vs.
+        through one kept root; and an unchanged-clipboard poll. Needs a display. """
+    import tkinter
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as e:
+        print('clipboard reader: skipped ({})'.format(e))
+        return
+    root.withdraw()
+    root.clipboard_clear()
+    root.clipboard_append('RA=12:30:00.0, Dec=+23:00:00 (J2000)')
+    root.update()
+
+    def read_via_new_root():
+        a = tkinter.Tk()
+        a.clipboard_get()
+        a.destroy()
+    n_new_roots = max(1, n // 20)
+    new_root_seconds = best_time(lambda: [read_via_new_root()
+                                          for _ in range(n_new_roots)]) / n_new_roots
+    reader = u.ClipboardReader(root)
+    read_seconds = best_time(lambda: [reader.read() for _ in range(n)]) / n
+    reader.new_text()
+    poll_seconds = best_time(lambda: [reader.new_text() for _ in range(n)]) / n
+    print('clipboard read: new Tk root {:8.2f} ms,  kept root {:8.3f} ms,  '
+          'unchanged poll {:8.3f} ms (cheap: {})'
+          .format(new_root_seconds * 1000, read_seconds * 1000, poll_seconds * 1000,
+                  reader.polls_cheaply))
+    root.destroy()
+
+
+def bench_plate_solution_watcher(n_files=1000, n_events=20):
+    """ Directory scan cost with many unchanged files, and latency from a new SharpCap
+        solution file being written to its being returned by poll() (as app polls). """
+    import tempfile
+    from prepoint.watch import PlateSolutionWatcher
+    text = ('RA=12:30:00.0, Dec=+23:00:00 (J2000)\nSolved using 48 stars\n'
+            'Image taken at 2018-09-01, 01 Sep 2018 03:{:02d}:{:02d} GMT\n'
+            'Orientation is 1.5 degrees W of North\n')
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(n_files):
+            with open(os.path.join(directory, 'old{}.txt'.format(i)), 'w') as f:
+                f.write(text.format(i // 60, i % 60))
+        watcher = PlateSolutionWatcher(directory=directory, poll_seconds=0.005)
+        watcher.ignore_current()
+        scan_seconds = best_time(watcher._texts_now)
+        watcher.start()
+        latencies = []
+        for i in range(n_events):
+            with open(os.path.join(directory, 'new{}.txt'.format(i)), 'w') as f:
+                f.write(text.format(59, i))
+            written = time.perf_counter()
+            while not watcher.poll():
+                time.sleep(0.001)
+            latencies.append(time.perf_counter() - written)
+        watcher.stop()
+    print('plate solution watcher: scan of {} unchanged files {:6.2f} ms; '
+          'new file -> poll() median {:6.1f} ms, max {:6.1f} ms'
+          .format(n_files, scan_seconds * 1000, np.median(latencies) * 1000,
+                  max(latencies) * 1000))
+
+
+def bench_iter_sharpcap_log(n_blocks=200000):
+    """ Streaming SharpCap log parser, in records/s, through mmap and as text stream;
+        and peak Python memory while streaming (independent of file size). """
+    import itertools
+    import tempfile
+    import tracemalloc
+    from prepoint.sharpcap import iter_sharpcap_log
+    rng = np.random.default_rng(SEED)
+    block = ('RA={:02d}:{:02d}:{:04.1f}, Dec=+23:00:00 (J2000)\nSolved using 48 stars\n'
+             'Image taken at 2018-09-01, 01 Sep 2018 03:{:02d}:{:02d} GMT\n'
+             'Orientation is {:.1f} degrees W of North\n\n')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sharpcap.log')
+        with open(path, 'w') as f:
+            for i in range(n_blocks):
+                f.write(block.format(int(rng.integers(24)), int(rng.integers(60)),
+                                     rng.uniform(0, 59.9), i // 60 % 60, i % 60,
+                                     rng.uniform(0, 180)))
+                if i % 1000 == 0:
+                    f.write('RA=malformed\n')
+        megabytes = os.path.getsize(path) / 1e6
+        for use_mmap in (True, False):
+            malformed = []
+            seconds = best_time(lambda: sum(1 for _ in iter_sharpcap_log(path, malformed,
+                                                                          use_mmap)),
+                                repeat=1)
+            print('iter_sharpcap_log (mmap={:5}) {:10,.0f} records/s  ({:.0f} MB, {} skipped)'
+                  .format(str(use_mmap), n_blocks / seconds, megabytes, len(malformed)))
+        for n_records in (n_blocks // 10, n_blocks):
+            tracemalloc.start()
+            for _ in itertools.islice(iter_sharpcap_log(path), n_records):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print('iter_sharpcap_log peak traced memory over {:9,d} records: {:6.1f} kB'
+                  .format(n_records, peak / 1000))
+
+
+def bench_typing(characters_per_second=8):
+    """ Entry callbacks, recomputes and label writes per second of typing into the app's
+        site, target and plate entries (debounced, incremental). Needs a display. """
+    import tkinter
+    try:
+        from prepoint.app import ApplicationPrePoint
+        app = ApplicationPrePoint()
+    except tkinter.TclError as e:
+        print('typing: skipped ({})'.format(e))
+        return
+    app.withdraw()
+    typed = (('longitude', '-105:30:00'), ('latitude', '35:06:00'), ('target_ra', '12:34:48'),
+             ('target_dec', '+23:45:00'), ('occ_time', '04:30:00'),
+             ('plate_ra', '12:30:00'), ('plate_dec', '+23:00:00'))
+    app.update()
+    app.ui_counters.reset()
+    for name, text in typed:
+        variable = getattr(app, name)
+        for i in range(1, len(text) + 1):
+            variable.set(text[:i])
+            deadline = time.perf_counter() + 1 / characters_per_second
+            while time.perf_counter() < deadline:
+                app.update()
+                time.sleep(0.002)
+    rates = app.ui_counters.rates()
+    app.destroy()
+    print('typing at {} chars/s: '.format(characters_per_second) +
+          ', '.join('{} {:.1f}/s'.format(name, rate) for name, rate in rates.items()))
+
+
+def bench_live_readout(hours=3, n_ticks=20000, refresh_hz=4):
+    """ CPU per tick of the live countdown & target-now readout (PointingTable lookup,
+        formatting, labels written only on change), as percent of one core at refresh_hz.
+        Through the app's own tick and Tk labels if there's a display, else on stand-in
+        labels (which leaves out the Tk label writes, about 1 per second). """
+    from prepoint.ui import UiCounters, countdown_text, live_readout, set_label_text
+    occ_time = datetime(2018, 9, 1, 4, 30, 0, tzinfo=timezone.utc)
+    start = occ_time - timedelta(hours=hours)
+    table = PointingTable(-105.5, 35.1, 188.7, 23.75, start, occ_time)
+    counters = UiCounters()
+    labels = [{'text': ''} for _ in range(3)]
+    tick_times = [start + timedelta(seconds=i / refresh_hz) for i in range(n_ticks)]
+
+    def tick(now):  # as ApplicationPrePoint._refresh_live_readout().
+        seconds_to_occ, (az_now, alt_now) = live_readout(table, now)
+        set_label_text(labels[0], countdown_text(seconds_to_occ), counters)
+        set_label_text(labels[1], '{:7.2f}'.format(az_now).strip() + u'\N{DEGREE SIGN}',
+                       counters)
+        set_label_text(labels[2], '{:7.2f}'.format(alt_now).strip() + u'\N{DEGREE SIGN}',
+                       counters)
+    cpu_start = time.process_time()
+    for now in tick_times:
+        tick(now)
+    tick_seconds = (time.process_time() - cpu_start) / n_ticks
+    print('live readout tick (stand-in labels): {:8.1f} us CPU = {:6.3f}% of a core at {} Hz,'
+          '  {:.2f} label writes/s'
+          .format(tick_seconds * 1e6, 100 * tick_seconds * refresh_hz, refresh_hz,
+                  counters.label_writes / (n_ticks / refresh_hz)))
+
+    import tkinter
+    try:
+        from prepoint.app import ApplicationPrePoint
+        app = ApplicationPrePoint()
+    except tkinter.TclError as e:
+        print('live readout tick (app): skipped ({})'.format(e))
+        return
+    app.withdraw()
+    app.pointing_table = PointingTable(-105.5, 35.1, 188.7, 23.75, datetime.now(timezone.utc),
+                                       datetime.now(timezone.utc) + timedelta(hours=hours))
+    n_app_ticks = max(1, n_ticks // 10)
+    cpu_start = time.process_time()
+    for _ in range(n_app_ticks):
+        app._refresh_live_readout()
+    app_tick_seconds = (time.process_time() - cpu_start) / n_app_ticks
+    seconds, cpu_start = 5.0, time.process_time()  # the app idling, ticks as scheduled.
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.update()
+        time.sleep(0.01)
+    idle_cpu = (time.process_time() - cpu_start) / seconds
+    app.destroy()
+    print('live readout tick (app): {:8.1f} us CPU;  app idle with readout live: {:6.3f}% '
+          'of a core'.format(app_tick_seconds * 1e6, 100 * idle_cpu))
+
+
+if __name__ == '__main__':
+    bench_calc_az_alt_array()
+    bench_calc_az_alt_float_inputs()
+    bench_pointing_session()
+    bench_pointing_table()
+    bench_pointing_table_file()
+    bench_az_alt_cache()
+    bench_angle_parsers()
+    bench_angle_texts_as_degrees()
+    bench_formatter_arrays()
+    bench_compute_moves()
+    bench_mount_fit()
+    bench_pointing_service()
+    bench_station_manager()
+    bench_plan_chords()
+    bench_screen_events()
+    bench_import_times()
+    bench_timing_overhead()
+    bench_clipboard_reader()
+    bench_plate_solution_watcher()
+    bench_iter_sharpcap_log()
+    bench_typing()
+    bench_live_readout()
@@ -0,0 +1,233 @@
+""" regress_prepoint.py
+    Performance-regression suite for prepoint.util and the move computation: fixed, seeded
+    datasets (sky positions, sites, times, synthetic SharpCap blocks); ops/s and per-call
+    latency percentiles for each function, compared against baselines kept in this repo.
+    Run from repo root:
+        python bench/regress_prepoint.py                  (compare; exit 1 on regression)
+        python bench/regress_prepoint.py --margin 0.40    (allow 40% slower)
+        python bench/regress_prepoint.py --update         (store new baselines)
+    Figures are scaled by a reference workload's speed in the same run, and a regression
+    must persist over repeated runs, so that a busy machine doesn't fail the suite.
+    Baselines are per machine: update them when moving the suite to other hardware."""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import prepoint.util as u
+from prepoint.moves import compute_moves, moves_from_az_alt
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+SEED = 2018
+N_CALLS = 2000  # per function per run; each dataset has this many distinct inputs.
+N_RUNS = 5  # rounds; best round (highest ops/s) is reported.
+DEFAULT_MARGIN = 0.25  # fail if ops/s falls, or p50 latency rises, by more than this.
+DEFAULT_ATTEMPTS = 3  # a regression must show in this many suite runs in a row to fail.
+MARGIN_ENVIRONMENT_VARIABLE = 'PREPOINT_BENCH_MARGIN'
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'regress_baselines.json')
+PERCENTILES = (50, 90, 99)
+LATENCY_BATCH_CALLS = 10  # latency is timed per batch of this many consecutive calls.
+
+
+def datasets(n=N_CALLS, seed=SEED):
+    """ Returns seeded inputs: dict of name -> list of argument tuples, one per call. """
+    rng = np.random.default_rng(seed)
+    longitude = rng.uniform(-180, 180, n)
+    latitude = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    ra = rng.uniform(0, 360, n)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    start = datetime(2018, 1, 1, tzinfo=timezone.utc).timestamp()
+    times = [datetime.fromtimestamp(start + seconds, tz=timezone.utc)
+             for seconds in rng.uniform(0, 10 * 365.25 * 86400, n)]
+    image_times = [datetime.fromtimestamp(t.timestamp() - seconds, tz=timezone.utc)
+                   for t, seconds in zip(times, rng.uniform(60, 7200, n))]
+    ra_texts = [u.ra_as_hours(value) for value in ra]
+    dec_texts = [u.degrees_as_hex(value) for value in dec]
+    sharpcap_texts = ['RA={}, Dec={} (J2000)\nSolved using {} stars\n'
+                      'Image taken at {:%Y-%m-%d, %d %b %Y %H:%M:%S} GMT\n'
+                      'Orientation is {:.1f} degrees {} of North\n'
+                      .format(ra_text, dec_text, stars, t, abs(rotation),
+                              'E' if rotation >= 0 else 'W')
+                      for ra_text, dec_text, stars, t, rotation
+                      in zip(ra_texts, dec_texts, rng.integers(10, 200, n), image_times,
+                             rng.uniform(-30, 30, n))]
+    plate_offsets = rng.uniform(-2, 2, (n, 2))
+    return {
+        'calc_az_alt': list(zip(longitude, latitude, ra, dec, times)),
+        'ra_as_degrees': [(text,) for text in ra_texts],
+        'dec_as_degrees': [(text,) for text in dec_texts],
+        'ra_as_hours': [(value,) for value in ra],
+        'degrees_as_hex': [(value,) for value in dec],
+        'parse_sharpcap_platesolution_text': [(text,) for text in sharpcap_texts],
+        'moves_from_az_alt': list(zip(*(rng.uniform(0, 360, n), rng.uniform(-5, 90, n),
+                                        rng.uniform(0, 360, n), rng.uniform(-5, 90, n)))),
+        'compute_moves': [((lon, lat), (r, d), t, (r + offset[0]) % 360,
+                           max(-90.0, min(90.0, d + offset[1])), image_t)
+                          for lon, lat, r, d, t, offset, image_t
+                          in zip(longitude, latitude, ra, dec, times, plate_offsets,
+                                 image_times)],
+    }
+
+
+FUNCTIONS = {'calc_az_alt': u.calc_az_alt, 'ra_as_degrees': u.ra_as_degrees,
+             'dec_as_degrees': u.dec_as_degrees, 'ra_as_hours': u.ra_as_hours,
+             'degrees_as_hex': u.degrees_as_hex,
+             'parse_sharpcap_platesolution_text': u.parse_sharpcap_platesolution_text,
+             'moves_from_az_alt': moves_from_az_alt, 'compute_moves': compute_moves}
+
+
+def reference_workload(n=2000):
+    """ Fixed pure-Python work (no prepoint code), timed alongside the suite so that results
+        can be scaled for how fast this machine happens to be running just now. """
+    values = [(i * 7919) % 1000 / 7.0 for i in range(n)]
+    return sorted(str(round(value, 3)) for value in values)
+
+
+def run_suite(n=N_CALLS, n_runs=N_RUNS):
+    """ Times every function over its seeded dataset, in n_runs rounds (each round runs all
+        functions, so that slow spells of a busy machine are spread over all of them).
+        Returns results: dict of function name -> ops/s (best round) and latency
+        percentiles in microseconds per call (over all rounds), each latency being the mean
+        over a batch of LATENCY_BATCH_CALLS consecutive calls (steadier than single calls
+        of a microsecond or less, whose timing would be mostly the clock's own); and
+        under 'reference', the same for reference_workload(). Garbage collection is off
+        while timing, as in timeit.
+    """
+    import gc
+    inputs = datasets(n)
+    inputs['reference'] = [()] * 20
+    functions = dict(FUNCTIONS, reference=reference_workload)
+    for name, function in functions.items():  # warm-up (caches, lazy imports).
+        for args in inputs[name]:
+            function(*args)
+    best_seconds = {name: float('inf') for name in functions}
+    latencies = {name: [] for name in functions}
+    clock = time.perf_counter_ns
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(n_runs):
+            for name, function in functions.items():
+                arguments = inputs[name]
+                start = time.perf_counter()
+                for args in arguments:
+                    function(*args)
+                best_seconds[name] = min(best_seconds[name], time.perf_counter() - start)
+                for i in range(0, len(arguments), LATENCY_BATCH_CALLS):
+                    batch = arguments[i:i + LATENCY_BATCH_CALLS]
+                    batch_start = clock()
+                    for args in batch:
+                        function(*args)
+                    latencies[name].append((clock() - batch_start) / len(batch))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    results = {}
+    for name in functions:
+        result = {'ops_per_second': len(inputs[name]) / best_seconds[name]}
+        for percentile, value in zip(PERCENTILES,
+                                     np.percentile(latencies[name], PERCENTILES) / 1000):
+            result['p{}_us'.format(percentile)] = float(value)
+        results[name] = result
+    return results
+
+
+def regressions(results, baselines, margin):
+    """ Returns descriptions of results worse than baselines by more than margin (fraction):
+        lower ops/s, or higher median latency, after scaling baselines by how the reference
+        workload's speed now compares with its speed when baselines were taken. Functions
+        without a baseline are skipped. """
+    speed = baselines['reference']['p50_us'] / results['reference']['p50_us']  # median: steady.
+    found = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if name == 'reference' or baseline is None:
+            continue
+        expected_ops_per_second = baseline['ops_per_second'] * speed
+        expected_p50_us = baseline['p50_us'] / speed
+        if result['ops_per_second'] < expected_ops_per_second * (1 - margin):
+            found.append('{}: {:,.0f} ops/s vs baseline {:,.0f} (scaled to machine speed)'
+                         .format(name, result['ops_per_second'], expected_ops_per_second))
+        if result['p50_us'] > expected_p50_us * (1 + margin):
+            found.append('{}: p50 {:.2f} us vs baseline {:.2f} us (scaled to machine speed)'
+                         .format(name, result['p50_us'], expected_p50_us))
+    return found
+
+
+def _best_results(results, other_results):
+    """ Returns, per function, the better of two results (each figure on its own). """
+    best = {}
+    for name, result in results.items():
+        other = other_results[name]
+        best[name] = {key: (max if key == 'ops_per_second' else min)(value, other[key])
+                      for key, value in result.items()}
+    return best
+
+
+def _median_results(all_results):
+    """ Returns, per function, the median of each figure over several suite runs. """
+    return {name: {key: float(np.median([results[name][key] for results in all_results]))
+                   for key in result}
+            for name, result in all_results[0].items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='prepoint performance-regression suite.')
+    parser.add_argument('--update', action='store_true',
+                        help='store results as new baselines instead of comparing')
+    parser.add_argument('--margin', type=float,
+                        default=float(os.environ.get(MARGIN_ENVIRONMENT_VARIABLE,
+                                                     DEFAULT_MARGIN)),
+                        help='allowed slowdown as a fraction (default {}, or ${})'
+                        .format(DEFAULT_MARGIN, MARGIN_ENVIRONMENT_VARIABLE))
+    parser.add_argument('--attempts', type=int, default=DEFAULT_ATTEMPTS,
+                        help='suite runs before a regression counts (best result is kept); '
+                             'with --update, runs whose median is stored')
+    parser.add_argument('--baselines', default=BASELINES_PATH, help='baselines JSON file')
+    args = parser.parse_args(argv)
+
+    baselines = None
+    if not args.update:
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+    if args.update:  # typical figures, not one lucky (or unlucky) run:
+        results = _median_results([run_suite() for _ in range(max(1, args.attempts))])
+    else:
+        results = run_suite()
+        for _ in range(args.attempts - 1):
+            if not regressions(results, baselines['results'], args.margin):
+                break
+            results = _best_results(results, run_suite())  # noise passes, regressions stay.
+    print('{:<36} {:>12} {:>9} {:>9} {:>9}'.format('function', 'ops/s', 'p50 us', 'p90 us',
+                                                   'p99 us'))
+    for name, result in results.items():
+        print('{:<36} {:>12,.0f} {:>9.2f} {:>9.2f} {:>9.2f}'
+              .format(name, result['ops_per_second'], result['p50_us'], result['p90_us'],
+                      result['p99_us']))
+    if args.update:
+        with open(args.baselines, 'w') as f:
+            json.dump({'machine': platform.platform(), 'processor': platform.machine(),
+                       'python': platform.python_version(), 'numpy': np.__version__,
+                       'results': results}, f, indent=2)
+            f.write('\n')
+        print('baselines written to ' + args.baselines)
+        return 0
+    found = regressions(results, baselines['results'], args.margin)
+    for description in found:
+        print('REGRESSION ' + description)
+    print('{} regression(s) beyond {:.0%} margin (baselines from {}, python {})'
+          .format(len(found), args.margin, baselines['machine'], baselines['python']))
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+""" __main__.py
+    Command-line entry point, for scope moves without the GUI (and without tkinter):
+        python -m prepoint --longitude=-105:30:00 --latitude=35:06:00
+                           --ra=12:34:56.7 --dec=+23:45:06 --occ-time=2018-09-01T04:30:00
+                           --plate-ra=12:30:00 --plate-dec=+23:00:00
+                           --image-time=2018-09-01T03:58:12
+    prints the moves as one JSON object. (Use "=" as shown, as negative hex values would
+    otherwise be taken for options.) With --stream, reads JSON objects from stdin, one per
+    line, any of the above as keys (longitude, ..., plate_ra, plate_dec, image_time) with
+    text or degrees as values, overriding the command line's; writes moves for each,
+    one JSON object per line. With --profile (or environment variable PREPOINT_PROFILE set),
+    writes per-function timing percentiles to stderr on exit.
+"""
+
+import argparse
+import json
+import sys
+
+import prepoint.timing as timing
+import prepoint.util as u
+from prepoint.moves import INPUT_KEYS, compute_moves, datetime_utc_from_input, \
+    degrees_from_input
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m prepoint',
+                                     description='Scope moves for occultation pre-pointing.')
+    parser.add_argument('--longitude', help='site longitude, hex or degrees, east=positive')
+    parser.add_argument('--latitude', help='site latitude, hex or degrees, north=positive')
+    parser.add_argument('--ra', help='target right ascension, hex hours')
+    parser.add_argument('--dec', help='target declination, hex or degrees')
+    parser.add_argument('--occ-time', dest='occ_time',
+                        help='occultation time UTC: ISO date-time, or hh:mm:ss for next one')
+    parser.add_argument('--plate-ra', dest='plate_ra',
+                        help='plate solution right ascension, hex hours')
+    parser.add_argument('--plate-dec', dest='plate_dec',
+                        help='plate solution declination, hex or degrees')
+    parser.add_argument('--image-time', dest='image_time', default='now',
+                        help='time image was taken, UTC: ISO date-time, hh:mm:ss, or now')
+    parser.add_argument('--stream', action='store_true',
+                        help='read inputs as JSON lines from stdin, write moves as JSON lines')
+    parser.add_argument('--profile', action='store_true',
+                        help='time calls, write percentiles per function to stderr on exit')
+    args = parser.parse_args(argv)
+    profiled = (u, sys.modules[__name__]), (u.PointingSession,)
+    if args.profile:
+        timing.enable(*profiled)
+    else:
+        timing.enable_from_environment(*profiled)
+    defaults = {key: getattr(args, key) for key in INPUT_KEYS}
+
+    if not args.stream:
+        try:
+            moves = _moves_for_inputs(defaults)
+        except ValueError as e:
+            parser.error(str(e))
+        print(json.dumps(moves))
+        return 0
+
+    session = u.PointingSession()  # reused: same site & target are computed only once.
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            inputs = dict(defaults)
+            inputs.update(json.loads(line))
+            result = _moves_for_inputs(inputs, session)
+        except (TypeError, ValueError) as e:  # incl. json.JSONDecodeError, line not an object.
+            result = {'error': str(e)}
+        sys.stdout.write(json.dumps(result) + '\n')
+        sys.stdout.flush()
+    return 0
+
+
+def _moves_for_inputs(inputs, session=None):
+    """ Returns moves as a dict ready for JSON, from inputs as texts (or numbers, as degrees).
+        Raises ValueError naming any input missing or not valid. """
+    for key in INPUT_KEYS:
+        if inputs.get(key) is None:
+            raise ValueError('missing ' + key)
+    site = (degrees_from_input(inputs, 'longitude', u.longitude_as_degrees),
+            degrees_from_input(inputs, 'latitude', u.latitude_as_degrees))
+    target = (degrees_from_input(inputs, 'ra', u.ra_as_degrees),
+              degrees_from_input(inputs, 'dec', u.dec_as_degrees))
+    plate_ra = degrees_from_input(inputs, 'plate_ra', u.ra_as_degrees)
+    plate_dec = degrees_from_input(inputs, 'plate_dec', u.dec_as_degrees)
+    occ_time = datetime_utc_from_input(inputs, 'occ_time')
+    image_time = datetime_utc_from_input(inputs, 'image_time')
+    moves = compute_moves(site, target, occ_time, plate_ra, plate_dec, image_time, session)
+    result = moves._asdict()
+    result.update(occ_time=occ_time.isoformat(), image_time=image_time.isoformat())
+    return result
+
+
+if __name__ == '__main__':
+    sys.exit(main())
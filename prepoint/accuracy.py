@@ -0,0 +1,251 @@
+""" accuracy.py
+    Accuracy-regression harness: any fast az/alt path (e.g., batch.calc_az_alt_array()'s
+    engine tiers) against util.calc_az_alt() (PyEphem, the reference) over a dense
+    full-sky grid of site latitudes, RA/Dec, hour angles and dates, including both poles,
+    the RA 0h/24h seam (from both sides) and the meridian. Reference values are computed
+    in a pool of worker processes; errors (angular separations, in arcseconds) are reduced
+    to max and percentile maps, written as columns. Run from repo root:
+        python -m prepoint.accuracy                       (all engines, ~1M points)
+        python -m prepoint.accuracy --engines standard --output maps.npz
+    Exits 1 if an engine's max error above the horizon exceeds its limit."""
+
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import functools
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+import prepoint.batch as b
+import prepoint.util as u
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+# Default grid, 19 x 19 x 74 x 5 x 8 = 1,068,560 points:
+GRID_LATITUDES = tuple(np.linspace(-90, 90, 19))  # degrees; 10-degree steps, both poles.
+GRID_DECS = tuple(np.linspace(-90, 90, 19))  # degrees; both celestial poles.
+GRID_HOUR_ANGLES = tuple(sorted(list(np.linspace(-180, 180, 72, endpoint=False)) +
+                                [-0.01, 0.01]))  # degrees; on and either side of meridian.
+GRID_RAS = (0.0, 1e-6, 90.0, 180.0, 360.0 - 1e-6)  # degrees; 0h/24h seam from both sides.
+GRID_DATES = tuple(datetime(2000 + 7 * i, 1 + 5 * i % 12, 1 + 3 * i, 3 * i % 24, 7 * i % 60,
+                            tzinfo=timezone.utc) for i in range(8))  # 2000-2049.
+GRID_AXES = ('date', 'ra', 'latitude', 'dec', 'hour_angle')  # order of grid's dimensions.
+ERROR_MAPS = (('latitude', 'dec'), ('latitude', 'hour_angle'), ('ra', 'date'))
+MAP_PERCENTILES = (50, 99)
+DEFAULT_MIN_ALTITUDE = 0.0  # degrees; points lower than this (by reference) aren't mapped.
+DEFAULT_CHUNK_POINTS = 50000  # points per chunk sent to a worker process.
+DEFAULT_OUTPUT_PATH = 'accuracy_maps.npz'
+ENGINES = {'standard': functools.partial(b.calc_az_alt_array, tier='standard'),
+           'fast': functools.partial(b.calc_az_alt_array, tier='fast')}
+ERROR_LIMITS_ARCSEC = {'standard': 3.6,  # 0.001 deg; well over its ~2 arcsec max error.
+                       'fast': 5400.0}  # 1.5 deg: unprecessed (0.7 deg by 2049) and
+                                        # unrefracted (0.5 deg at the horizon).
+
+SkyGrid = namedtuple('SkyGrid', ['axes', 'longitude', 'latitude', 'ra', 'dec',
+                                 'datetime_utc'])
+EngineErrors = namedtuple('EngineErrors', ['engine', 'seconds', 'errors_arcsec', 'mapped',
+                                           'maps'])
+
+
+def sky_grid(latitudes=GRID_LATITUDES, decs=GRID_DECS, hour_angles=GRID_HOUR_ANGLES,
+             ras=GRID_RAS, dates=GRID_DATES):
+    """ Returns every combination of the given values as a grid of points. Each point's
+        longitude is chosen to put the sky position at the given (mean, local) hour angle,
+        so that every latitude sees every Dec across the whole sky, meridian included.
+    :param latitudes: site latitudes, in degrees [sequence of floats].
+    :param decs: declinations, J2000, in degrees [sequence of floats].
+    :param hour_angles: hour angles, in degrees, west=positive [sequence of floats].
+    :param ras: right ascensions, J2000, in degrees [sequence of floats].
+    :param dates: dates and times, in UTC [sequence of datetime objects].
+    :return: grid [SkyGrid namedtuple: axes (dict of axis name -> numpy array of values,
+             keys as GRID_AXES, in order of the grid's dimensions), and longitude,
+             latitude, ra, dec (degrees) and datetime_utc (datetime64[us]), each a numpy
+             array shaped as the grid].
+    """
+    axes = {'date': np.array([b._naive_utc(date) for date in dates], dtype='datetime64[us]'),
+            'ra': np.asarray(ras, dtype=float), 'latitude': np.asarray(latitudes, dtype=float),
+            'dec': np.asarray(decs, dtype=float),
+            'hour_angle': np.asarray(hour_angles, dtype=float)}
+    date, ra, latitude, dec, hour_angle = np.meshgrid(*(axes[name] for name in GRID_AXES),
+                                                      indexing='ij')
+    gmst = np.degrees(b._gmst(b.days_since_j2000(date)))
+    longitude = (hour_angle + ra - gmst + 180.0) % 360.0 - 180.0
+    return SkyGrid(axes, longitude, latitude, ra, dec, date)
+
+
+def reference_az_alt(grid, processes=None, chunk_points=DEFAULT_CHUNK_POINTS):
+    """ Returns util.calc_az_alt() (PyEphem) at every grid point, computed in chunks in a
+        pool of worker processes.
+    :param grid: as from sky_grid() [SkyGrid namedtuple].
+    :param processes: worker processes, or None for one per CPU core; 1 computes in this
+           process, without a pool [int].
+    :param chunk_points: points per chunk [int].
+    :return: 2-tuple of azimuth, altitude in degrees [2-tuple of numpy arrays shaped as
+             the grid].
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    columns = [column.ravel() for column in (grid.longitude, grid.latitude, grid.ra,
+                                             grid.dec, grid.datetime_utc)]
+    chunks = [tuple(column[start:start + chunk_points] for column in columns)
+              for start in range(0, columns[0].size, max(1, chunk_points))]
+    if processes <= 1 or len(chunks) <= 1:
+        results = [_reference_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(processes, len(chunks))) as executor:
+            results = list(executor.map(_reference_chunk, chunks))
+    az_alt = np.concatenate(results) if results else np.zeros((0, 2))
+    return az_alt[:, 0].reshape(grid.ra.shape), az_alt[:, 1].reshape(grid.ra.shape)
+
+
+def angular_errors_arcsec(az, alt, reference_az, reference_alt):
+    """ Returns angular separations between two sets of az/alt (degrees), in arcseconds;
+        exact at small separations (atan2 form), and where azimuth is undefined. """
+    az, alt, reference_az, reference_alt = np.radians([az, alt, reference_az, reference_alt])
+    vectors = [np.stack([np.cos(this_alt) * np.cos(this_az),
+                         np.cos(this_alt) * np.sin(this_az), np.sin(this_alt)])
+               for this_az, this_alt in ((az, alt), (reference_az, reference_alt))]
+    cross = np.linalg.norm(np.cross(vectors[0], vectors[1], axis=0), axis=0)
+    dot = (vectors[0] * vectors[1]).sum(axis=0)
+    return np.degrees(np.arctan2(cross, dot)) * 3600.0
+
+
+def error_maps(errors_arcsec, mapped):
+    """ Returns, for each map of ERROR_MAPS (pair of grid axes), the max and percentile
+        errors over all other axes, of points mapped.
+    :param errors_arcsec: errors at grid points [numpy array shaped as the grid].
+    :param mapped: which points count [bool numpy array shaped as the grid].
+    :return: dict of map name (e.g., 'latitude_dec') -> dict of 'count', 'max_arcsec' and
+             'p50_arcsec' etc. (per MAP_PERCENTILES) -> numpy array shaped (len of first
+             axis, len of second axis); NaN where no point counts.
+    """
+    errors = np.where(mapped, errors_arcsec, np.nan)
+    maps = {}
+    for first, second in ERROR_MAPS:
+        kept = (GRID_AXES.index(first), GRID_AXES.index(second))
+        by_cell = np.moveaxis(errors, kept, (0, 1)).reshape(errors.shape[kept[0]],
+                                                            errors.shape[kept[1]], -1)
+        with warnings.catch_warnings():  # cells with no point mapped are NaN, as meant.
+            warnings.simplefilter('ignore', RuntimeWarning)
+            this_map = {'count': (~np.isnan(by_cell)).sum(axis=-1),
+                        'max_arcsec': np.nanmax(by_cell, axis=-1)}
+            for percentile, values in zip(MAP_PERCENTILES,
+                                          np.nanpercentile(by_cell, MAP_PERCENTILES, axis=-1)):
+                this_map['p{}_arcsec'.format(percentile)] = values
+        maps[first + '_' + second] = this_map
+    return maps
+
+
+def compare_engines(grid, engines, reference, min_altitude=DEFAULT_MIN_ALTITUDE):
+    """ Runs each engine over the whole grid at once, and maps its errors from reference.
+    :param grid: as from sky_grid() [SkyGrid namedtuple].
+    :param engines: dict of engine name -> function taking longitude, latitude, ra, dec,
+           datetime_utc arrays (as batch.calc_az_alt_array()) and returning az, alt
+           [dict, e.g., ENGINES].
+    :param reference: as from reference_az_alt() [2-tuple of numpy arrays].
+    :param min_altitude: lowest (reference) altitude of points mapped, in degrees [float].
+    :return: [list of EngineErrors namedtuples: engine (name), seconds (engine's run time),
+             errors_arcsec (shaped as grid), mapped (bool, shaped as grid), maps (as from
+             error_maps())].
+    """
+    reference_az, reference_alt = reference
+    mapped = reference_alt >= min_altitude
+    results = []
+    for name, engine in engines.items():
+        start = time.perf_counter()
+        az, alt = engine(grid.longitude, grid.latitude, grid.ra, grid.dec, grid.datetime_utc)
+        seconds = time.perf_counter() - start
+        errors = angular_errors_arcsec(az, alt, reference_az, reference_alt)
+        results.append(EngineErrors(name, seconds, errors, mapped,
+                                    error_maps(errors, mapped)))
+    return results
+
+
+def summary_text(grid, engine_errors):
+    """ Returns one text line per engine: speed, error percentiles over all points mapped,
+        and where the max error is. """
+    lines = ['{:<10} {:>10} {:>10} {:>10} {:>10} {:>10}   {}'
+             .format('engine', 'points/s', 'p50 "', 'p99 "', 'p99.9 "', 'max "',
+                     'worst point (lat, dec, hour angle, ra, date)')]
+    for result in engine_errors:
+        errors = result.errors_arcsec[result.mapped]
+        if errors.size == 0:
+            lines.append('{:<10} no points above min altitude'.format(result.engine))
+            continue
+        p50, p99, p999 = np.percentile(errors, (50, 99, 99.9))
+        worst = np.unravel_index(np.argmax(np.where(result.mapped, result.errors_arcsec,
+                                                    -1.0)), grid.ra.shape)
+        lines.append('{:<10} {:>10,.0f} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}   '
+                     '{:.1f}, {:.1f}, {:.2f}, {:.6f}, {}'
+                     .format(result.engine, grid.ra.size / result.seconds, p50, p99, p999,
+                             errors.max(), grid.latitude[worst], grid.dec[worst],
+                             grid.axes['hour_angle'][worst[GRID_AXES.index('hour_angle')]],
+                             grid.ra[worst], grid.datetime_utc[worst]))
+    return '\n'.join(lines)
+
+
+def write_error_maps(file_path, grid, engine_errors):
+    """ Writes error maps as columns (one named array each, numpy .npz format), readable by
+        numpy.load(): each grid axis as axis_<name>, and each map's figures as
+        <engine>_<map>_<figure>, e.g., fast_latitude_dec_max_arcsec.
+    :param file_path: path of file to write [string].
+    :param grid: as from sky_grid() [SkyGrid namedtuple].
+    :param engine_errors: as from compare_engines() [list of EngineErrors namedtuples].
+    """
+    columns = {'axis_' + name: values for name, values in grid.axes.items()}
+    for result in engine_errors:
+        for map_name, this_map in result.maps.items():
+            for figure, values in this_map.items():
+                columns['_'.join((result.engine, map_name, figure))] = values
+    with open(file_path, 'wb') as f:
+        np.savez(f, **columns)
+
+
+def _reference_chunk(chunk):
+    """ Worker: az, alt by util.calc_az_alt() of a chunk of points [numpy array (n, 2)]. """
+    longitude, latitude, ra, dec, datetime_utc = chunk
+    return np.array([u.calc_az_alt(*args) for args in
+                     zip(longitude.tolist(), latitude.tolist(), ra.tolist(), dec.tolist(),
+                         datetime_utc.tolist())], dtype=float).reshape(-1, 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='prepoint az/alt accuracy harness, '
+                                                 'engines vs PyEphem over the full sky.')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES),
+                        help='engines to compare (default all)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes for reference (default one per CPU core)')
+    parser.add_argument('--min-altitude', type=float, default=DEFAULT_MIN_ALTITUDE,
+                        help='lowest altitude mapped, degrees (default {})'
+                        .format(DEFAULT_MIN_ALTITUDE))
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH,
+                        help='error maps .npz file (default {})'.format(DEFAULT_OUTPUT_PATH))
+    args = parser.parse_args(argv)
+
+    grid = sky_grid()
+    start = time.perf_counter()
+    reference = reference_az_alt(grid, processes=args.processes)
+    reference_seconds = time.perf_counter() - start
+    print('{:,} points; reference (PyEphem) {:.1f} s with {} process(es)'
+          .format(grid.ra.size, reference_seconds, args.processes or os.cpu_count() or 1))
+    engine_errors = compare_engines(grid, {name: ENGINES[name] for name in args.engines},
+                                    reference, args.min_altitude)
+    print(summary_text(grid, engine_errors))
+    write_error_maps(args.output, grid, engine_errors)
+    print('error maps written to ' + args.output)
+    failed = [result.engine for result in engine_errors if result.mapped.any() and
+              result.errors_arcsec[result.mapped].max() > ERROR_LIMITS_ARCSEC[result.engine]]
+    for engine in failed:
+        print('ACCURACY REGRESSION {}: max error beyond {:.1f} arcsec'
+              .format(engine, ERROR_LIMITS_ARCSEC[engine]))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,20 @@
 """ app.py
     Entry point for prepoint application."""
 
+import os
 import tkinter as tk
 from tkinter import ttk
 from datetime import datetime, timezone
 
 # import prepoint.util as u
+import prepoint.batch as b
+import prepoint.timing as timing
 import prepoint.util as u
+from prepoint.mount import RefineSession
+from prepoint.table import PointingTable
+from prepoint.ui import Debouncer, FieldCache, UiCounters, countdown_text, live_readout, \
+    set_label_text, LIVE_REFRESH_MILLISECONDS
+from prepoint.watch import PlateSolutionWatcher
 
 __author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
 
@@ -22,6 +30,11 @@ WRONG_MARK = '\u2718'  # unicode 'heavy ballot X'
 CHECK_WRONG_MARK_FONT = ('consolas', 11)
 NO_DATA = '---'
 CAMERA_ROTATION_TOLERANCE = 1.0  # degrees
+CLIPBOARD_POLL_MILLISECONDS = 100  # new SharpCap plate solutions picked up within this,
+CLIPBOARD_TEXT_POLL_MILLISECONDS = 250  # ...or this, where each poll must read the text.
+SHARPCAP_DIRECTORY_ENVIRONMENT_VARIABLE = 'PREPOINT_SHARPCAP_DIRECTORY'  # watched if set.
+UI_COUNTERS_ENVIRONMENT_VARIABLE = 'PREPOINT_UI_COUNTERS'  # if set, print typing counts.
+UI_COUNTERS_REPORT_MILLISECONDS = 1000
 
 
 class ApplicationPrePoint(tk.Tk):
@@ -38,6 +51,19 @@ class ApplicationPrePoint(tk.Tk):
         self.image_datetime = None
         self.plate_ra_degrees = None
         self.plate_dec_degrees = None
+        self.mount_az_alt = None  # mount's own az, alt as read at image, if entered.
+        self.mount_entries_ok = True  # both blank, or both valid.
+        self.az_alt_cache = u.AzAltCache()  # counters readable by az_alt_cache.cache_info().
+        self.pointing_session = u.PointingSession(cache=self.az_alt_cache)
+        self.pointing_table = None  # target az/alt from now to occ time, once both locked.
+        self.refine_session = None  # every plate solution since site & target were locked.
+        self.clipboard_reader = u.ClipboardReader(self)  # reads through this app's own root.
+        self.ui_counters = UiCounters()
+        self.debouncer = Debouncer(self.after, self.after_cancel)  # entry updates, by area.
+        self.field_cache = FieldCache(self.ui_counters)  # entry texts parsed only if changed.
+        self.plate_solution_watcher = \
+            PlateSolutionWatcher(self.clipboard_reader,
+                                 os.environ.get(SHARPCAP_DIRECTORY_ENVIRONMENT_VARIABLE))
 
         # main_frame (fills entire application window):
         self.main_frame = tk.Frame(self)
@@ -74,7 +100,7 @@ class ApplicationPrePoint(tk.Tk):
         longitude_label = tk.Label(site_inner_frame, text='Long. ')
         longitude_label.grid(row=0, column=0, sticky='e')
         self.longitude = tk.StringVar()
-        self.longitude.trace('w', self._update_site_area)
+        self.longitude.trace('w', self._site_entry_changed)
         self.longitude_entry = ttk.Entry(site_inner_frame, width=22, justify=tk.LEFT,
                                          textvariable=self.longitude)
         self.longitude_entry.grid(row=0, column=1, sticky='ew')
@@ -87,7 +113,7 @@ class ApplicationPrePoint(tk.Tk):
         latitude_label = tk.Label(site_inner_frame, text='Lat. ')
         latitude_label.grid(row=1, column=0, sticky='e')
         self.latitude = tk.StringVar()
-        self.latitude.trace('w', self._update_site_area)
+        self.latitude.trace('w', self._site_entry_changed)
         self.latitude_entry = ttk.Entry(site_inner_frame, width=22, justify=tk.LEFT,
                                         textvariable=self.latitude)
         self.latitude_entry.grid(row=1, column=1, sticky='ew')
@@ -143,7 +169,7 @@ class ApplicationPrePoint(tk.Tk):
         target_ra_label = tk.Label(target_inner_frame, text='RA ')
         target_ra_label.grid(row=0, column=0, sticky='e')
         self.target_ra = tk.StringVar()
-        self.target_ra.trace('w', self._update_target_area)
+        self.target_ra.trace('w', self._target_entry_changed)
         self.target_ra_entry = ttk.Entry(target_inner_frame, width=22, justify=tk.LEFT,
                                          textvariable=self.target_ra)
         self.target_ra_entry.grid(row=0, column=1, sticky='ew')
@@ -155,7 +181,7 @@ class ApplicationPrePoint(tk.Tk):
         target_dec_label = tk.Label(target_inner_frame, text='Dec ')
         target_dec_label.grid(row=1, column=0, sticky='e')
         self.target_dec = tk.StringVar()
-        self.target_dec.trace('w', self._update_target_area)
+        self.target_dec.trace('w', self._target_entry_changed)
         self.target_dec_entry = ttk.Entry(target_inner_frame, width=22, justify=tk.LEFT,
                                           textvariable=self.target_dec)
         self.target_dec_entry.grid(row=1, column=1, sticky='ew')
@@ -169,7 +195,7 @@ class ApplicationPrePoint(tk.Tk):
         occ_time_label = tk.Label(target_inner_frame, text='occ UTC ')
         occ_time_label.grid(row=2, column=0, sticky='e')
         self.occ_time = tk.StringVar()
-        self.occ_time.trace('w', self._update_target_area)
+        self.occ_time.trace('w', self._target_entry_changed)
         self.occ_time_entry = ttk.Entry(target_inner_frame, width=18, justify=tk.LEFT,
                                         textvariable=self.occ_time)
         self.occ_time_entry.grid(row=2, column=1, sticky='e')
@@ -214,6 +240,21 @@ class ApplicationPrePoint(tk.Tk):
         self.target_readback_alt = tk.Label(target_readback_labelframe,
                                             text=NO_DATA, padx=2)
         self.target_readback_alt.grid(row=3, column=2, sticky='e')
+        target_readback_countdown_label = tk.Label(target_readback_labelframe,
+                                                   text='Occ in ')
+        target_readback_countdown_label.grid(row=4, column=0, sticky='e')
+        self.target_readback_countdown = tk.Label(target_readback_labelframe,
+                                                  text=NO_DATA, padx=2)
+        self.target_readback_countdown.grid(row=4, column=1, columnspan=2, sticky='e')
+        target_readback_az_alt_now_label = tk.Label(target_readback_labelframe,
+                                                    text='AZ  ALT now = ')
+        target_readback_az_alt_now_label.grid(row=5, column=0, sticky='e')
+        self.target_readback_az_now = tk.Label(target_readback_labelframe,
+                                               text=NO_DATA, padx=2)
+        self.target_readback_az_now.grid(row=5, column=1, sticky='e')
+        self.target_readback_alt_now = tk.Label(target_readback_labelframe,
+                                                text=NO_DATA, padx=2)
+        self.target_readback_alt_now.grid(row=5, column=2, sticky='e')
 
         target_lock_frame = tk.Frame(target_inner_frame)
         target_lock_frame.grid(row=4, column=0, columnspan=4, sticky='ew')
@@ -262,7 +303,7 @@ class ApplicationPrePoint(tk.Tk):
         plate_ra_label = tk.Label(taking_image_radec_frame, text='RA ')
         plate_ra_label.grid(row=0, column=0, sticky='e')
         self.plate_ra = tk.StringVar()
-        self.plate_ra.trace('w', self._update_plate_solution_area)
+        self.plate_ra.trace('w', self._plate_solution_entry_changed)
         plate_ra_entry = ttk.Entry(taking_image_radec_frame, width=24, justify=tk.LEFT,
                                    textvariable=self.plate_ra)
         plate_ra_entry.grid(row=0, column=1, sticky='ew')
@@ -276,7 +317,7 @@ class ApplicationPrePoint(tk.Tk):
         plate_dec_label = tk.Label(taking_image_radec_frame, text='Dec ')
         plate_dec_label.grid(row=1, column=0, sticky='e')
         self.plate_dec = tk.StringVar()
-        self.plate_dec.trace('w', self._update_plate_solution_area)
+        self.plate_dec.trace('w', self._plate_solution_entry_changed)
         plate_dec_entry = ttk.Entry(taking_image_radec_frame, width=24, justify=tk.LEFT,
                                     textvariable=self.plate_dec)
         plate_dec_entry.grid(row=1, column=1, sticky='ew')
@@ -287,6 +328,35 @@ class ApplicationPrePoint(tk.Tk):
                                          text=' ' + DEGREE_TEXT + '   +N  -S')
         plate_dec_units_label.grid(row=1, column=3, sticky='w')
 
+        # Populate rows 2 & 3 of subframe (mount's own az & alt, optional: as read, e.g.
+        # from setting circles, when image was taken; each read fits the mount model):
+        mount_az_label = tk.Label(taking_image_radec_frame, text='mount Az ')
+        mount_az_label.grid(row=2, column=0, sticky='e')
+        self.mount_az = tk.StringVar()
+        self.mount_az.trace('w', self._plate_solution_entry_changed)
+        mount_az_entry = ttk.Entry(taking_image_radec_frame, width=24, justify=tk.LEFT,
+                                   textvariable=self.mount_az)
+        mount_az_entry.grid(row=2, column=1, sticky='ew')
+        self.mount_az_ok_label = tk.Label(taking_image_radec_frame, text='',
+                                          font=CHECK_WRONG_MARK_FONT)
+        self.mount_az_ok_label.grid(row=2, column=2, sticky='ns')
+        mount_az_units_label = tk.Label(taking_image_radec_frame,
+                                        text=' ' + DEGREE_TEXT + '   (optional)')
+        mount_az_units_label.grid(row=2, column=3, sticky='w')
+        mount_alt_label = tk.Label(taking_image_radec_frame, text='mount Alt ')
+        mount_alt_label.grid(row=3, column=0, sticky='e')
+        self.mount_alt = tk.StringVar()
+        self.mount_alt.trace('w', self._plate_solution_entry_changed)
+        mount_alt_entry = ttk.Entry(taking_image_radec_frame, width=24, justify=tk.LEFT,
+                                    textvariable=self.mount_alt)
+        mount_alt_entry.grid(row=3, column=1, sticky='ew')
+        self.mount_alt_ok_label = tk.Label(taking_image_radec_frame, text='',
+                                           font=CHECK_WRONG_MARK_FONT)
+        self.mount_alt_ok_label.grid(row=3, column=2, sticky='ns')
+        mount_alt_units_label = tk.Label(taking_image_radec_frame,
+                                         text=' ' + DEGREE_TEXT + '   (optional)')
+        mount_alt_units_label.grid(row=3, column=3, sticky='w')
+
         # Populate row 2 (labelframe "readback"):
         plate_readback_labelframe = tk.LabelFrame(plate_solution_labelframe,
                                                   text=' readback ',
@@ -376,8 +446,56 @@ class ApplicationPrePoint(tk.Tk):
                                         text=NO_DATA, font=MOVE_SCOPE_FONT)
         self.up_down_degrees.grid(row=1, column=2, sticky='w')
 
+        # Watch for new SharpCap plate solutions (those already there aren't new):
+        self.plate_solution_watcher.ignore_current()
+        self.plate_solution_watcher.start()
+        self.clipboard_poll_milliseconds = CLIPBOARD_POLL_MILLISECONDS \
+            if self.clipboard_reader.polls_cheaply else CLIPBOARD_TEXT_POLL_MILLISECONDS
+        self.after(self.clipboard_poll_milliseconds, self._watch_plate_solutions)
+        if os.environ.get(UI_COUNTERS_ENVIRONMENT_VARIABLE):
+            self.after(UI_COUNTERS_REPORT_MILLISECONDS, self._report_ui_counters)
+        self.after(LIVE_REFRESH_MILLISECONDS, self._refresh_live_readout)
+
+    def _set_text(self, label, text):
+        set_label_text(label, text, self.ui_counters)
+
+    def _report_ui_counters(self):
+        """ Prints entry callbacks, recomputes and label writes per second of typing,
+            for each period with typing in it. """
+        self.after(UI_COUNTERS_REPORT_MILLISECONDS, self._report_ui_counters)
+        rates = self.ui_counters.rates()
+        if rates is not None:
+            print('per second of typing: ' + ', '.join('{} {:.1f}'.format(name, rate)
+                                                       for name, rate in rates.items()))
+            self.ui_counters.reset()
+
+    def _refresh_live_readout(self):
+        """ Refreshes countdown to occ time and target's az/alt now, from pointing table
+            (once site & target locked). Labels are written only when their text changes,
+            i.e., about once per second for the countdown. """
+        self.after(LIVE_REFRESH_MILLISECONDS, self._refresh_live_readout)
+        seconds_to_occ, az_alt_now = live_readout(self.pointing_table,
+                                                  datetime.now(timezone.utc))
+        if seconds_to_occ is None:
+            self._set_text(self.target_readback_countdown, NO_DATA)
+        else:
+            self._set_text(self.target_readback_countdown, countdown_text(seconds_to_occ))
+        if az_alt_now is None:
+            self._set_text(self.target_readback_az_now, NO_DATA)
+            self._set_text(self.target_readback_alt_now, NO_DATA)
+        else:
+            az_now, alt_now = az_alt_now
+            self._set_text(self.target_readback_az_now,
+                           '{:7.2f}'.format(az_now).strip() + DEGREE_SIGN)
+            self._set_text(self.target_readback_alt_now,
+                           '{:7.2f}'.format(alt_now).strip() + DEGREE_SIGN)
+
     # ============== SITE AREA =================
 
+    def _site_entry_changed(self, *keys):
+        self.ui_counters.callback()
+        self.debouncer.call(self._update_site_area)
+
     # noinspection DuplicatedCode
     def _update_site_area(self, *keys):  # as in 2018 code.
         # def _update_site_area(self):
@@ -387,28 +505,30 @@ class ApplicationPrePoint(tk.Tk):
             self.button_site_lock.state(["disabled"])
             self.button_site_unlock.state(['!disabled'])  # enabled
         else:
-            longitude_degrees = u.longitude_as_degrees(self.longitude.get())
-            latitude_degrees = u.latitude_as_degrees(self.latitude.get())
+            longitude_degrees = self.field_cache.parsed('longitude', self.longitude.get(),
+                                                        u.longitude_as_degrees)
+            latitude_degrees = self.field_cache.parsed('latitude', self.latitude.get(),
+                                                       u.latitude_as_degrees)
             if longitude_degrees is None:
-                self.longitude_ok_label['text'] = WRONG_MARK
-                self.site_readback_longitude_hex['text'] = NO_DATA
-                self.site_readback_longitude_decimal['text'] = NO_DATA
+                self._set_text(self.longitude_ok_label, WRONG_MARK)
+                self._set_text(self.site_readback_longitude_hex, NO_DATA)
+                self._set_text(self.site_readback_longitude_decimal, NO_DATA)
             else:
-                self.longitude_ok_label['text'] = CHECK_MARK
-                self.site_readback_longitude_hex['text'] = \
-                    u.degrees_as_hex(longitude_degrees)
-                self.site_readback_longitude_decimal['text'] = \
-                    '{:10.5f}'.format(longitude_degrees) + DEGREE_SIGN
+                self._set_text(self.longitude_ok_label, CHECK_MARK)
+                self._set_text(self.site_readback_longitude_hex,
+                               u.degrees_as_hex(longitude_degrees))
+                self._set_text(self.site_readback_longitude_decimal,
+                               '{:10.5f}'.format(longitude_degrees) + DEGREE_SIGN)
             if latitude_degrees is None:
-                self.latitude_ok_label['text'] = WRONG_MARK
-                self.site_readback_latitude_hex['text'] = NO_DATA
-                self.site_readback_latitude_decimal['text'] = NO_DATA
+                self._set_text(self.latitude_ok_label, WRONG_MARK)
+                self._set_text(self.site_readback_latitude_hex, NO_DATA)
+                self._set_text(self.site_readback_latitude_decimal, NO_DATA)
             else:
-                self.latitude_ok_label['text'] = CHECK_MARK
-                self.site_readback_latitude_hex['text'] = \
-                    u.degrees_as_hex(latitude_degrees)
-                self.site_readback_latitude_decimal['text'] = \
-                    '{:10.5f}'.format(latitude_degrees) + DEGREE_SIGN
+                self._set_text(self.latitude_ok_label, CHECK_MARK)
+                self._set_text(self.site_readback_latitude_hex,
+                               u.degrees_as_hex(latitude_degrees))
+                self._set_text(self.site_readback_latitude_decimal,
+                               '{:10.5f}'.format(latitude_degrees) + DEGREE_SIGN)
 
             if longitude_degrees is None or latitude_degrees is None:
                 # Can't use or lock Target data as entered.
@@ -425,13 +545,21 @@ class ApplicationPrePoint(tk.Tk):
 
     def site_lock_pressed(self):
         """ When the Lock button for Site area is pressed. """
+        self.debouncer.flush()  # may find text typed since Lock was enabled not valid:
+        longitude_degrees = u.longitude_as_degrees(self.longitude.get())
+        latitude_degrees = u.latitude_as_degrees(self.latitude.get())
+        if longitude_degrees is None or latitude_degrees is None:
+            return
         self.longitude_entry.state(["disabled"])
         self.latitude_entry.state(["disabled"])
-        self.locked_longitude_degrees = u.longitude_as_degrees(self.longitude.get())
-        self.locked_latitude_degrees = u.latitude_as_degrees(self.latitude.get())
+        self.locked_longitude_degrees = longitude_degrees
+        self.locked_latitude_degrees = latitude_degrees
+        self.pointing_session.set_site(self.locked_longitude_degrees,
+                                       self.locked_latitude_degrees)
         self.button_site_unlock.state(['!disabled'])  # enabled
         self.button_site_lock.state(['disabled'])  # disabled
         self.site_is_locked = True
+        self._update_pointing_table()
         self._update_calc_button()
 
     def _site_unlock_pressed(self):
@@ -441,11 +569,16 @@ class ApplicationPrePoint(tk.Tk):
         self.button_site_unlock.state(['disabled'])  # disabled
         self.button_site_lock.state(['!disabled'])  # enabled
         self.site_is_locked = False
+        self._update_pointing_table()
         self._update_calc_button()
         self._clear_move_data()
 
     # ============ TARGET_AREA ===============
 
+    def _target_entry_changed(self, *keys):
+        self.ui_counters.callback()
+        self.debouncer.call(self._update_target_area)
+
     # noinspection DuplicatedCode
     def _update_target_area(self, *keys):  # as in 2018 code.
         # def _update_target_area(self):
@@ -456,33 +589,37 @@ class ApplicationPrePoint(tk.Tk):
             self.button_target_lock.state(["disabled"])
             self.button_target_unlock.state(['!disabled'])  # enabled
         else:
-            ra_degrees = u.ra_as_degrees(self.target_ra.get())
-            dec_degrees = u.dec_as_degrees(self.target_dec.get())
+            ra_degrees = self.field_cache.parsed('target_ra', self.target_ra.get(),
+                                                 u.ra_as_degrees)
+            dec_degrees = self.field_cache.parsed('target_dec', self.target_dec.get(),
+                                                  u.dec_as_degrees)
+            # Not cached: the next such time depends on when parsed, as on Lock.
             occ_time = u.next_datetime_from_time_string(self.occ_time.get())
             if ra_degrees is None:
-                self.target_ra_ok_label['text'] = WRONG_MARK
-                self.target_readback_ra_hex['text'] = NO_DATA
-                self.target_readback_ra_decimal['text'] = NO_DATA
+                self._set_text(self.target_ra_ok_label, WRONG_MARK)
+                self._set_text(self.target_readback_ra_hex, NO_DATA)
+                self._set_text(self.target_readback_ra_decimal, NO_DATA)
             else:
-                self.target_ra_ok_label['text'] = CHECK_MARK
-                self.target_readback_ra_hex['text'] = u.ra_as_hours(ra_degrees)
-                self.target_readback_ra_decimal['text'] = \
-                    '{:10.5f}'.format(ra_degrees) + DEGREE_SIGN
+                self._set_text(self.target_ra_ok_label, CHECK_MARK)
+                self._set_text(self.target_readback_ra_hex, u.ra_as_hours(ra_degrees))
+                self._set_text(self.target_readback_ra_decimal,
+                               '{:10.5f}'.format(ra_degrees) + DEGREE_SIGN)
             if dec_degrees is None:
-                self.target_dec_ok_label['text'] = WRONG_MARK
-                self.target_readback_dec_hex['text'] = NO_DATA
-                self.target_readback_dec_decimal['text'] = NO_DATA
+                self._set_text(self.target_dec_ok_label, WRONG_MARK)
+                self._set_text(self.target_readback_dec_hex, NO_DATA)
+                self._set_text(self.target_readback_dec_decimal, NO_DATA)
             else:
-                self.target_dec_ok_label['text'] = CHECK_MARK
-                self.target_readback_dec_hex['text'] = u.degrees_as_hex(dec_degrees)
-                self.target_readback_dec_decimal['text'] = \
-                    '{:10.5f}'.format(dec_degrees) + DEGREE_SIGN
+                self._set_text(self.target_dec_ok_label, CHECK_MARK)
+                self._set_text(self.target_readback_dec_hex, u.degrees_as_hex(dec_degrees))
+                self._set_text(self.target_readback_dec_decimal,
+                               '{:10.5f}'.format(dec_degrees) + DEGREE_SIGN)
             if occ_time is None:
-                self.occ_time_ok_label['text'] = WRONG_MARK
-                self.target_readback_occ_time['text'] = NO_DATA
+                self._set_text(self.occ_time_ok_label, WRONG_MARK)
+                self._set_text(self.target_readback_occ_time, NO_DATA)
             else:
-                self.occ_time_ok_label['text'] = CHECK_MARK
-                self.target_readback_occ_time['text'] = u.datetime_as_string(occ_time)
+                self._set_text(self.occ_time_ok_label, CHECK_MARK)
+                self._set_text(self.target_readback_occ_time,
+                               u.datetime_as_string(occ_time))
 
             if ra_degrees is None or dec_degrees is None or occ_time is None:
                 # Can't use or lock Target data as entered.
@@ -501,27 +638,36 @@ class ApplicationPrePoint(tk.Tk):
 
             if ra_degrees is None or dec_degrees is None or occ_time is None \
                     or (not self.site_is_locked):
-                self.target_readback_az['text'] = NO_DATA
-                self.target_readback_alt['text'] = NO_DATA
+                self._set_text(self.target_readback_az, NO_DATA)
+                self._set_text(self.target_readback_alt, NO_DATA)
             else:
-                az_occ, alt_occ = u.calc_az_alt(self.locked_longitude_degrees,
-                                                self.locked_latitude_degrees,
-                                                ra_degrees, dec_degrees, occ_time)
-                self.target_readback_az['text'] = \
-                    '{:7.2f}'.format(az_occ).strip() + DEGREE_SIGN
-                self.target_readback_alt['text'] = \
-                    '{:7.2f}'.format(alt_occ).strip() + DEGREE_SIGN
+                self.pointing_session.set_target(ra_degrees, dec_degrees, occ_time)
+                az_occ, alt_occ = self.pointing_session.target_az_alt()
+                self._set_text(self.target_readback_az,
+                               '{:7.2f}'.format(az_occ).strip() + DEGREE_SIGN)
+                self._set_text(self.target_readback_alt,
+                               '{:7.2f}'.format(alt_occ).strip() + DEGREE_SIGN)
 
     def _target_lock_pressed(self):
+        self.debouncer.flush()  # may find text typed since Lock was enabled not valid:
+        ra_degrees = u.ra_as_degrees(self.target_ra.get())
+        dec_degrees = u.dec_as_degrees(self.target_dec.get())
+        occ_datetime = u.next_datetime_from_time_string(self.occ_time.get())
+        if ra_degrees is None or dec_degrees is None or occ_datetime is None:
+            return
         self.target_ra_entry.state(["disabled"])
         self.target_dec_entry.state(["disabled"])
         self.occ_time_entry.state(["disabled"])
-        self.locked_target_ra_degrees = u.ra_as_degrees(self.target_ra.get())
-        self.locked_target_dec_degrees = u.dec_as_degrees(self.target_dec.get())
-        self.locked_occ_datetime = u.next_datetime_from_time_string(self.occ_time.get())
+        self.locked_target_ra_degrees = ra_degrees
+        self.locked_target_dec_degrees = dec_degrees
+        self.locked_occ_datetime = occ_datetime
+        self.pointing_session.set_target(self.locked_target_ra_degrees,
+                                         self.locked_target_dec_degrees,
+                                         self.locked_occ_datetime)
         self.button_target_unlock.state(['!disabled'])  # enabled
         self.button_target_lock.state(['disabled'])  # disabled
         self.target_is_locked = True
+        self._update_pointing_table()
         self._update_calc_button()
 
     def _target_unlock_pressed(self):
@@ -531,6 +677,7 @@ class ApplicationPrePoint(tk.Tk):
         self.button_target_unlock.state(['disabled'])  # disabled
         self.button_target_lock.state(['!disabled'])  # enabled
         self.target_is_locked = False
+        self._update_pointing_table()
         self._update_calc_button()
         self._clear_move_data()
 
@@ -543,124 +690,164 @@ class ApplicationPrePoint(tk.Tk):
         self._update_calc_button()
         self._clear_move_data()
 
+    def _plate_solution_entry_changed(self, *keys):
+        self.ui_counters.callback()
+        self.debouncer.call(self._update_plate_solution_area)
+
     # noinspection DuplicatedCode
     def _update_plate_solution_area(self, *keys):  # as in 2018 code.
         # def _update_plate_solution_area(self):
-        ra_degrees = u.ra_as_degrees(self.plate_ra.get())
-        dec_degrees = u.dec_as_degrees(self.plate_dec.get())
+        ra_degrees = self.field_cache.parsed('plate_ra', self.plate_ra.get(), u.ra_as_degrees)
+        dec_degrees = self.field_cache.parsed('plate_dec', self.plate_dec.get(),
+                                              u.dec_as_degrees)
         if ra_degrees is None:
-            self.plate_ra_ok_label['text'] = WRONG_MARK
-            self.plate_readback_ra_hex['text'] = NO_DATA
-            self.plate_readback_ra_decimal['text'] = NO_DATA
+            self._set_text(self.plate_ra_ok_label, WRONG_MARK)
+            self._set_text(self.plate_readback_ra_hex, NO_DATA)
+            self._set_text(self.plate_readback_ra_decimal, NO_DATA)
         else:
-            self.plate_ra_ok_label['text'] = CHECK_MARK
-            self.plate_readback_ra_hex['text'] = u.ra_as_hours(ra_degrees)
-            self.plate_readback_ra_decimal['text'] = \
-                '{:10.5f}'.format(ra_degrees) + DEGREE_SIGN
+            self._set_text(self.plate_ra_ok_label, CHECK_MARK)
+            self._set_text(self.plate_readback_ra_hex, u.ra_as_hours(ra_degrees))
+            self._set_text(self.plate_readback_ra_decimal,
+                           '{:10.5f}'.format(ra_degrees) + DEGREE_SIGN)
         if dec_degrees is None:
-            self.plate_dec_ok_label['text'] = WRONG_MARK
-            self.plate_readback_dec_hex['text'] = NO_DATA
-            self.plate_readback_dec_decimal['text'] = NO_DATA
+            self._set_text(self.plate_dec_ok_label, WRONG_MARK)
+            self._set_text(self.plate_readback_dec_hex, NO_DATA)
+            self._set_text(self.plate_readback_dec_decimal, NO_DATA)
         else:
-            self.plate_dec_ok_label['text'] = CHECK_MARK
-            self.plate_readback_dec_hex['text'] = \
-                u.degrees_as_hex(dec_degrees)
-            self.plate_readback_dec_decimal['text'] = \
-                '{:10.5f}'.format(dec_degrees) + DEGREE_SIGN
+            self._set_text(self.plate_dec_ok_label, CHECK_MARK)
+            self._set_text(self.plate_readback_dec_hex, u.degrees_as_hex(dec_degrees))
+            self._set_text(self.plate_readback_dec_decimal,
+                           '{:10.5f}'.format(dec_degrees) + DEGREE_SIGN)
         self.plate_ra_degrees = ra_degrees
         self.plate_dec_degrees = dec_degrees
+
+        # Mount's own az/alt, if read (blank entries: not read, so no mark):
+        mount_az_text, mount_alt_text = self.mount_az.get(), self.mount_alt.get()
+        mount_az = self.field_cache.parsed('mount_az', mount_az_text, u.az_as_degrees)
+        mount_alt = self.field_cache.parsed('mount_alt', mount_alt_text, u.alt_as_degrees)
+        for text, degrees, ok_label in ((mount_az_text, mount_az, self.mount_az_ok_label),
+                                        (mount_alt_text, mount_alt, self.mount_alt_ok_label)):
+            if not text.strip():
+                self._set_text(ok_label, '')
+            else:
+                self._set_text(ok_label, WRONG_MARK if degrees is None else CHECK_MARK)
+        both_blank = not mount_az_text.strip() and not mount_alt_text.strip()
+        both_valid = mount_az is not None and mount_alt is not None
+        self.mount_az_alt = (mount_az, mount_alt) if both_valid else None
+        self.mount_entries_ok = both_blank or both_valid
         self._update_calc_button()
         self._clear_move_data()
 
     def _calc_and_display_moves(self):
         """  The computational engine of this app."""
-        az_now, alt_now = u.calc_az_alt(self.locked_longitude_degrees,
-                                        self.locked_latitude_degrees,
-                                        self.plate_ra_degrees, self.plate_dec_degrees,
-                                        self.image_datetime)
-        az_occ, alt_occ = u.calc_az_alt(self.locked_longitude_degrees,
-                                        self.locked_latitude_degrees,
-                                        self.locked_target_ra_degrees,
-                                        self.locked_target_dec_degrees,
-                                        self.locked_occ_datetime)
-        # Cast into range [-180, +180]:
-        if az_occ < az_now - 180:
-            az_rightward = az_occ - az_now + 360
-        else:
-            az_rightward = az_occ - az_now
-        if az_rightward == 0:
-            self.left_right_label['text'] = '(ok now)'
-            self.left_right_distance_label['text'] = NO_DATA
-            self.left_right_degrees['text'] = NO_DATA
-        elif az_rightward < 0:
-            self.left_right_label['text'] = 'LEFT'
-            self.left_right_distance_label['text'] = \
-                '{:10.2f}'.format(abs(az_rightward)).strip()
-            self.left_right_degrees['text'] = ' ' + DEGREE_TEXT
+        self.debouncer.flush()  # plate solution entries as typed so far, perhaps not valid:
+        if not self._ready_to_calc():
+            return
+        # Moves allow for mount's zero points and base tilt, as fitted to every plate
+        # solution entered with the mount's own az/alt since site & target were locked;
+        # without that az/alt, just the plain move from this plate solution:
+        self.refine_session.add_plate_solution(self.plate_ra_degrees, self.plate_dec_degrees,
+                                               self.image_datetime,
+                                               *(self.mount_az_alt or (None, None)))
+        moves = self.refine_session.compute_moves()
+        self._set_text(self.left_right_label, moves.left_right)
+        if moves.az_rightward == 0:
+            self._set_text(self.left_right_distance_label, NO_DATA)
+            self._set_text(self.left_right_degrees, NO_DATA)
         else:
-            self.left_right_label['text'] = 'RIGHT'
-            self.left_right_distance_label['text'] = \
-                '{:10.2f}'.format(abs(az_rightward)).strip()
-            self.left_right_degrees['text'] = ' ' + DEGREE_TEXT
-
-        alt_upward = alt_occ - alt_now
-        if alt_upward == 0:
-            self.up_down_label['text'] = '(ok now)'
-            self.up_down_distance_label['text'] = NO_DATA
-            self.up_down_degrees['text'] = NO_DATA
-        elif alt_upward < 0:
-            self.up_down_label['text'] = 'LOWER'
-            self.up_down_distance_label['text'] = \
-                '{:10.2f}'.format(abs(alt_upward)).strip()
-            self.up_down_degrees['text'] = ' ' + DEGREE_TEXT
+            self._set_text(self.left_right_distance_label,
+                           '{:10.2f}'.format(abs(moves.az_rightward)).strip())
+            self._set_text(self.left_right_degrees, ' ' + DEGREE_TEXT)
+
+        self._set_text(self.up_down_label, moves.up_down)
+        if moves.alt_upward == 0:
+            self._set_text(self.up_down_distance_label, NO_DATA)
+            self._set_text(self.up_down_degrees, NO_DATA)
         else:
-            self.up_down_label['text'] = 'RAISE'
-            self.up_down_distance_label['text'] = \
-                '{:10.2f}'.format(abs(alt_upward)).strip()
-            self.up_down_degrees['text'] = ' ' + DEGREE_TEXT
+            self._set_text(self.up_down_distance_label,
+                           '{:10.2f}'.format(abs(moves.alt_upward)).strip())
+            self._set_text(self.up_down_degrees, ' ' + DEGREE_TEXT)
 
     def _clear_move_data(self):
-        self.left_right_label['text'] = NO_DATA
-        self.left_right_distance_label['text'] = NO_DATA
-        self.left_right_degrees['text'] = NO_DATA
-        self.up_down_label['text'] = NO_DATA
-        self.up_down_distance_label['text'] = NO_DATA
-        self.up_down_degrees['text'] = NO_DATA
+        self._set_text(self.left_right_label, NO_DATA)
+        self._set_text(self.left_right_distance_label, NO_DATA)
+        self._set_text(self.left_right_degrees, NO_DATA)
+        self._set_text(self.up_down_label, NO_DATA)
+        self._set_text(self.up_down_distance_label, NO_DATA)
+        self._set_text(self.up_down_degrees, NO_DATA)
+
+    def _update_pointing_table(self):
+        """ Precompute target's az/alt from now until occ time, once site & target locked;
+            and start a new refine session (for this site and target only). """
+        self.refine_session = None
+        if self.site_is_locked and self.target_is_locked:
+            self.refine_session = RefineSession((self.locked_longitude_degrees,
+                                                 self.locked_latitude_degrees),
+                                                (self.locked_target_ra_degrees,
+                                                 self.locked_target_dec_degrees),
+                                                self.locked_occ_datetime,
+                                                session=self.pointing_session)
+            self.pointing_table = PointingTable(self.locked_longitude_degrees,
+                                                self.locked_latitude_degrees,
+                                                self.locked_target_ra_degrees,
+                                                self.locked_target_dec_degrees,
+                                                datetime.now(timezone.utc),
+                                                self.locked_occ_datetime)
+        else:
+            self.pointing_table = None
 
     def _update_calc_button(self):
         # print('_update_calc_button() called')
-        ready_to_calc = \
-            self.site_is_locked and \
-            self.target_is_locked and \
-            self.image_datetime is not None and \
-            self.plate_ra_degrees is not None and \
-            self.plate_dec_degrees is not None
-        if ready_to_calc:
+        if self._ready_to_calc():
             self.button_calc_moves.state(["!disabled"])  # enabled
         else:
             self.button_calc_moves.state(["disabled"])
 
-    def _get_sharpcap_platesolution(self):
+    def _ready_to_calc(self):
+        return self.site_is_locked and \
+            self.target_is_locked and \
+            self.image_datetime is not None and \
+            self.plate_ra_degrees is not None and \
+            self.plate_dec_degrees is not None and \
+            self.mount_entries_ok
 
-        # Get data needed to calculate moves:
-        clipboard = u.get_windows_clipboard()
-        return_tuple = u.parse_sharpcap_platesolution_text(clipboard)
+    def _get_sharpcap_platesolution(self):
+        return_tuple = u.parse_sharpcap_platesolution_text(self.clipboard_reader.read())
         if return_tuple is None:
             self._clear_move_data()
             self.sharpcap_time_value['text'] = \
                 'No SharpCap plate solution in clipboard.'
             return
-        clipboard_datetime, self.plate_ra, self.plate_dec, self.plate_rotation = \
+        self._use_sharpcap_platesolution(return_tuple)
+
+    def _watch_plate_solutions(self):
+        """ Polls clipboard and SharpCap directory (via Tk after(), so never blocking the
+            event loop), and uses the latest new SharpCap plate solution, as though button
+            were pressed. Other new clipboard text is ignored. """
+        self.after(self.clipboard_poll_milliseconds, self._watch_plate_solutions)
+        new_solutions = self.plate_solution_watcher.poll()
+        if new_solutions:
+            self._use_sharpcap_platesolution(new_solutions[-1])
+
+    def _use_sharpcap_platesolution(self, return_tuple):
+        # Get data needed to calculate moves, into the plate solution entries (whose
+        # update, run at once rather than debounced, parses them as if typed):
+        clipboard_datetime, plate_ra_text, plate_dec_text, self.plate_rotation = \
             return_tuple
-        self.image_datetime = \
-            u.datetime_as_string(clipboard_datetime).split('UTC')[0].strip()
-        self.plate_ra_degrees = u.ra_as_degrees(self.plate_ra)
-        self.plate_dec_degrees = u.dec_as_degrees(self.plate_dec)
+        self.image_datetime = clipboard_datetime.replace(tzinfo=timezone.utc)
+        image_time_text = u.datetime_as_string(self.image_datetime).split('UTC')[0].strip()
+        self._set_text(self.label_image_datetime,
+                       'image time =   ' + u.datetime_as_string(self.image_datetime))
+        self.plate_ra.set(plate_ra_text)
+        self.plate_dec.set(plate_dec_text)
+        self.mount_az.set('')  # read for an earlier image; may be entered for this one.
+        self.mount_alt.set('')
+        self.debouncer.flush()
 
         # Update SharpCap fields:
-        self.sharpcap_time_value['text'] = self.image_datetime.strip() + '  UTC'
-        self.sharpcap_ra_value['text'] = self.plate_ra
-        self.sharpcap_dec_value['text'] = self.plate_dec
+        self.sharpcap_time_value['text'] = image_time_text + '  UTC'
+        self.sharpcap_ra_value['text'] = plate_ra_text
+        self.sharpcap_dec_value['text'] = plate_dec_text
         sharpcap_rot_text = self.plate_rotation.strip() + DEGREE_SIGN
         sharpcap_abs_rot_text = sharpcap_rot_text[1:] \
             if sharpcap_rot_text.startswith('-') \
@@ -674,7 +861,9 @@ class ApplicationPrePoint(tk.Tk):
 
         self.sharpcap_rot_value['text'] = \
             sharpcap_rot_text + ' --> ' + camera_rotation_instruction
-        self._calc_and_display_moves()
+        self._update_calc_button()
+        if self.site_is_locked and self.target_is_locked:
+            self._calc_and_display_moves()
 
 
 # ***** Python file entry here. *****
@@ -683,5 +872,10 @@ class ApplicationPrePoint(tk.Tk):
 # Sigh.
 # Well, at least this might later facilitate the making of executables for distribution.
 if __name__ == "__main__":
+    timing.enable_from_environment(modules=(u, b), classes=(ApplicationPrePoint, PointingTable,
+                                                            PlateSolutionWatcher,
+                                                            RefineSession,
+                                                            u.PointingSession,
+                                                            u.ClipboardReader))
     app = ApplicationPrePoint()
     app.mainloop()
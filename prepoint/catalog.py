@@ -0,0 +1,156 @@
+""" catalog.py
+    Screening of occultation prediction catalogs (thousands of events per month) against
+    a station list: each event's target az/alt at each station, computed in chunks of
+    events fanned out over CPU cores, and written as columns."""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import os
+
+import numpy as np
+
+import prepoint.batch as b
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+DEFAULT_MIN_ALTITUDE = 20.0  # degrees; events lower than this at a station are screened out.
+DEFAULT_CHUNK_EVENTS = 2000  # events per chunk sent to a worker process.
+EVENT_COLUMNS = ('name', 'ra', 'dec', 'occ_time')
+STATION_COLUMNS = ('name', 'longitude', 'latitude')
+
+Events = namedtuple('Events', ['name', 'ra', 'dec', 'occ_time'])
+Stations = namedtuple('Stations', ['name', 'longitude', 'latitude'])
+Screening = namedtuple('Screening', ['events', 'stations', 'az', 'alt', 'high_enough'])
+
+
+def load_events(file_path, malformed_line_numbers=None):
+    """ Reads events from a CSV file with header columns name, ra, dec, occ_time (others are
+        ignored): RA in hex hours, Dec in hex or degrees (as the app takes them),
+        occultation time as ISO date-time in UTC. Rows not valid are skipped.
+    :param file_path: path of CSV file [string].
+    :param malformed_line_numbers: if given, gets (1-based) line number of each skipped row
+           appended to it [list].
+    :return: events [Events namedtuple of numpy arrays: name (str), ra, dec (degrees),
+             occ_time (datetime64[us], UTC)].
+    """
+    line_numbers, rows = _csv_rows(file_path, EVENT_COLUMNS)
+    ra, ra_valid = b.angle_texts_as_degrees(rows['ra'], 'ra')
+    dec, dec_valid = b.angle_texts_as_degrees(rows['dec'], 'dec')
+    occ_time, time_valid = _iso_texts_as_datetime64(rows['occ_time'])
+    valid = ra_valid & dec_valid & time_valid
+    _note_malformed(line_numbers, valid, malformed_line_numbers)
+    return Events(np.array(rows['name'], dtype=str)[valid], ra[valid], dec[valid],
+                  occ_time[valid])
+
+
+def load_stations(file_path, malformed_line_numbers=None):
+    """ Reads stations from a CSV file with header columns name, longitude, latitude (hex or
+        degrees, east and north=positive; others are ignored). Rows not valid are skipped.
+    :param file_path: path of CSV file [string].
+    :param malformed_line_numbers: if given, gets (1-based) line number of each skipped row
+           appended to it [list].
+    :return: stations [Stations namedtuple of numpy arrays: name (str), longitude,
+             latitude (degrees)].
+    """
+    line_numbers, rows = _csv_rows(file_path, STATION_COLUMNS)
+    longitude, longitude_valid = b.angle_texts_as_degrees(rows['longitude'], 'longitude')
+    latitude, latitude_valid = b.angle_texts_as_degrees(rows['latitude'], 'latitude')
+    valid = longitude_valid & latitude_valid
+    _note_malformed(line_numbers, valid, malformed_line_numbers)
+    return Stations(np.array(rows['name'], dtype=str)[valid], longitude[valid],
+                    latitude[valid])
+
+
+def screen_events(events, stations, min_altitude=DEFAULT_MIN_ALTITUDE, processes=None,
+                  chunk_events=DEFAULT_CHUNK_EVENTS, tier='standard'):
+    """ Returns every event's target az/alt at occ time from every station, and whether
+        it's high enough there. Events are split into chunks, each computed (for all
+        stations at once) by batch.calc_az_alt_array() in a pool of worker processes.
+    :param events: as from load_events() [Events namedtuple].
+    :param stations: as from load_stations() [Stations namedtuple].
+    :param min_altitude: lowest usable altitude of target, in degrees [float].
+    :param processes: worker processes, or None for one per CPU core; 1 computes in this
+           process, without a pool [int].
+    :param chunk_events: events per chunk [int].
+    :param tier: engine tier of batch.calc_az_alt_array(), 'standard' or 'fast' (about
+           0.5 deg worse, twice the speed: lower min_altitude by a margin) [string].
+    :return: screening [Screening namedtuple: events, stations as given; az, alt in degrees
+             [float32 arrays] and high_enough [bool array], each shaped (events, stations)].
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    n_events = len(events.ra)
+    chunks = [(events.ra[start:start + chunk_events], events.dec[start:start + chunk_events],
+               events.occ_time[start:start + chunk_events], stations.longitude,
+               stations.latitude, tier)
+              for start in range(0, n_events, max(1, chunk_events))]
+    if processes <= 1 or len(chunks) <= 1:
+        results = [_az_alt_for_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(processes, len(chunks))) as executor:
+            results = list(executor.map(_az_alt_for_chunk, chunks))
+    shape = (n_events, len(stations.longitude))
+    az = np.concatenate([az for az, _ in results]) if results else np.zeros(shape, np.float32)
+    alt = np.concatenate([alt for _, alt in results]) if results else np.zeros(shape, np.float32)
+    return Screening(events, stations, az, alt, alt >= min_altitude)
+
+
+def write_screening(file_path, screening):
+    """ Writes screening as columns (one named array each, numpy .npz format), readable by
+        numpy.load(): event_name, event_ra, event_dec, event_occ_time, station_name,
+        station_longitude, station_latitude, az, alt, high_enough.
+    :param file_path: path of file to write [string].
+    :param screening: as from screen_events() [Screening namedtuple].
+    """
+    events, stations = screening.events, screening.stations
+    with open(file_path, 'wb') as f:
+        np.savez(f, event_name=events.name, event_ra=events.ra, event_dec=events.dec,
+                 event_occ_time=events.occ_time, station_name=stations.name,
+                 station_longitude=stations.longitude, station_latitude=stations.latitude,
+                 az=screening.az, alt=screening.alt, high_enough=screening.high_enough)
+
+
+def _az_alt_for_chunk(chunk):
+    """ Worker: az, alt (float32) of a chunk of events from all stations. """
+    ra, dec, occ_time, longitude, latitude, tier = chunk
+    az, alt = b.calc_az_alt_array(longitude[np.newaxis, :], latitude[np.newaxis, :],
+                                  ra[:, np.newaxis], dec[:, np.newaxis],
+                                  occ_time[:, np.newaxis], tier=tier)
+    return az.astype(np.float32), alt.astype(np.float32)
+
+
+def _csv_rows(file_path, columns):
+    """ Returns line numbers of data rows, and dict of column name -> list of texts. """
+    with open(file_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        header = [name.strip() for name in (reader.fieldnames or [])]
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError('{} lacks column(s): {}'.format(file_path, ', '.join(missing)))
+        reader.fieldnames = header
+        line_numbers, rows = [], {column: [] for column in columns}
+        for row in reader:
+            line_numbers.append(reader.line_num)
+            for column in columns:
+                rows[column].append((row[column] or '').strip())
+    return line_numbers, rows
+
+
+def _iso_texts_as_datetime64(texts):
+    """ Returns ISO date-times (UTC, optional trailing Z) as datetime64[us], and validity. """
+    times = np.full(len(texts), np.datetime64('NaT'), dtype='datetime64[us]')
+    valid = np.zeros(len(texts), dtype=bool)
+    for i, text in enumerate(texts):
+        try:
+            times[i] = np.datetime64(text[:-1] if text.endswith('Z') else text, 'us')
+        except ValueError:
+            continue
+        valid[i] = not np.isnat(times[i])
+    return times, valid
+
+
+def _note_malformed(line_numbers, valid, malformed_line_numbers):
+    if malformed_line_numbers is not None:
+        malformed_line_numbers.extend(line_number for line_number, ok
+                                      in zip(line_numbers, valid) if not ok)
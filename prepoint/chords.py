@@ -0,0 +1,83 @@
+""" chords.py
+    Event-chord planning: target's az/alt at occultation time from every candidate station
+    along a deployment line (or at any list of sites) across the predicted shadow path,
+    with stations where the target is too low flagged."""
+
+from collections import namedtuple
+
+import numpy as np
+
+import prepoint.batch as b
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+EARTH_RADIUS_KM = 6371.0  # mean radius; ample for spacing stations along a line.
+DEFAULT_MIN_ALTITUDE = 10.0  # degrees; lower targets are flagged.
+
+ChordPlan = namedtuple('ChordPlan', ['longitude', 'latitude', 'az', 'alt', 'too_low'])
+
+
+def plan_chords(longitudes, latitudes, ra, dec, occ_time, min_altitude=DEFAULT_MIN_ALTITUDE):
+    """ Returns target's az/alt at occultation time from each candidate site, computed in
+        one vectorized pass (batch.calc_az_alt_array(), same conventions and results as
+        util.calc_az_alt()), and flags sites where the target is below min_altitude.
+    :param longitudes: longitudes of sites, in degrees east=positive [array-like of floats].
+    :param latitudes: latitudes of sites, in degrees north=positive [array-like of floats].
+    :param ra: right ascension of target, J2000, in degrees [float].
+    :param dec: declination of target, J2000, in degrees [float].
+    :param occ_time: occultation time, in UTC [datetime object, or array-like of
+           datetimes or numpy datetime64, one per site (event times along the path)].
+    :param min_altitude: lowest usable altitude of target, in degrees [float].
+    :return: plan [ChordPlan namedtuple of numpy arrays, one element per site: longitude,
+             latitude, az, alt (degrees), too_low (bool)].
+    """
+    longitudes = np.asarray(longitudes, dtype=float)
+    latitudes = np.asarray(latitudes, dtype=float)
+    if longitudes.shape != latitudes.shape:
+        raise ValueError('longitudes and latitudes must have the same shape')
+    az, alt = b.calc_az_alt_array(longitudes, latitudes, ra, dec, occ_time)
+    return ChordPlan(longitudes, latitudes, az, alt, alt < min_altitude)
+
+
+def polyline_sites(vertex_longitudes, vertex_latitudes, spacing_km):
+    """ Returns candidate sites spaced along a polyline (e.g., a road across the shadow
+        path), including every vertex. Each segment is divided evenly, into as many parts
+        as needed to keep stations at most spacing_km apart (great-circle distance), and
+        interpolated linearly in longitude and latitude (fine for segments of up to a few
+        hundred km, not crossing the 180-degree meridian).
+    :param vertex_longitudes: longitudes of polyline vertices, in degrees east=positive
+           [array-like of floats].
+    :param vertex_latitudes: latitudes of polyline vertices, in degrees north=positive
+           [array-like of floats].
+    :param spacing_km: greatest distance between neighboring sites, in km [float].
+    :return: 2-tuple of longitudes, latitudes of sites, in degrees [2-tuple of numpy arrays].
+    """
+    vertex_longitudes = np.asarray(vertex_longitudes, dtype=float)
+    vertex_latitudes = np.asarray(vertex_latitudes, dtype=float)
+    if vertex_longitudes.ndim != 1 or vertex_longitudes.shape != vertex_latitudes.shape \
+            or len(vertex_longitudes) < 1:
+        raise ValueError('polyline needs matching 1-d longitudes and latitudes')
+    if spacing_km <= 0:
+        raise ValueError('spacing_km must be positive')
+    lengths_km = _great_circle_km(vertex_longitudes[:-1], vertex_latitudes[:-1],
+                                  vertex_longitudes[1:], vertex_latitudes[1:])
+    n_parts = np.maximum(1, np.ceil(lengths_km / spacing_km)).astype(np.int64)
+    segment = np.repeat(np.arange(len(n_parts)), n_parts)  # of each site but the last.
+    starts = np.cumsum(n_parts) - n_parts
+    fraction = (np.arange(n_parts.sum()) - np.repeat(starts, n_parts)) / \
+        np.repeat(n_parts, n_parts)
+    longitudes = vertex_longitudes[segment] + \
+        fraction * (vertex_longitudes[segment + 1] - vertex_longitudes[segment])
+    latitudes = vertex_latitudes[segment] + \
+        fraction * (vertex_latitudes[segment + 1] - vertex_latitudes[segment])
+    return (np.append(longitudes, vertex_longitudes[-1]),
+            np.append(latitudes, vertex_latitudes[-1]))
+
+
+def _great_circle_km(longitude_1, latitude_1, longitude_2, latitude_2):
+    """ Great-circle distances between points, in km (haversine formula). """
+    longitude_1, latitude_1, longitude_2, latitude_2 = \
+        np.radians([longitude_1, latitude_1, longitude_2, latitude_2])
+    h = np.sin((latitude_2 - latitude_1) / 2) ** 2 + \
+        np.cos(latitude_1) * np.cos(latitude_2) * np.sin((longitude_2 - longitude_1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, h)))
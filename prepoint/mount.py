@@ -0,0 +1,218 @@
+""" mount.py
+    Dobsonian mount model fitted to plate solutions of a pre-pointing session for which the
+    mount's own az/alt was read (e.g., from setting circles or encoders): zero points of the
+    mount's az and alt, and tilt of its base, found together by least squares, so that the
+    move to the target allows for them. Without such readings, refine cycles use only the
+    latest plate solution (hand moves are too imprecise to stand in for readings)."""
+
+from collections import namedtuple
+
+import numpy as np
+
+import prepoint.util as u
+from prepoint.moves import moves_from_az_alt
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+MIN_SOLUTIONS_FOR_TILT = 2  # fewer plate solutions fit zero points only (tilt taken as 0).
+TILT_DAMPING = 0.01  # weight holding tilt to 0 where solutions don't span enough sky to show it.
+MAX_ITERATIONS = 8  # Gauss-Newton steps; 2-3 are usual (model is nearly linear).
+CONVERGED_STEP = 1e-7  # radians (0.02 arcsec); a smaller largest step ends iteration.
+
+MountModel = namedtuple('MountModel', ['az_zero', 'alt_zero', 'tilt_north', 'tilt_east',
+                                       'rms_residual', 'n_solutions'])
+LEVEL_MOUNT = MountModel(0.0, 0.0, 0.0, 0.0, 0.0, 0)
+
+
+def fit_mount_model(mount_az, mount_alt, sky_az, sky_alt):
+    """ Fits a mount model to where the mount pointed (as its own az/alt) when images were
+        taken, and where their plate solutions show it actually pointed (sky az/alt).
+        Model: sky position = base tilt applied to (mount az + az_zero, mount alt +
+        alt_zero). One vectorized Gauss-Newton least-squares pass over all solutions.
+    :param mount_az: mount's azimuths, in degrees [array-like of floats].
+    :param mount_alt: mount's altitudes, in degrees [array-like of floats].
+    :param sky_az: azimuths of plate solutions, in degrees [array-like of floats].
+    :param sky_alt: altitudes of plate solutions, in degrees [array-like of floats].
+    :return: model [MountModel namedtuple: az_zero, alt_zero (added to mount's az, alt),
+             tilt_north, tilt_east (how far base's vertical axis leans toward north, east),
+             rms_residual (angular, of solutions from model), all in degrees; n_solutions].
+    """
+    mount_az, mount_alt, sky_az, sky_alt = \
+        (np.radians(np.asarray(values, dtype=float)).ravel()
+         for values in (mount_az, mount_alt, sky_az, sky_alt))
+    n = len(sky_az)
+    if n == 0 or not len(mount_az) == len(mount_alt) == len(sky_alt) == n:
+        raise ValueError('need one or more solutions, with mount and sky az/alt for each')
+    sky = _unit_vectors(sky_az, sky_alt)
+    az_offset = sky_az - mount_az
+    params = np.array([np.arctan2(np.sin(az_offset).sum(), np.cos(az_offset).sum()),
+                       (sky_alt - mount_alt).mean(), 0.0, 0.0])
+    n_params = 4 if n >= MIN_SOLUTIONS_FOR_TILT else 2
+    damping = np.diag([0.0, 0.0, TILT_DAMPING ** 2, TILT_DAMPING ** 2])[:n_params, :n_params]
+    for _ in range(MAX_ITERATIONS):
+        model_sky, jacobian = _model_and_jacobian(params, mount_az, mount_alt)
+        residual = (sky - model_sky).ravel()
+        jacobian = jacobian[:n_params]  # (transposed.) Normal equations, tilt damped to 0:
+        step = np.linalg.solve(jacobian @ jacobian.T + damping,
+                               jacobian @ residual - damping @ params[:n_params])
+        params[:n_params] += step
+        if np.abs(step).max() < CONVERGED_STEP:
+            break
+    model_sky, _ = _model_and_jacobian(params, mount_az, mount_alt, jacobian=False)
+    chord = np.linalg.norm(sky - model_sky, axis=0)
+    rms = np.sqrt(np.mean((2 * np.arcsin(np.minimum(1.0, chord / 2))) ** 2))
+    az_zero, alt_zero, tilt_north, tilt_east = np.degrees(params).tolist()
+    return MountModel((az_zero + 180.0) % 360.0 - 180.0, alt_zero, tilt_north, tilt_east,
+                      float(np.degrees(rms)), n)
+
+
+def mount_to_sky(model, mount_az, mount_alt):
+    """ Returns where mount points on the sky (az, alt in degrees), given its own az/alt
+        (degrees) [floats or array-likes], by model [MountModel namedtuple]. """
+    params = np.radians([model.az_zero, model.alt_zero, model.tilt_north, model.tilt_east])
+    sky, _ = _model_and_jacobian(params, np.radians(mount_az), np.radians(mount_alt))
+    return _az_alt(sky)
+
+
+def sky_to_mount(model, sky_az, sky_alt):
+    """ Returns mount's own az/alt (degrees) that points it at sky az/alt (degrees)
+        [floats or array-likes], by model [MountModel namedtuple]. """
+    rotation = _tilt_rotation(np.radians(model.tilt_north), np.radians(model.tilt_east))
+    base = np.tensordot(rotation.T, _unit_vectors(np.radians(sky_az), np.radians(sky_alt)),
+                        axes=1)
+    az, alt = _az_alt(base)
+    return (az - model.az_zero) % 360.0, alt - model.alt_zero
+
+
+class RefineSession:
+    """ Refine cycles (plate-solve, move, plate-solve again...) for one site, target and
+        occ time. Keeps every plate solution, with the mount's own az/alt when its image
+        was taken, where given. compute_moves() returns the move to target from the latest
+        plate solution: where its mount az/alt was given, in the mount's own az/alt, by a
+        mount model fitted to all plate solutions given one; else the plain move, as
+        moves.compute_moves() (no guess at where the mount was is ever fitted).
+    """
+    def __init__(self, site, target, occ_time, session=None):
+        """
+        :param site: longitude, latitude of site, in degrees east and north=positive
+               [2-tuple of floats].
+        :param target: right ascension, declination of target, in degrees [2-tuple of floats].
+        :param occ_time: occultation time, in UTC [datetime object].
+        :param session: if given, used for the az/alt calculations (as moves.compute_moves())
+               [util.PointingSession object].
+        """
+        self.site, self.target, self.occ_time = tuple(site), tuple(target), occ_time
+        self.session = session if session is not None else u.PointingSession()
+        self._solutions = []  # (plate_ra, plate_dec, image_time), in order added.
+        self._mount_az_alt = []  # mount's az, alt at each image, in degrees, or None if not read.
+        self._sky_az_alt = []  # plate solution's az, alt, in degrees.
+
+    def __len__(self):
+        return len(self._solutions)
+
+    def add_plate_solution(self, plate_ra, plate_dec, image_time, mount_az=None,
+                           mount_alt=None):
+        """ Adds a plate solution. If the same as the latest (as when moves are recalculated
+            for one image, perhaps with its mount az/alt entered since), only replaces the
+            latest's mount az/alt.
+        :param plate_ra: right ascension of plate solution, in degrees [float].
+        :param plate_dec: declination of plate solution, in degrees [float].
+        :param image_time: time image was taken, in UTC [datetime object].
+        :param mount_az, mount_alt: mount's own az, alt when image was taken, in degrees, as
+               read from the mount, if it can be (else the solution isn't fitted) [floats].
+        """
+        solution = (plate_ra, plate_dec, image_time)
+        mount_az_alt = None if mount_az is None or mount_alt is None else (mount_az, mount_alt)
+        if self._solutions and solution == self._solutions[-1]:
+            self._mount_az_alt[-1] = mount_az_alt
+            return
+        self.session.set_site(*self.site)
+        self._solutions.append(solution)
+        self._mount_az_alt.append(mount_az_alt)
+        self._sky_az_alt.append(self.session.plate_az_alt(*solution))
+
+    def fit(self):
+        """ Returns mount model fitted to all plate solutions with mount az/alt read
+            [MountModel namedtuple], or LEVEL_MOUNT if none. """
+        read = [(mount, sky) for mount, sky in zip(self._mount_az_alt, self._sky_az_alt)
+                if mount is not None]
+        if not read:
+            return LEVEL_MOUNT
+        mount_az, mount_alt = zip(*(mount for mount, _ in read))
+        sky_az, sky_alt = zip(*(sky for _, sky in read))
+        return fit_mount_model(mount_az, mount_alt, sky_az, sky_alt)
+
+    def compute_moves(self):
+        """ Returns move from where the mount now points (as of latest image) to target at
+            occ time. Raises ValueError if no plate solution. Unless the latest image's mount
+            az/alt was read, or with one plate solution, same as moves.compute_moves().
+        :return: moves [Moves namedtuple, its az/alt being mount's own plus zero points
+                 (sky az/alt, for a level mount)].
+        """
+        if not self._solutions:
+            raise ValueError('no plate solution yet')
+        self.session.set_site(*self.site)
+        self.session.set_target(*self.target, self.occ_time)
+        target_az_alt = self.session.target_az_alt()
+        if self._mount_az_alt[-1] is None:
+            return moves_from_az_alt(*self._sky_az_alt[-1], *target_az_alt)
+        model = self.fit()
+        az_occ, alt_occ = sky_to_mount(model, *target_az_alt)
+        az_now, alt_now = self._mount_az_alt[-1]
+        return moves_from_az_alt((az_now + model.az_zero) % 360.0, alt_now + model.alt_zero,
+                                 (float(az_occ) + model.az_zero) % 360.0,
+                                 float(alt_occ) + model.alt_zero)
+
+
+def _unit_vectors(az, alt):
+    """ Returns unit vectors (x north, y east, z up) of az, alt in radians [shape (3, ...)]. """
+    cos_alt = np.cos(alt)
+    return np.stack([cos_alt * np.cos(az), cos_alt * np.sin(az), np.sin(alt)])
+
+
+def _az_alt(vectors):
+    """ Returns az (0 to 360), alt in degrees of vectors shaped (3, ...). """
+    x, y, z = vectors
+    az = np.degrees(np.arctan2(y, x)) % 360.0
+    alt = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    return az, alt
+
+
+def _tilt_rotation(tilt_north, tilt_east):
+    """ Returns rotation (3x3) taking base frame to sky frame: base's vertical axis then
+        leans tilt_north (radians) toward north, and tilt_east toward east. """
+    return _rotation_north(tilt_north) @ _rotation_east(tilt_east)
+
+
+def _rotation_north(angle):
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, 0.0, s], [0.0, 1.0, 0.0], [-s, 0.0, c]])
+
+
+def _rotation_east(angle):
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[1.0, 0.0, 0.0], [0.0, c, s], [0.0, -s, c]])
+
+
+def _model_and_jacobian(params, mount_az, mount_alt, jacobian=True):
+    """ Returns model's sky vectors (3, n) for mount az/alt (radians), and (unless jacobian
+        is False) their Jacobian, transposed: shape (4, 3n), one row per param (az_zero,
+        alt_zero, tilt_north, tilt_east, radians), columns as the flattened vectors. """
+    az_zero, alt_zero, tilt_north, tilt_east = params
+    az, alt = np.ravel(mount_az + az_zero), np.ravel(mount_alt + alt_zero)
+    cos_az, sin_az, cos_alt, sin_alt = np.cos(az), np.sin(az), np.cos(alt), np.sin(alt)
+    base = np.array([cos_alt * cos_az, cos_alt * sin_az, sin_alt])
+    north, east = _rotation_north(tilt_north), _rotation_east(tilt_east)
+    rotation = north @ east
+    sky = (rotation @ base).reshape((3,) + np.shape(mount_az + az_zero))
+    if not jacobian:
+        return sky, None
+    c, s = np.cos(tilt_north), np.sin(tilt_north)
+    d_north = np.array([[-s, 0.0, c], [0.0, 0.0, 0.0], [-c, 0.0, -s]])
+    c, s = np.cos(tilt_east), np.sin(tilt_east)
+    d_east = np.array([[0.0, 0.0, 0.0], [0.0, -s, c], [0.0, -c, -s]])
+    d_az = np.array([-base[1], base[0], np.zeros_like(az)])
+    d_alt = np.array([-sin_alt * cos_az, -sin_alt * sin_az, cos_alt])
+    matrices = np.array([rotation, rotation, d_north @ east, north @ d_east])
+    vectors = np.array([d_az, d_alt, base, base])
+    return sky, (matrices @ vectors).reshape(4, -1)
@@ -0,0 +1,116 @@
+""" moves.py
+    Scope moves (from where a plate solution shows the scope pointing, to where the target
+    will be at occultation time), computed without any GUI; and the parsing of their inputs
+    as given to the command line and the pointing service."""
+
+import math
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import prepoint.util as u
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+OK_NOW = '(ok now)'
+INPUT_KEYS = ('longitude', 'latitude', 'ra', 'dec', 'occ_time',
+              'plate_ra', 'plate_dec', 'image_time')
+DEGREES_LIMITS = {'longitude': (-180.0, 180.0), 'latitude': (-90.0, 90.0),  # as for text.
+                  'ra': (0.0, 360.0), 'dec': (-90.0, 90.0),
+                  'plate_ra': (0.0, 360.0), 'plate_dec': (-90.0, 90.0)}
+
+Moves = namedtuple('Moves', ['az_now', 'alt_now', 'az_occ', 'alt_occ',
+                             'az_rightward', 'alt_upward', 'left_right', 'up_down'])
+
+
+def compute_moves(site, target, occ_time, plate_ra, plate_dec, image_time, session=None):
+    """ Returns scope moves needed to point at target for the occultation, given a plate
+        solution of an image taken at a known time. Same results as the app's display.
+    :param site: longitude, latitude of site, in degrees east and north=positive
+           [2-tuple of floats].
+    :param target: right ascension, declination of target, in degrees [2-tuple of floats].
+    :param occ_time: occultation time, in UTC [datetime object].
+    :param plate_ra: right ascension of plate solution, in degrees [float].
+    :param plate_dec: declination of plate solution, in degrees [float].
+    :param image_time: time image was taken, in UTC [datetime object].
+    :param session: if given, used (and updated) for the az/alt calculations, so that
+           repeated calls for the same site and target recompute only the plate solution
+           [util.PointingSession object].
+    :return: moves [Moves namedtuple].
+    """
+    if session is None:
+        session = u.PointingSession()
+    session.set_site(*site)
+    session.set_target(*target, occ_time)
+    az_now, alt_now = session.plate_az_alt(plate_ra, plate_dec, image_time)
+    az_occ, alt_occ = session.target_az_alt()
+    return moves_from_az_alt(az_now, alt_now, az_occ, alt_occ)
+
+
+def moves_from_az_alt(az_now, alt_now, az_occ, alt_occ):
+    """ Returns scope moves from where scope points now to where it must point at occ time.
+    :param az_now, alt_now: where scope points now (from plate solution), in degrees [floats].
+    :param az_occ, alt_occ: where target will be at occultation time, in degrees [floats].
+    :return: moves [Moves namedtuple].
+    """
+    # Cast into range [-180, +180]:
+    if az_occ < az_now - 180:
+        az_rightward = az_occ - az_now + 360
+    else:
+        az_rightward = az_occ - az_now
+    if az_rightward == 0:
+        left_right = OK_NOW
+    elif az_rightward < 0:
+        left_right = 'LEFT'
+    else:
+        left_right = 'RIGHT'
+    alt_upward = alt_occ - alt_now
+    if alt_upward == 0:
+        up_down = OK_NOW
+    elif alt_upward < 0:
+        up_down = 'LOWER'
+    else:
+        up_down = 'RAISE'
+    return Moves(az_now, alt_now, az_occ, alt_occ, az_rightward, alt_upward,
+                 left_right, up_down)
+
+
+def degrees_from_input(inputs, name, text_as_degrees):
+    """ Returns degrees from a number (degrees already) or from text, via a util parser.
+        Numbers must be finite and within the util parser's limits (as text would be).
+    :param inputs: inputs, as texts or numbers [dict, keyed by input name].
+    :param name: input to parse, a key of DEGREES_LIMITS [string].
+    :param text_as_degrees: parser of text, returning None if not valid, e.g.,
+           util.ra_as_degrees [function].
+    :return: degrees [float]. Raises ValueError naming input if not valid.
+    """
+    value = inputs[name]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        low, high = DEGREES_LIMITS[name]
+        if math.isfinite(value) and low <= value <= high:
+            return float(value)
+        raise ValueError('{} not valid: {!r}'.format(name, value))
+    degrees = text_as_degrees(str(value))
+    if degrees is None:
+        raise ValueError('{} not valid: {!r}'.format(name, value))
+    return degrees
+
+
+def datetime_utc_from_input(inputs, name):
+    """ Returns aware UTC datetime from ISO date-time text (naive taken as UTC),
+        hh:mm:ss (next such time, as the app does), or 'now'.
+    :param inputs: inputs, as texts [dict, keyed by input name].
+    :param name: input to parse [string].
+    :return: time, in UTC [datetime object]. Raises ValueError naming input if not valid.
+    """
+    text = inputs[name]
+    if str(text).strip().lower() == 'now':
+        return datetime.now(timezone.utc)
+    try:
+        this_datetime = datetime.fromisoformat(str(text).strip())
+    except ValueError:
+        this_datetime = u.next_datetime_from_time_string(str(text))
+        if this_datetime is None:
+            raise ValueError('{} not valid: {!r}'.format(name, text))
+    if this_datetime.tzinfo is None:
+        return this_datetime.replace(tzinfo=timezone.utc)
+    return this_datetime.astimezone(timezone.utc)
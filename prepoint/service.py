@@ -0,0 +1,239 @@
+""" service.py
+    Pointing service, for a deployment of several laptops or field tablets: an asyncio
+    server of JSON lines, on a loopback socket by default, taking any number of clients at
+    once. Requests arriving in the same event-loop tick, from all clients, are computed
+    together, in one batch.calc_az_alt_array() call. Run:
+        python -m prepoint.service [--host 127.0.0.1] [--port 7701]
+    One JSON object per line each way. Inputs are as for "python -m prepoint --stream"
+    (angles as text or degrees; times as ISO date-time in UTC, hh:mm:ss or now):
+        {"op": "moves", "longitude": ..., "latitude": ..., "ra": ..., "dec": ...,
+         "occ_time": ..., "plate_ra": ..., "plate_dec": ..., "image_time": ...}
+            -> moves, as from the CLI
+        {"op": "az_alt", "longitude": ..., "latitude": ..., "ra": ..., "dec": ..., "time": ...}
+            -> {"az": ..., "alt": ...}
+    "op" defaults to "moves". Any "id" given is echoed in the response, as responses to a
+    client come in order of completion (in order sent, within one batch). A request not
+    valid gets {"error": "..."}. On exit (Ctrl-C), writes latency percentiles to stderr."""
+
+import argparse
+import asyncio
+from array import array
+import functools
+import json
+import sys
+import time
+
+import numpy as np
+
+import prepoint.batch as b
+from prepoint.moves import INPUT_KEYS, datetime_utc_from_input, degrees_from_input, \
+    moves_from_az_alt
+from prepoint.timing import Timings
+import prepoint.util as u
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+DEFAULT_HOST = '127.0.0.1'  # loopback: this machine only.
+DEFAULT_PORT = 7701
+AZ_ALT_KEYS = ('longitude', 'latitude', 'ra', 'dec', 'time')
+MAX_LINE_BYTES = 64 * 1024
+
+
+class PointingService:
+    """ Computes clients' requests in batches: each request is queued, and once per
+        event-loop tick, all queued requests are computed in one vectorized call (standard
+        tier: within 2.2 arcsec of util.calc_az_alt()). Keeps each request's latency
+        (queued to answered), by op, and each batch's size.
+    """
+    def __init__(self, tier='standard'):
+        """
+        :param tier: engine tier of batch.calc_az_alt_array() [string].
+        """
+        self.tier = tier
+        self.timings = Timings()  # request latencies, by op.
+        self.batch_sizes = array('l')
+        self._queued = []  # (request, op, positions, future, start ns), in order received.
+        self._flush_scheduled = False
+
+    def submit(self, request):
+        """ Queues a request, to be computed with all others queued in this event-loop tick.
+            Must be called from the event loop's thread.
+        :param request: inputs, as described in module docstring [dict].
+        :return: future of response [asyncio Future of dict, ready for JSON].
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            op, positions = _positions(request)
+        except (KeyError, TypeError, ValueError) as e:
+            future.set_result(_response(request, {'error': _error_text(e)}))
+            return future
+        self._queued.append((request, op, positions, future, time.perf_counter_ns()))
+        if not self._flush_scheduled:
+            loop.call_soon(self._flush)
+            self._flush_scheduled = True
+        return future
+
+    def report(self):
+        """ Returns latency percentiles by op, and batch sizes, as text. """
+        sizes = np.frombuffer(self.batch_sizes, dtype=self.batch_sizes.typecode)
+        if not len(sizes):
+            return 'no requests'
+        return self.timings.report() + \
+            '\n{:,} batches; requests per batch: mean {:.1f}, max {:d}' \
+            .format(len(sizes), sizes.mean(), sizes.max())
+
+    async def handle_client(self, reader, writer):
+        """ Serves one client connection (as asyncio.start_server()'s callback): reads
+            request lines until the client closes, writing each response as it's ready. """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):  # incl. line over MAX_LINE_BYTES.
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise TypeError('request must be a JSON object')
+                except (TypeError, ValueError) as e:  # incl. json.JSONDecodeError.
+                    _write_response(writer, {'error': str(e)})
+                    continue
+                self.submit(request).add_done_callback(
+                    functools.partial(_write_future_response, writer))
+                await writer.drain()  # returns at once, unless client isn't reading.
+        except (ConnectionError, asyncio.CancelledError):  # client gone; server shut down.
+            pass
+        finally:
+            writer.close()
+
+    def _flush(self):
+        """ Computes all queued requests in one call, and answers each. """
+        queued, self._queued = self._queued, []
+        self._flush_scheduled = False
+        columns = list(zip(*(position for _, _, positions, _, _ in queued
+                             for position in positions)))
+        try:
+            az, alt = b.calc_az_alt_array(*(np.array(column, dtype=float)
+                                            for column in columns[:4]),
+                                          np.array(columns[4], dtype=object), tier=self.tier)
+            az, alt = az.tolist(), alt.tolist()
+        except Exception as e:  # never leave clients waiting.
+            for request, _, _, future, _ in queued:
+                future.set_result(_response(request, {'error': _error_text(e)}))
+            return
+        i = 0
+        clock = time.perf_counter_ns
+        for request, op, positions, future, start in queued:
+            if op == 'az_alt':
+                result = {'az': az[i], 'alt': alt[i]}
+            else:  # plate solution, then target:
+                result = moves_from_az_alt(az[i], alt[i], az[i + 1], alt[i + 1])._asdict()
+                result.update(occ_time=positions[1][4].isoformat(),
+                              image_time=positions[0][4].isoformat())
+            i += len(positions)
+            future.set_result(_response(request, result))
+            self.timings.add(op, clock() - start)
+        self.batch_sizes.append(len(queued))
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None):
+    """ Starts serving (returns once listening; serving continues as the event loop runs).
+    :param host: interface to listen on; the default is loopback only [string].
+    :param port: TCP port, or 0 for any free one [int].
+    :param service: if given, serves through it (e.g., to read its latencies after)
+           [PointingService object].
+    :return: server [asyncio.Server; server.sockets[0].getsockname() gives host, port].
+    """
+    service = service if service is not None else PointingService()
+    return await asyncio.start_server(service.handle_client, host, port,
+                                      limit=MAX_LINE_BYTES)
+
+
+def _positions(request):
+    """ Returns request's op, and list of (longitude, latitude, ra, dec, datetime) to
+        compute: one for op 'az_alt'; plate solution then target for op 'moves'. Raises
+        KeyError, TypeError or ValueError for a request not valid. """
+    op = request.get('op', 'moves')
+    if op == 'az_alt':
+        keys = AZ_ALT_KEYS
+    elif op == 'moves':
+        keys = INPUT_KEYS
+    else:
+        raise ValueError('op not valid: {!r}'.format(op))
+    for key in keys:
+        if request.get(key) is None:
+            raise ValueError('missing ' + key)
+    longitude = degrees_from_input(request, 'longitude', u.longitude_as_degrees)
+    latitude = degrees_from_input(request, 'latitude', u.latitude_as_degrees)
+    ra = degrees_from_input(request, 'ra', u.ra_as_degrees)
+    dec = degrees_from_input(request, 'dec', u.dec_as_degrees)
+    if op == 'az_alt':
+        return op, [(longitude, latitude, ra, dec, datetime_utc_from_input(request, 'time'))]
+    plate_ra = degrees_from_input(request, 'plate_ra', u.ra_as_degrees)
+    plate_dec = degrees_from_input(request, 'plate_dec', u.dec_as_degrees)
+    return op, [(longitude, latitude, plate_ra, plate_dec,
+                 datetime_utc_from_input(request, 'image_time')),
+                (longitude, latitude, ra, dec, datetime_utc_from_input(request, 'occ_time'))]
+
+
+def _response(request, result):
+    """ Returns result with request's id (if any) first. """
+    if 'id' not in request:
+        return result
+    response = {'id': request['id']}
+    response.update(result)
+    return response
+
+
+def _error_text(error):
+    return str(error.args[0]) if isinstance(error, KeyError) and error.args else str(error)
+
+
+def _write_response(writer, response):
+    if writer.is_closing():
+        return
+    try:
+        text = json.dumps(response, allow_nan=False)
+    except ValueError as e:  # NaN or infinity (as in an id echoed): not JSON, never sent.
+        text = json.dumps({'error': 'response not valid JSON: ' + str(e)})
+    writer.write(text.encode('utf-8') + b'\n')
+
+
+def _write_future_response(writer, future):
+    _write_response(writer, future.result())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m prepoint.service',
+                                     description='prepoint pointing service (JSON lines).')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='interface to listen on (default {}, this machine only)'
+                        .format(DEFAULT_HOST))
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='TCP port (default {})'.format(DEFAULT_PORT))
+    args = parser.parse_args(argv)
+    service = PointingService()
+
+    async def run():
+        server = await serve(args.host, args.port, service)
+        print('prepoint service on {}:{}'.format(*server.sockets[0].getsockname()[:2]),
+              flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(service.report(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
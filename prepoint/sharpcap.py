@@ -0,0 +1,66 @@
+""" sharpcap.py
+    Streams plate solutions out of SharpCap log files (hours of them, from multi-scope
+    nights), one record at a time, in constant memory whatever the file's size."""
+
+from collections import namedtuple
+import mmap
+
+import prepoint.util as u
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+BLOCK_START_MARKER = 'RA='  # first line of each plate solution block has this.
+LINES_PER_BLOCK = 4  # non-blank lines, as parse_sharpcap_platesolution_text() requires.
+
+PlateSolution = namedtuple('PlateSolution', ['datetime_utc', 'ra', 'dec', 'rotation'])
+
+
+def iter_sharpcap_log(file_path, malformed_line_numbers=None, use_mmap=True):
+    """ Yields each plate solution in a SharpCap log, in file order. A block begins at any
+        line containing 'RA=' and takes the next 3 non-blank lines; it's parsed by the same
+        rules as util.parse_sharpcap_platesolution_text(). Blocks that fail to parse, or
+        are cut short (by another block or end of file), are skipped; lines outside
+        blocks are ignored.
+    :param file_path: path of log file [string].
+    :param malformed_line_numbers: if given, gets (1-based) line number of first line of
+           each skipped block appended to it [list].
+    :param use_mmap: True to read file through a memory map, else as a text stream [bool].
+    :return: generator of plate solutions [PlateSolution namedtuples: datetime_utc (naive
+             UTC datetime object); RA (hex hours), Dec (hex degrees) and rotation (degrees E
+             of N), as strings].
+    """
+    block_lines, block_line_number = [], None
+    for line_number, line in enumerate(_log_lines(file_path, use_mmap), 1):
+        if not line.strip():
+            continue
+        if BLOCK_START_MARKER in line:
+            if block_lines and malformed_line_numbers is not None:
+                malformed_line_numbers.append(block_line_number)  # cut short.
+            block_lines, block_line_number = [line], line_number
+        elif block_lines:
+            block_lines.append(line)
+            if len(block_lines) == LINES_PER_BLOCK:
+                solution = u.parse_sharpcap_platesolution_lines(block_lines)
+                if solution is not None:
+                    yield PlateSolution(*solution)
+                elif malformed_line_numbers is not None:
+                    malformed_line_numbers.append(block_line_number)
+                block_lines = []
+    if block_lines and malformed_line_numbers is not None:
+        malformed_line_numbers.append(block_line_number)  # cut short by end of file.
+
+
+def _log_lines(file_path, use_mmap):
+    """ Yields lines of file as text, without line endings. """
+    with open(file_path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else None
+        except ValueError:  # empty file can't be mapped.
+            mapped = None
+        if mapped is None:
+            for raw_line in f:
+                yield raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+            return
+        with mapped:
+            for raw_line in iter(mapped.readline, b''):
+                yield raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
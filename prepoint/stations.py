@@ -0,0 +1,125 @@
+""" stations.py
+    Several stations (unattended scopes) deployed for one occultation: each with its own
+    site and plate solution, all sharing one target and occultation time; moves for all
+    stations computed in one batched pass, and shown in one table."""
+
+from collections import namedtuple
+
+import prepoint.batch as b
+from prepoint.moves import moves_from_az_alt
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+NO_DATA = '---'
+
+Station = namedtuple('Station', ['name', 'longitude', 'latitude',
+                                 'plate_ra', 'plate_dec', 'image_time'])
+StationMoves = namedtuple('StationMoves', ['station', 'az_occ', 'alt_occ', 'moves'])
+
+
+class StationManager:
+    """ Stations for one event, in the order added. Each station has a site, and once its
+        image is plate-solved, a plate solution (RA, Dec, image time); target and occ time
+        are shared by all. compute_moves() computes every station's az/alt (at occ time,
+        and of its plate solution) in one call of batch.calc_az_alt_array().
+    """
+    def __init__(self, ra=None, dec=None, occ_time=None):
+        """
+        :param ra: right ascension of target, in degrees [float].
+        :param dec: declination of target, in degrees [float].
+        :param occ_time: occultation time, in UTC [datetime object].
+        """
+        self.ra, self.dec, self.occ_time = ra, dec, occ_time
+        self._stations = {}  # name -> Station, in order added.
+
+    def __len__(self):
+        return len(self._stations)
+
+    @property
+    def stations(self):
+        """ Stations, in the order added [list of Station namedtuples]. """
+        return list(self._stations.values())
+
+    def set_target(self, ra, dec, occ_time):
+        """ Sets target and occultation time, shared by all stations.
+        :param ra: right ascension of target, in degrees [float].
+        :param dec: declination of target, in degrees [float].
+        :param occ_time: occultation time, in UTC [datetime object].
+        """
+        self.ra, self.dec, self.occ_time = ra, dec, occ_time
+
+    def add_station(self, name, longitude, latitude):
+        """ Adds a station (without plate solution), or moves an existing one to a new site
+            (clearing its plate solution, which was for the old site).
+        :param name: station's name, unique [string].
+        :param longitude: longitude of station, in degrees east=positive [float].
+        :param latitude: latitude of station, in degrees north=positive [float].
+        """
+        self._stations[name] = Station(name, longitude, latitude, None, None, None)
+
+    def remove_station(self, name):
+        """ Removes station; raises KeyError if no such station. """
+        del self._stations[name]
+
+    def set_plate_solution(self, name, plate_ra, plate_dec, image_time):
+        """ Sets a station's plate solution (replacing any earlier one); raises KeyError
+            if no such station.
+        :param name: station's name [string].
+        :param plate_ra: right ascension of plate solution, in degrees [float].
+        :param plate_dec: declination of plate solution, in degrees [float].
+        :param image_time: time image was taken, in UTC [datetime object].
+        """
+        self._stations[name] = self._stations[name]._replace(
+            plate_ra=plate_ra, plate_dec=plate_dec, image_time=image_time)
+
+    def compute_moves(self):
+        """ Returns, for every station, target's az/alt at occ time and (for stations with
+            a plate solution) the scope moves, all from one batched az/alt computation.
+            Raises ValueError if target or occ time is not set.
+        :return: [list of StationMoves namedtuples, in station order; moves is a Moves
+                 namedtuple as from moves.compute_moves(), or None if no plate solution].
+        """
+        if self.ra is None or self.dec is None or self.occ_time is None:
+            raise ValueError('target and occultation time must be set first')
+        stations = self.stations
+        if not stations:
+            return []
+        solved = [station for station in stations if station.image_time is not None]
+        # One batch: target at occ time from every station, then each plate solution:
+        longitude = [station.longitude for station in stations + solved]
+        latitude = [station.latitude for station in stations + solved]
+        ra = [self.ra] * len(stations) + [station.plate_ra for station in solved]
+        dec = [self.dec] * len(stations) + [station.plate_dec for station in solved]
+        times = [self.occ_time] * len(stations) + [station.image_time for station in solved]
+        az, alt = b.calc_az_alt_array(longitude, latitude, ra, dec, times)
+        az_alt_now = dict(zip((station.name for station in solved),
+                              zip(az[len(stations):].tolist(), alt[len(stations):].tolist())))
+        station_moves = []
+        for station, az_occ, alt_occ in zip(stations, az.tolist(), alt.tolist()):
+            moves = None
+            if station.name in az_alt_now:
+                moves = moves_from_az_alt(*az_alt_now[station.name], az_occ, alt_occ)
+            station_moves.append(StationMoves(station, az_occ, alt_occ, moves))
+        return station_moves
+
+
+def moves_table(station_moves):
+    """ Returns one text table of all stations' pointing and moves, one line per station,
+        for display in a fixed-width font.
+    :param station_moves: as from StationManager.compute_moves() [list of StationMoves].
+    :return: table with heading line [string].
+    """
+    name_width = max([len('Station')] + [len(str(row.station.name)) for row in station_moves])
+    lines = ['{:<{w}}  {:>7}  {:>7}  {:>15}  {:>15}'
+             .format('Station', 'AZ occ', 'ALT occ', 'Left/Right', 'Up/Down', w=name_width)]
+    for row in station_moves:
+        if row.moves is None:
+            left_right = up_down = NO_DATA
+        else:
+            left_right = '{:<8}{:7.2f}'.format(row.moves.left_right,
+                                               abs(row.moves.az_rightward))
+            up_down = '{:<8}{:7.2f}'.format(row.moves.up_down, abs(row.moves.alt_upward))
+        lines.append('{:<{w}}  {:7.2f}  {:7.2f}  {:>15}  {:>15}'
+                     .format(str(row.station.name), row.az_occ, row.alt_occ,
+                             left_right, up_down, w=name_width))
+    return '\n'.join(lines)
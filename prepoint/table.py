@@ -0,0 +1,146 @@
+""" table.py
+    Precomputed az/alt of one target from one site, at fixed cadence over a time window,
+    for O(1) lookups between locking the target and the occultation.
+
+    Table file format (PointingTable.save() and .load()), all little-endian:
+        bytes 0-127: header (TABLE_FILE_HEADER_DTYPE), zero-padded to TABLE_FILE_HEADER_BYTES:
+            magic            8 bytes  b'PREPOINT'
+            version          uint32   TABLE_FILE_VERSION
+            header_bytes     uint32   offset of first column (128)
+            longitude        float64  site, degrees east=positive
+            latitude         float64  site, degrees north=positive
+            ra               float64  target, J2000, degrees
+            dec              float64  target, J2000, degrees
+            start_us         int64    epoch (time of row 0), microseconds since
+                                      1970-01-01T00:00:00 UTC
+            cadence_seconds  float64  time between rows
+            n_rows           int64
+        then az column (n_rows float32, degrees), then alt column (n_rows float32, degrees).
+    Row i is for time start + i * cadence; the last row is the end (occultation) time.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import prepoint.batch as b
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+DEFAULT_CADENCE_SECONDS = 1.0
+TABLE_FILE_MAGIC = b'PREPOINT'
+TABLE_FILE_VERSION = 1
+TABLE_FILE_HEADER_BYTES = 128  # columns start here, aligned for any reader.
+TABLE_FILE_HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'),
+                                    ('header_bytes', '<u4'), ('longitude', '<f8'),
+                                    ('latitude', '<f8'), ('ra', '<f8'), ('dec', '<f8'),
+                                    ('start_us', '<i8'), ('cadence_seconds', '<f8'),
+                                    ('n_rows', '<i8')])
+UNIX_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class PointingTable:
+    """ Target's az/alt from a site, computed once (by batch.calc_az_alt_array) at
+        fixed cadence from a start time to an end time (normally the occultation time),
+        stored as float32 columns, and interpolated linearly for any time in between.
+        The time grid is anchored at end_utc, so the end (occultation) time is always
+        a table row exactly.
+    """
+    def __init__(self, longitude, latitude, ra, dec, start_utc, end_utc,
+                 cadence_seconds=DEFAULT_CADENCE_SECONDS):
+        """
+        :param longitude: longitude of site, in degrees east=positive [float].
+        :param latitude: latitude of site, in degrees north=positive [float].
+        :param ra: right ascension of target, in degrees [float].
+        :param dec: declination of target, in degrees [float].
+        :param start_utc: earliest time table must cover, in UTC [datetime object].
+        :param end_utc: latest time table must cover, normally occultation time, in UTC
+               [datetime object].
+        :param cadence_seconds: time between table rows, in seconds [float].
+        """
+        self.longitude, self.latitude = longitude, latitude
+        self.ra, self.dec = ra, dec
+        self.cadence_seconds = float(cadence_seconds)
+        end_utc = _aware_utc(end_utc)
+        span_seconds = max(0.0, (end_utc - _aware_utc(start_utc)).total_seconds())
+        n_rows = int(math.ceil(span_seconds / self.cadence_seconds)) + 1
+        self.start_utc = end_utc - timedelta(seconds=(n_rows - 1) * self.cadence_seconds)
+        self.end_utc = end_utc
+        seconds = np.arange(n_rows) * self.cadence_seconds
+        times = np.datetime64(self.start_utc.replace(tzinfo=None), 'us') + \
+            (seconds * 1e6).astype('timedelta64[us]')
+        az, alt = b.calc_az_alt_array(longitude, latitude, ra, dec, times)
+        self.az = az.astype(np.float32)
+        self.alt = alt.astype(np.float32)
+
+    def __len__(self):
+        return len(self.az)
+
+    def save(self, file_path):
+        """ Writes table to a file, in the table file format (see module docstring).
+        :param file_path: path of file to write [string].
+        """
+        header = np.zeros(1, dtype=TABLE_FILE_HEADER_DTYPE)
+        header[0] = (TABLE_FILE_MAGIC, TABLE_FILE_VERSION, TABLE_FILE_HEADER_BYTES,
+                     self.longitude, self.latitude, self.ra, self.dec,
+                     (self.start_utc - UNIX_EPOCH_UTC) // timedelta(microseconds=1),
+                     self.cadence_seconds, len(self))
+        with open(file_path, 'wb') as f:
+            f.write(header.tobytes().ljust(TABLE_FILE_HEADER_BYTES, b'\0'))
+            f.write(np.asarray(self.az, dtype='<f4').tobytes())
+            f.write(np.asarray(self.alt, dtype='<f4').tobytes())
+
+    @classmethod
+    def load(cls, file_path):
+        """ Returns table from a file written by save(), without computing anything: az and
+            alt columns are read-only views of a numpy.memmap of the file (no copies),
+            paged in only as lookups touch them. Raises ValueError if not a table file.
+        :param file_path: path of table file [string].
+        :return: table [PointingTable object].
+        """
+        header = np.fromfile(file_path, dtype=TABLE_FILE_HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != TABLE_FILE_MAGIC:
+            raise ValueError('not a prepoint table file: {}'.format(file_path))
+        header = header[0]
+        if header['version'] != TABLE_FILE_VERSION:
+            raise ValueError('table file version {} not supported: {}'
+                             .format(header['version'], file_path))
+        table = cls.__new__(cls)
+        table.longitude, table.latitude = float(header['longitude']), float(header['latitude'])
+        table.ra, table.dec = float(header['ra']), float(header['dec'])
+        table.cadence_seconds = float(header['cadence_seconds'])
+        n_rows, offset = int(header['n_rows']), int(header['header_bytes'])
+        table.start_utc = UNIX_EPOCH_UTC + timedelta(microseconds=int(header['start_us']))
+        table.end_utc = table.start_utc + \
+            timedelta(seconds=(n_rows - 1) * table.cadence_seconds)
+        columns = np.memmap(file_path, dtype='<f4', mode='r', offset=offset,
+                            shape=(2, n_rows))
+        table.az, table.alt = columns.view(np.ndarray)  # plain views: faster to index.
+        return table
+
+    def az_alt(self, datetime_utc):
+        """ Returns target's azimuth and altitude at a time within the table's span,
+            interpolated between the two nearest rows, or None if outside the span.
+        :param datetime_utc: time, in UTC [datetime object].
+        :return: 2-tuple of azimuth, altitude in degrees [2-tuple of floats], or None.
+        """
+        position = (_aware_utc(datetime_utc) - self.start_utc).total_seconds() / \
+            self.cadence_seconds
+        if not (0 <= position <= len(self.az) - 1):
+            return None
+        i = int(position)
+        fraction = position - i
+        az0, alt0 = float(self.az[i]), float(self.alt[i])
+        if fraction == 0:
+            return az0, alt0
+        d_az = (float(self.az[i + 1]) - az0 + 180.0) % 360.0 - 180.0  # across 0/360.
+        d_alt = float(self.alt[i + 1]) - alt0
+        return (az0 + fraction * d_az) % 360.0, alt0 + fraction * d_alt
+
+
+def _aware_utc(this_datetime):
+    """ Returns datetime as aware UTC (naive datetimes are taken to be UTC already). """
+    if this_datetime.tzinfo is None:
+        return this_datetime.replace(tzinfo=timezone.utc)
+    return this_datetime.astimezone(timezone.utc)
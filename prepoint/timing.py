@@ -0,0 +1,119 @@
+""" timing.py
+    Opt-in timing of prepoint functions and app callbacks: set environment variable
+    PREPOINT_PROFILE (or give the CLI --profile) and each wrapped function's call times are
+    collected, then reported as percentiles on exit. Unless enabled, nothing is wrapped,
+    so normal runs pay nothing."""
+
+from array import array
+import atexit
+import functools
+import inspect
+import os
+import sys
+import time
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+PROFILE_ENVIRONMENT_VARIABLE = 'PREPOINT_PROFILE'
+REPORT_PERCENTILES = (50, 90, 99)
+
+
+class Timings:
+    """ Call durations, by function name, kept compactly (8 bytes per call). """
+    def __init__(self):
+        self._nanoseconds = {}  # name -> array of call durations in ns.
+
+    def add(self, name, nanoseconds):
+        durations = self._nanoseconds.get(name)
+        if durations is None:
+            durations = self._nanoseconds[name] = array('q')
+        durations.append(nanoseconds)
+
+    def summary(self):
+        """ Returns per-function statistics, most total time first.
+        :return: [list of dicts, keys name, calls, total_ms, p50_us, p90_us, p99_us, max_us]
+        """
+        import numpy as np  # here, so that the CLI starts without numpy unless profiling.
+        rows = []
+        for name, durations in self._nanoseconds.items():
+            microseconds = np.frombuffer(durations, dtype=np.int64) / 1000.0
+            row = {'name': name, 'calls': len(microseconds),
+                   'total_ms': microseconds.sum() / 1000.0}
+            for percentile, value in zip(REPORT_PERCENTILES,
+                                         np.percentile(microseconds, REPORT_PERCENTILES)):
+                row['p{}_us'.format(percentile)] = value
+            row['max_us'] = microseconds.max()
+            rows.append(row)
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def report(self):
+        """ Returns summary as a text table (times include those of wrapped callees). """
+        lines = ['{:<48} {:>8} {:>10} {:>9} {:>9} {:>9} {:>10}'
+                 .format('prepoint timing (us per call)', 'calls', 'total ms',
+                         'p50', 'p90', 'p99', 'max')]
+        for row in self.summary():
+            lines.append('{:<48} {:>8,d} {:>10.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>10.1f}'
+                         .format(row['name'], row['calls'], row['total_ms'], row['p50_us'],
+                                 row['p90_us'], row['p99_us'], row['max_us']))
+        return '\n'.join(lines)
+
+
+def timed(function, name, timings):
+    """ Returns function wrapped to add each call's duration to timings under name. """
+    clock = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings.add(name, clock() - start)
+    wrapper.__wrapped_for_timing__ = True
+    return wrapper
+
+
+def instrument_module(module, timings):
+    """ Wraps (in place) each function defined in module, so that calls through the module,
+        as module.function() or from within module, are timed. Names imported elsewhere
+        by "from module import function" keep the unwrapped function. """
+    for name, attribute in list(vars(module).items()):
+        if inspect.isfunction(attribute) and attribute.__module__ == module.__name__ and \
+                not getattr(attribute, '__wrapped_for_timing__', False):
+            setattr(module, name, timed(attribute, module.__name__ + '.' + name, timings))
+
+
+def instrument_class(cls, timings):
+    """ Wraps (in place) each method defined in class (not dunder methods, so not __init__),
+        e.g., all of the app's callbacks. Call before making instances, as Tk widgets and
+        after() hold on to bound methods. """
+    for name, attribute in list(vars(cls).items()):
+        if inspect.isfunction(attribute) and not name.startswith('__') and \
+                not getattr(attribute, '__wrapped_for_timing__', False):
+            setattr(cls, name, timed(attribute, cls.__name__ + '.' + name, timings))
+
+
+def enable(modules=(), classes=(), stream=None):
+    """ Instruments modules and classes, and registers the report to be written on exit.
+    :param modules: modules whose functions to time [sequence of modules].
+    :param classes: classes whose methods to time [sequence of classes].
+    :param stream: where report is written, default sys.stderr [file-like].
+    :return: timings being collected [Timings object].
+    """
+    timings = Timings()
+    for module in modules:
+        instrument_module(module, timings)
+    for cls in classes:
+        instrument_class(cls, timings)
+    atexit.register(lambda: print(timings.report(), file=stream or sys.stderr))
+    return timings
+
+
+def enable_from_environment(modules=(), classes=()):
+    """ As enable(), if environment variable PREPOINT_PROFILE is set (and not '0');
+        else does nothing.
+    :return: timings being collected [Timings object], or None if not enabled.
+    """
+    if os.environ.get(PROFILE_ENVIRONMENT_VARIABLE, '0') in ('', '0'):
+        return None
+    return enable(modules, classes)
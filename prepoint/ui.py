@@ -0,0 +1,149 @@
+""" ui.py
+    Helpers that keep the app's Tk callbacks cheap while the operator types: debounced
+    updates (by Tk after()), per-field parse caching, label writes only on change, and
+    counters to show how much work typing causes; and the live countdown readout.
+    Nothing here imports tkinter."""
+
+import time
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+DEBOUNCE_MILLISECONDS = 80  # area update runs this long after the last keystroke.
+LIVE_REFRESH_MILLISECONDS = 250  # live countdown & target-now readout, at 4 Hz.
+
+
+class UiCounters:
+    """ Counts entry callbacks (keystrokes), field recomputes (parses), and label writes
+        made or skipped (as unchanged); rates() gives them per second of typing. """
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.reset()
+
+    def reset(self):
+        self.callbacks = 0
+        self.recomputes = 0
+        self.label_writes = 0
+        self.label_writes_skipped = 0
+        self._first_callback_time = None
+        self._last_callback_time = None
+
+    def callback(self):
+        """ Counts one entry callback, and notes its time. """
+        self.callbacks += 1
+        self._last_callback_time = self._clock()
+        if self._first_callback_time is None:
+            self._first_callback_time = self._last_callback_time
+
+    def rates(self):
+        """ Returns counts per second of typing (first to last callback), or None if fewer
+            than 2 callbacks so far.
+        :return: [dict of floats, keyed by counter name, or None]
+        """
+        if self.callbacks < 2:
+            return None
+        seconds = self._last_callback_time - self._first_callback_time
+        if seconds <= 0:
+            return None
+        return {name: getattr(self, name) / seconds for name in
+                ('callbacks', 'recomputes', 'label_writes', 'label_writes_skipped')}
+
+
+class Debouncer:
+    """ Runs each function once, a delay after the last of any burst of requests for it
+        (e.g., an area update after the last keystroke in its entries), by Tk after(). """
+    def __init__(self, after, after_cancel, delay_milliseconds=DEBOUNCE_MILLISECONDS):
+        """
+        :param after: schedules a call, returns an id, as Tk's after(ms, function).
+        :param after_cancel: cancels a scheduled call by its id, as Tk's after_cancel(id).
+        :param delay_milliseconds: delay after last request [int].
+        """
+        self._after = after
+        self._after_cancel = after_cancel
+        self.delay_milliseconds = delay_milliseconds
+        self._pending = {}  # function -> after id.
+
+    def call(self, function):
+        """ Schedules function, replacing any call of it not yet run. """
+        if function in self._pending:
+            self._after_cancel(self._pending[function])
+        self._pending[function] = self._after(self.delay_milliseconds,
+                                              lambda: self._run(function))
+
+    def flush(self):
+        """ Runs all scheduled calls now (e.g., before a button uses what they update). """
+        for function in list(self._pending):
+            self._after_cancel(self._pending[function])
+            self._run(function)
+
+    def _run(self, function):
+        self._pending.pop(function, None)
+        function()
+
+
+class FieldCache:
+    """ Last text and parsed value of each entry field, so that a field is parsed again
+        only when its text has changed. Only for parses of the text alone (not, e.g., of
+        hh:mm:ss as the next such time, which depends on when it's parsed). """
+    def __init__(self, counters=None):
+        self.counters = counters
+        self._fields = {}  # name -> (text, value).
+
+    def parsed(self, name, text, parse):
+        """ Returns parse(text), computed only if text differs from the field's last text.
+        :param name: field name [string].
+        :param text: field's text [string].
+        :param parse: function of text [callable].
+        """
+        cached = self._fields.get(name)
+        if cached is not None and cached[0] == text:
+            return cached[1]
+        value = parse(text)
+        self._fields[name] = (text, value)
+        if self.counters is not None:
+            self.counters.recomputes += 1
+        return value
+
+
+def set_label_text(label, text, counters=None):
+    """ Sets label's text, unless it already shows that text (a widget write costs far more
+        than reading its text back).
+    :param label: [tkinter Label-like widget].
+    :param text: [string].
+    :param counters: counts writes made and skipped, if given [UiCounters object].
+    :return: True if label was written [bool].
+    """
+    if label['text'] == text:
+        if counters is not None:
+            counters.label_writes_skipped += 1
+        return False
+    label['text'] = text
+    if counters is not None:
+        counters.label_writes += 1
+    return True
+
+
+def live_readout(pointing_table, now_utc):
+    """ Returns seconds to occultation (the table's end time), and target's azimuth and
+        altitude now, interpolated from the table (no ephem computation: cheap every tick).
+    :param pointing_table: table ending at occultation time, or None [PointingTable object].
+    :param now_utc: now, in UTC, aware [datetime object].
+    :return: 2-tuple of seconds to occultation, negative once past [float, or None if no
+             table], and azimuth, altitude now in degrees [2-tuple of floats, or None if
+             no table or now is outside its span].
+    """
+    if pointing_table is None:
+        return None, None
+    seconds_to_occ = (pointing_table.end_utc - now_utc).total_seconds()
+    return seconds_to_occ, pointing_table.az_alt(now_utc)
+
+
+def countdown_text(seconds_to_occ):
+    """ Returns countdown as 'T-hh:mm:ss' (or 'T+hh:mm:ss' once past), in whole seconds
+        (counting down to the event, so 0.4 s to go shows as T-00:00:01). """
+    if seconds_to_occ > 0:
+        sign, whole_seconds = '-', int(-(-seconds_to_occ // 1))
+    else:
+        sign, whole_seconds = '+', int(-seconds_to_occ // 1)
+    hours, remainder = divmod(whole_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return 'T{}{:02d}:{:02d}:{:02d}'.format(sign, hours, minutes, seconds)
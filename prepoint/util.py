@@ -1,10 +1,15 @@
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timezone, timedelta
 import math
-
-import ephem
+import re
 
 __author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
 
+AZ_ALT_CACHE_MAX_SIZE = 1024  # entries.
+AZ_ALT_CACHE_TIME_QUANTUM = 0.0  # seconds; 0 means times are cached exactly.
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'size', 'max_size'])
+
 
 def calc_az_alt(longitude, latitude, ra, dec, datetime_utc):
     """  Returns azimuth and altitude for sky position (RA and Dec)
@@ -19,17 +24,184 @@ def calc_az_alt(longitude, latitude, ra, dec, datetime_utc):
     """
 #     return 1.0, 2.0  # dummy line for testing only.
 
+    # Angles are passed to ephem as float radians, not as hex strings (which ephem would
+    # re-parse, and which round to 0.01 arcsec and 0.001 RA seconds).
+    import ephem  # here, not at module level, so that util imports fast without it.
     obs = ephem.Observer()  # for local use.
-    obs.lon = degrees_as_hex(longitude)
-    obs.lat = degrees_as_hex(latitude)
+    obs.lon = math.radians(longitude)
+    obs.lat = math.radians(latitude)
     obs.date = datetime_utc
 
     target_ephem = ephem.FixedBody()  # named to suggest restricting its use to ephem.
     target_ephem._epoch = '2000'
-    target_ephem._ra = ra_as_hours(ra)
-    target_ephem._dec = degrees_as_hex(dec)
+    target_ephem._ra = math.radians(ra)
+    target_ephem._dec = math.radians(dec)
     target_ephem.compute(obs)
-    return target_ephem.az * 180 / math.pi, target_ephem.alt * 180 / math.pi
+    return math.degrees(target_ephem.az), math.degrees(target_ephem.alt)
+
+
+class PointingSession:
+    """ Holds one observing site and one target (RA, Dec, occultation time) for repeated
+        az/alt queries, as from the app's entry callbacks and move calculations.
+        Keeps its ephem Observer and FixedBody objects, and recomputes only when a query's
+        inputs differ from the last ones: the time of a new image, or a new plate RA/Dec.
+        Results are the same as from calc_az_alt(). If given an AzAltCache, recomputations
+        go through it, so that earlier inputs recurring (e.g., re-pasted plate solutions,
+        re-typed targets) are not recomputed either.
+    """
+    def __init__(self, longitude=None, latitude=None, cache=None):
+        import ephem
+        self.cache = cache
+        self._observer = ephem.Observer()
+        self._target = ephem.FixedBody()
+        self._target._epoch = '2000'  # as calc_az_alt().
+        self._plate = ephem.FixedBody()
+        self._plate._epoch = '2000'
+        self.site = None
+        self.target = None
+        self._target_az_alt = None
+        self._plate_ra_dec = None
+        self._plate_inputs = None
+        self._plate_az_alt = None
+        if longitude is not None and latitude is not None:
+            self.set_site(longitude, latitude)
+
+    def set_site(self, longitude, latitude):
+        """ Sets observing site; invalidates all results if it has changed.
+        :param longitude: in degrees east=positive [float].
+        :param latitude: in degrees north=positive [float].
+        """
+        if (longitude, latitude) == self.site:
+            return
+        self._observer.lon = math.radians(longitude)
+        self._observer.lat = math.radians(latitude)
+        self.site = (longitude, latitude)
+        self._target_az_alt = None
+        self._plate_inputs = None
+
+    def set_target(self, ra, dec, occ_datetime_utc):
+        """ Sets target position and occultation time; invalidates target result if changed.
+        :param ra: right ascension of target, in degrees [float].
+        :param dec: declination of target, in degrees [float].
+        :param occ_datetime_utc: occultation time, in UTC [datetime object].
+        """
+        if (ra, dec, occ_datetime_utc) == self.target:
+            return
+        self._target._ra = math.radians(ra)
+        self._target._dec = math.radians(dec)
+        self.target = (ra, dec, occ_datetime_utc)
+        self._target_az_alt = None
+
+    def target_az_alt(self):
+        """ Returns azimuth, altitude of target at occultation time, in degrees
+            [2-tuple of floats], computed only once per site and target. """
+        if self.site is None or self.target is None:
+            return None
+        if self._target_az_alt is None:
+            if self.cache is not None:
+                self._target_az_alt = self.cache.az_alt(*self.site, *self.target,
+                                                        compute=self._computed_target_az_alt)
+            else:
+                self._target_az_alt = self._computed_target_az_alt(*self.site, *self.target)
+        return self._target_az_alt
+
+    def plate_az_alt(self, plate_ra, plate_dec, image_datetime_utc):
+        """ Returns azimuth, altitude of plate solution (where scope pointed at image time),
+            in degrees [2-tuple of floats]. Recomputes only if any input has changed.
+        :param plate_ra: right ascension of plate solution, in degrees [float].
+        :param plate_dec: declination of plate solution, in degrees [float].
+        :param image_datetime_utc: time image was taken, in UTC [datetime object].
+        """
+        if self.site is None:
+            return None
+        inputs = (plate_ra, plate_dec, image_datetime_utc)
+        if inputs != self._plate_inputs:
+            if self.cache is not None:
+                self._plate_az_alt = self.cache.az_alt(*self.site, *inputs,
+                                                       compute=self._computed_plate_az_alt)
+            else:
+                self._plate_az_alt = self._computed_plate_az_alt(*self.site, *inputs)
+            self._plate_inputs = inputs
+        return self._plate_az_alt
+
+    # The two below compute with this session's own ephem objects (site already set),
+    # and have calc_az_alt()'s parameters, so that an AzAltCache can call them on a miss:
+    def _computed_target_az_alt(self, longitude, latitude, ra, dec, datetime_utc):
+        self._observer.date = datetime_utc
+        self._target.compute(self._observer)
+        return math.degrees(self._target.az), math.degrees(self._target.alt)
+
+    def _computed_plate_az_alt(self, longitude, latitude, plate_ra, plate_dec, datetime_utc):
+        if (plate_ra, plate_dec) != self._plate_ra_dec:
+            self._plate._ra = math.radians(plate_ra)
+            self._plate._dec = math.radians(plate_dec)
+            self._plate_ra_dec = (plate_ra, plate_dec)
+        self._observer.date = datetime_utc
+        self._plate.compute(self._observer)
+        return math.degrees(self._plate.az), math.degrees(self._plate.alt)
+
+
+class AzAltCache:
+    """ Bounded least-recently-used cache of calc_az_alt() results, keyed on
+        (longitude, latitude, ra, dec, time), with time optionally quantized so that
+        nearby times share one entry. Hit, miss and eviction counters may be read
+        at any time via cache_info().
+    """
+    def __init__(self, max_size=AZ_ALT_CACHE_MAX_SIZE,
+                 time_quantum_seconds=AZ_ALT_CACHE_TIME_QUANTUM):
+        """
+        :param max_size: most entries to hold before evicting least recently used [int].
+        :param time_quantum_seconds: times are rounded to a multiple of this before
+               lookup and calculation; 0 to use times exactly [float].
+        """
+        self.max_size = max(1, int(max_size))
+        self.time_quantum_seconds = float(time_quantum_seconds)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def az_alt(self, longitude, latitude, ra, dec, datetime_utc, compute=None):
+        """ Returns calc_az_alt() result for these inputs, from cache if present.
+            Same parameters as calc_az_alt(), plus:
+        :param compute: called instead of calc_az_alt() on a miss, with the same arguments,
+               e.g., a PointingSession's own, reusing its ephem objects [callable].
+        :return: 2-tuple of azimuth, altitude in degrees [2-tuple of floats].
+        """
+        datetime_utc = self._quantized(datetime_utc)
+        key = (longitude, latitude, ra, dec, datetime_utc)
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = (compute or calc_az_alt)(longitude, latitude, ra, dec, datetime_utc)
+        self._entries[key] = result
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def clear(self):
+        """ Removes all entries; counters are kept. """
+        self._entries.clear()
+
+    def cache_info(self):
+        """ Returns hits, misses, evictions, size, max_size [CacheInfo namedtuple]. """
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         len(self._entries), self.max_size)
+
+    def _quantized(self, datetime_utc):
+        """ Returns datetime rounded to time quantum (other time types unchanged). """
+        if self.time_quantum_seconds <= 0 or not isinstance(datetime_utc, datetime):
+            return datetime_utc
+        epoch = datetime(2000, 1, 1, tzinfo=datetime_utc.tzinfo)
+        n_quanta = round((datetime_utc - epoch).total_seconds() / self.time_quantum_seconds)
+        return epoch + timedelta(seconds=n_quanta * self.time_quantum_seconds)
 
 
 def next_datetime_from_time_string(time_text):
@@ -81,37 +253,59 @@ def parse_hex(hex_string):
     return space_list
 
 
+# Matches, in one pass, the angle forms prepoint documents: "-12:34:56.78", "-12 34 56.78",
+# "-12:34", "-12 34", "-12.345". Groups: sign, whole, separator, minutes, seconds, decimals.
+# Other text (e.g., mixed or unusual separators) is parsed field by field via parse_hex().
+ANGLE_PATTERN = re.compile(r'\s*([+-]?)([0-9]+)(?:(:|[ \t]+)([0-9]+)'
+                           r'(?:\3([0-9]+(?:\.[0-9]*)?))?|(\.[0-9]*)?)\s*\Z', re.ASCII)
+
+
 def hex_degrees_as_degrees(hex_degrees_string):
     """ Returns degrees for input string.
         Adapted from photrix.util August 2018; added return=None for unparseable string,
         or for minutes or seconds = negative or >=60.
+        Parses in a single pass (ANGLE_PATTERN) where possible.
     :param hex_degrees_string: (string) either in
            full hex ("-12:34:56.7777", or "-12 34 56.7777"),
            or degrees ("-24.55")
     :return (float) degrees (not limited)
     """
-    hex_list = parse_hex(hex_degrees_string)
-    if hex_list[0].startswith("-"):
-        sign = -1
-    else:
-        sign = 1
+    match = ANGLE_PATTERN.match(hex_degrees_string)
+    if match is None:
+        return _hex_list_as_degrees(parse_hex(hex_degrees_string))
+    sign, whole, _, minutes, seconds, _ = match.groups()
+    if minutes is None:
+        return float(hex_degrees_string)  # input in degrees.
+    minutes = int(minutes)
+    if minutes >= 60:
+        return None
+    sign = -1 if sign == '-' else 1
+    if seconds is None:
+        return sign * (int(whole) + minutes / 60.0)
+    seconds = float(seconds)
+    if seconds >= 60:
+        return None
+    return sign * (int(whole) + minutes / 60.0 + seconds / 3600.0)
+
+
+def _hex_list_as_degrees(hex_list):
+    """ hex_degrees_as_degrees() for text not matching ANGLE_PATTERN, from parse_hex() list.
+        Same rules; each field is converted once. """
+    sign = -1 if hex_list[0].startswith("-") else 1
     try:
         if len(hex_list) == 1:
-            dec_degrees = float(hex_list[0])  # input assumed to be in degrees.
-        elif len(hex_list) == 2:
-            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0):
-                return None
-            # Here, input must be hex.
-            dec_degrees = sign * (abs(int(hex_list[0])) + int(hex_list[1])/60.0)
-        else:
-            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0) or\
-               (float(hex_list[2]) >= 60) or (float(hex_list[2]) < 0):
-                return None
-            dec_degrees = sign * (abs(int(hex_list[0])) + int(hex_list[1]) / 60.0 +
-                                  float(hex_list[2])/3600.0)  # input is hex.
+            return float(hex_list[0])  # input assumed to be in degrees.
+        whole, minutes = abs(int(hex_list[0])), int(hex_list[1])
+        if not (0 <= minutes < 60):
+            return None
+        if len(hex_list) == 2:
+            return sign * (whole + minutes / 60.0)
+        seconds = float(hex_list[2])
     except ValueError:
         return None
-    return dec_degrees
+    if (seconds >= 60) or (seconds < 0):
+        return None
+    return sign * (whole + minutes / 60.0 + seconds / 3600.0)
 
 
 def longitude_as_degrees(longitude_string):
@@ -146,31 +340,51 @@ def ra_as_degrees(ra_string):
     """ Converts RA string to degrees (float).
         Adapted from photrix.util August 2018; added return=None for
         unparseable string, or for minutes or seconds = negative or >=60.
+        Parses in a single pass (ANGLE_PATTERN) where possible.
     :param ra_string:
                string in hex ("12:34:56.7777" or "12 34 56.7777" or "12 34"),
                but not in degrees in this implementation.
     :return [float] Right Ascension in degrees between 0 and 360.
     """
-    hex_list = parse_hex(ra_string)
-    try:
-        if len(hex_list) == 1:
+    match = ANGLE_PATTERN.match(ra_string)
+    if match is None:
+        ra_degrees = _hex_list_as_ra_degrees(parse_hex(ra_string))
+    else:
+        sign, whole, _, minutes, seconds, _ = match.groups()
+        if minutes is None:
             return None  # input in degrees NOT allowed here.
-        elif len(hex_list) == 2:
-            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0):
-                return None
-            # next line: input assumed to be hex string.
-            ra_degrees = 15 * (int(hex_list[0]) + int(hex_list[1])/60.0)
+        minutes = int(minutes)
+        if minutes >= 60:
+            return None
+        if seconds is None:
+            ra_degrees = 15 * (int(sign + whole) + minutes / 60.0)
         else:
-            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0) or\
-               (float(hex_list[2]) >= 60) or (float(hex_list[2]) < 0):
+            seconds = float(seconds)
+            if seconds >= 60:
                 return None
-            ra_degrees = 15 * (int(hex_list[0]) + int(hex_list[1]) / 60.0 +
-                               float(hex_list[2])/3600.0)  # input assumed in hex.
+            ra_degrees = 15 * (int(sign + whole) + minutes / 60.0 + seconds / 3600.0)
+    if ra_degrees is None or (ra_degrees < 0) or (ra_degrees > 360):
+        return None
+    return ra_degrees
+
+
+def _hex_list_as_ra_degrees(hex_list):
+    """ RA in degrees (not range-checked) for text not matching ANGLE_PATTERN,
+        from parse_hex() list. Same rules as ra_as_degrees(); each field converted once. """
+    if len(hex_list) == 1:
+        return None  # input in degrees NOT allowed here.
+    try:
+        hours, minutes = int(hex_list[0]), int(hex_list[1])
+        if not (0 <= minutes < 60):
+            return None
+        if len(hex_list) == 2:
+            return 15 * (hours + minutes / 60.0)
+        seconds = float(hex_list[2])
     except ValueError:
         return None
-    if (ra_degrees < 0) or (ra_degrees > 360):
+    if (seconds >= 60) or (seconds < 0):
         return None
-    return ra_degrees
+    return 15 * (hours + minutes / 60.0 + seconds / 3600.0)
 
 
 def dec_as_degrees(dec_text):
@@ -178,6 +392,25 @@ def dec_as_degrees(dec_text):
     return latitude_as_degrees(dec_text)  # exactly the same math & limits.
 
 
+def az_as_degrees(az_text):
+    """ Wrapper function for hex_degrees_as_degrees(), interpreted as azimuth (as read from
+        a mount's setting circles), and handling faulty input.
+    :param az_text: in hex or degrees.
+    :return: [float] azimuth in degrees between 0 and 360, or None if not valid.
+    """
+    degrees = hex_degrees_as_degrees(az_text)
+    if degrees is None:
+        return None
+    if not (0 <= degrees <= 360):
+        return None
+    return degrees
+
+
+def alt_as_degrees(alt_text):
+    """ Simple wrapper (alias) for latitude_as_degrees(). """
+    return latitude_as_degrees(alt_text)  # exactly the same math & limits.
+
+
 def parse_sharpcap_platesolution_text(text: str):
     """ From text block output by SharpCap's plate solver (probably gotten from
         the Windows clipboard by get_clipboard()), return plate solution parameters.
@@ -186,28 +419,60 @@ def parse_sharpcap_platesolution_text(text: str):
         ra: Right Ascension in hours, hex format
         dec: Declination in degrees, hex format
         rotation: Rotation ("Orientation") in degrees East of North
+        or None if text is None or not a SharpCap plate solution.
     """
+    if text is None:
+        return None
     lines = [line for line in text.splitlines() if line.strip() != '']
     if len(lines) != 4:
         return None
-    ra_dec_strings = lines[0].split('=')
-    ra_string = ra_dec_strings[1].strip().split(',')[0].strip()
-    dec_string = ra_dec_strings[2].strip().split('(')[0].strip()
-    datetime_string = lines[2].split(',')[1].split("GMT")[0].strip()
-    datetime_iso_utc = datetime.strptime(datetime_string, "%d %b %Y %H:%M:%S")
-
-    # Special handling for SharpCap's "Orientation" text field:
-    raw_rot_value_string = lines[3].split("is")[1].strip().split()[0].strip()
-    raw_rot_direction_string = lines[3].split("degrees")[1].strip().split()[0].strip()
-    direction_is_west = (raw_rot_direction_string.upper() == "W")
-    if direction_is_west:
-        rotation_string = str(-float(raw_rot_value_string))
-    else:
-        rotation_string = raw_rot_value_string
+    return parse_sharpcap_platesolution_lines(lines)
+
+
+def parse_sharpcap_platesolution_lines(lines):
+    """ parse_sharpcap_platesolution_text() for a plate solution's 4 non-blank lines,
+        as already split (e.g., from a log by prepoint.sharpcap.iter_sharpcap_log()).
+    :param lines: the 4 non-blank lines of a SharpCap plate solution [list of strings].
+    :return: same as parse_sharpcap_platesolution_text().
+    """
+    try:
+        ra_dec_strings = lines[0].split('=')
+        ra_string = ra_dec_strings[1].strip().split(',')[0].strip()
+        dec_string = ra_dec_strings[2].strip().split('(')[0].strip()
+        datetime_string = lines[2].split(',')[1].split("GMT")[0].strip()
+        datetime_iso_utc = _sharpcap_datetime(datetime_string)
+
+        # Special handling for SharpCap's "Orientation" text field:
+        raw_rot_value_string = lines[3].split("is")[1].strip().split()[0].strip()
+        raw_rot_direction_string = lines[3].split("degrees")[1].strip().split()[0].strip()
+        direction_is_west = (raw_rot_direction_string.upper() == "W")
+        if direction_is_west:
+            rotation_string = str(-float(raw_rot_value_string))
+        else:
+            rotation_string = raw_rot_value_string
+    except (IndexError, ValueError):  # 4 lines, but not SharpCap's (e.g., other clipboard text).
+        return None
     # rotation_string is always plate rotation in degrees E of N:
     return datetime_iso_utc, ra_string, dec_string, rotation_string
 
 
+SHARPCAP_DATETIME_PATTERN = re.compile(r'([0-9]{2}) ([A-Z][a-z]{2}) ([0-9]{4}) '
+                                       r'([0-9]{2}):([0-9]{2}):([0-9]{2})\Z', re.ASCII)
+MONTH_NUMBERS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+
+def _sharpcap_datetime(datetime_string):
+    """ datetime.strptime(datetime_string, "%d %b %Y %H:%M:%S"), several times faster for
+        SharpCap's own form ("01 Sep 2018 03:58:12"); raises ValueError just as strptime. """
+    match = SHARPCAP_DATETIME_PATTERN.match(datetime_string)
+    if match is None or match.group(2) not in MONTH_NUMBERS:
+        return datetime.strptime(datetime_string, "%d %b %Y %H:%M:%S")
+    day, month, year, hour, minute, second = match.groups()
+    return datetime(int(year), MONTH_NUMBERS[month], int(day),
+                    int(hour), int(minute), int(second))
+
+
 RECAST_TO_TEXT___________________ = 0
 
 
@@ -263,13 +528,87 @@ def datetime_as_string(this_datetime):
 OTHER_UTILITIES___________________ = 0
 
 
+class ClipboardReader:
+    """ Reads clipboard text through one Tk root, kept for the reader's lifetime: the running
+        app's root if given, else a single hidden root made on first read (a Tk interpreter
+        costs far more to make than a clipboard read). new_text() returns text only when the
+        clipboard has changed, so it can be polled (e.g., by Tk after()) at short intervals;
+        on Windows, the clipboard sequence number makes each unchanged poll nearly free.
+    """
+    def __init__(self, root=None, sequence_number=None):
+        """
+        :param root: Tk root to read through, normally the app [tkinter.Tk object],
+               or None to make a hidden one when first needed.
+        :param sequence_number: returns a number that changes with each change to the
+               clipboard [callable], or None to use Windows' GetClipboardSequenceNumber
+               where available (elsewhere, new_text() must compare whole texts).
+        """
+        self._root = root
+        self._owns_root = False
+        self._sequence_number = sequence_number if sequence_number is not None \
+            else _windows_clipboard_sequence_number_function()
+        self._last_sequence_number = object()  # i.e., not yet read.
+        self._last_text = None
+
+    @property
+    def polls_cheaply(self):
+        """ True if unchanged clipboard is detected without reading its text. """
+        return self._sequence_number is not None
+
+    def read(self):
+        """ Returns clipboard contents as text, or None if clipboard holds no text.
+        :return: [string, or None]
+        """
+        from tkinter import Tk, TclError
+        if self._root is None:
+            self._root = Tk()
+            self._root.withdraw()
+            self._owns_root = True
+        try:
+            return self._root.clipboard_get()
+        except TclError:  # clipboard empty, or not text.
+            return None
+
+    def new_text(self):
+        """ Returns clipboard text if it has changed since the last call, else None.
+        :return: [string, or None]
+        """
+        if self._sequence_number is not None:
+            sequence_number = self._sequence_number()
+            if sequence_number == self._last_sequence_number:
+                return None
+            self._last_sequence_number = sequence_number
+        text = self.read()
+        if text is None or text == self._last_text:
+            return None
+        self._last_text = text
+        return text
+
+    def close(self):
+        """ Destroys hidden root, if this reader made one. """
+        if self._owns_root:
+            self._root.destroy()
+            self._root, self._owns_root = None, False
+
+
+def _windows_clipboard_sequence_number_function():
+    """ Returns Windows' GetClipboardSequenceNumber() as a callable, or None if not Windows. """
+    try:
+        import ctypes
+        return ctypes.windll.user32.GetClipboardSequenceNumber
+    except (ImportError, AttributeError):
+        return None
+
+
+_clipboard_reader = None  # shared by get_windows_clipboard() calls.
+
+
 def get_windows_clipboard():
     """ Returns string contents of current Windows clipboard.
+        Reads through one hidden Tk root kept between calls (see ClipboardReader).
     :return: [string]
     """
-    from tkinter import Tk
-    a = Tk()
-    clipboard = a.clipboard_get()
-    a.destroy()  # Do let's clean up after ourselves.
-    return clipboard
-
+    global _clipboard_reader
+    if _clipboard_reader is None:
+        _clipboard_reader = ClipboardReader()
+    return _clipboard_reader.read()
@@ -0,0 +1,122 @@
+""" watch.py
+    Watches the clipboard and (optionally) a SharpCap output directory for new plate
+    solutions, so that each plate solve reaches the app without copy-and-press."""
+
+import fnmatch
+import os
+import queue
+import threading
+
+import prepoint.util as u
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+DIRECTORY_POLL_SECONDS = 0.05
+DEFAULT_FILE_PATTERN = '*.txt'
+MAX_FILE_BYTES = 64 * 1024  # plate solution files are small; larger files are skipped.
+
+
+class PlateSolutionWatcher:
+    """ Collects new SharpCap plate solutions from clipboard and/or a directory, each
+        solution once only (deduplicated by its image timestamp, whichever source it
+        came from). Directory is scanned by a background thread, which reads only files
+        new or changed since its last scan; poll() is to be called from the Tk event loop
+        (e.g., by after()), which alone touches the clipboard, and never waits on the disk.
+    """
+    def __init__(self, clipboard_reader=None, directory=None, pattern=DEFAULT_FILE_PATTERN,
+                 poll_seconds=DIRECTORY_POLL_SECONDS):
+        """
+        :param clipboard_reader: reader to take new clipboard text from, or None
+               [util.ClipboardReader object].
+        :param directory: directory SharpCap writes plate solution text files to, or None
+               [string].
+        :param pattern: file name pattern of plate solution files in directory [string].
+        :param poll_seconds: interval between directory scans, in seconds [float].
+        """
+        self.clipboard_reader = clipboard_reader
+        self.directory = directory
+        self.pattern = pattern
+        self.poll_seconds = poll_seconds
+        self._seen_timestamps = set()
+        self._file_texts = queue.Queue()
+        self._file_states = {}  # path -> (mtime_ns, size) when last read.
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """ Starts background directory scanning (if there's a directory to scan). """
+        if self.directory is not None and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._scan_loop, daemon=True,
+                                            name='prepoint-directory-watch')
+            self._thread.start()
+
+    def stop(self):
+        """ Stops background directory scanning. """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def ignore_current(self):
+        """ Marks solutions now in clipboard and directory as already seen (not new).
+            Call before start(). """
+        texts = self._texts_now()
+        if self.clipboard_reader is not None:
+            texts.append(self.clipboard_reader.new_text())
+        self._new_solutions(texts)
+
+    def poll(self):
+        """ Returns plate solutions new since last poll, oldest image first.
+        :return: [list of tuples as from util.parse_sharpcap_platesolution_text()]
+        """
+        texts = []
+        if self.clipboard_reader is not None:
+            texts.append(self.clipboard_reader.new_text())
+        while True:
+            try:
+                texts.append(self._file_texts.get_nowait())
+            except queue.Empty:
+                break
+        return sorted(self._new_solutions(texts), key=lambda solution: solution[0])
+
+    def _new_solutions(self, texts):
+        """ Parses texts, returns solutions whose timestamps were not seen before. """
+        solutions = []
+        for text in texts:
+            solution = u.parse_sharpcap_platesolution_text(text)
+            if solution is not None and solution[0] not in self._seen_timestamps:
+                self._seen_timestamps.add(solution[0])
+                solutions.append(solution)
+        return solutions
+
+    def _texts_now(self):
+        """ Scans directory once; returns texts of files new or changed since last scan. """
+        texts = []
+        try:
+            entries = list(os.scandir(self.directory)) if self.directory is not None else []
+        except OSError:  # directory missing for now (e.g., not yet made by SharpCap).
+            return texts
+        for entry in entries:
+            if not fnmatch.fnmatch(entry.name, self.pattern):
+                continue
+            try:
+                stat = entry.stat()
+                state = (stat.st_mtime_ns, stat.st_size)
+                if not entry.is_file() or self._file_states.get(entry.path) == state:
+                    continue
+                self._file_states[entry.path] = state
+                if stat.st_size > MAX_FILE_BYTES:
+                    continue
+                with open(entry.path, 'r', encoding='utf-8', errors='replace') as f:
+                    texts.append(f.read())
+            except OSError:  # file vanished or locked mid-write; will retry if changed.
+                continue
+        return texts
+
+    def _scan_loop(self):
+        """ Background thread: scans directory every poll_seconds until stopped. """
+        while not self._stop.is_set():
+            for text in self._texts_now():
+                self._file_texts.put(text)
+            self._stop.wait(self.poll_seconds)
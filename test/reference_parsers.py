@@ -0,0 +1,55 @@
+""" reference_parsers.py
+    util's angle parsers as they were before ANGLE_PATTERN, verbatim: the reference for
+    test_prepoint.py's equivalence tests and bench_prepoint.py's parser benchmark."""
+
+import prepoint.util as u
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+
+def hex_degrees_as_degrees(hex_degrees_string):
+    hex_list = u.parse_hex(hex_degrees_string)
+    if hex_list[0].startswith("-"):
+        sign = -1
+    else:
+        sign = 1
+    try:
+        if len(hex_list) == 1:
+            dec_degrees = float(hex_list[0])  # input assumed to be in degrees.
+        elif len(hex_list) == 2:
+            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0):
+                return None
+            # Here, input must be hex.
+            dec_degrees = sign * (abs(int(hex_list[0])) + int(hex_list[1])/60.0)
+        else:
+            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0) or\
+               (float(hex_list[2]) >= 60) or (float(hex_list[2]) < 0):
+                return None
+            dec_degrees = sign * (abs(int(hex_list[0])) + int(hex_list[1]) / 60.0 +
+                                  float(hex_list[2])/3600.0)  # input is hex.
+    except ValueError:
+        return None
+    return dec_degrees
+
+
+def ra_as_degrees(ra_string):
+    hex_list = u.parse_hex(ra_string)
+    try:
+        if len(hex_list) == 1:
+            return None  # input in degrees NOT allowed here.
+        elif len(hex_list) == 2:
+            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0):
+                return None
+            # next line: input assumed to be hex string.
+            ra_degrees = 15 * (int(hex_list[0]) + int(hex_list[1])/60.0)
+        else:
+            if (int(hex_list[1]) >= 60) or (int(hex_list[1]) < 0) or\
+               (float(hex_list[2]) >= 60) or (float(hex_list[2]) < 0):
+                return None
+            ra_degrees = 15 * (int(hex_list[0]) + int(hex_list[1]) / 60.0 +
+                               float(hex_list[2])/3600.0)  # input assumed in hex.
+    except ValueError:
+        return None
+    if (ra_degrees < 0) or (ra_degrees > 360):
+        return None
+    return ra_degrees
@@ -1 +1,1036 @@
-__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
\ No newline at end of file
+import math
+import os
+import random
+import subprocess
+import sys
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+
+import prepoint.util as u
+import prepoint.batch as b
+from prepoint.moves import compute_moves
+from prepoint.mount import LEVEL_MOUNT, MountModel, RefineSession, fit_mount_model, \
+    mount_to_sky, sky_to_mount
+from prepoint.table import PointingTable
+from prepoint.watch import PlateSolutionWatcher
+from prepoint.sharpcap import iter_sharpcap_log
+from prepoint.stations import StationManager, moves_table
+from prepoint.chords import plan_chords, polyline_sites
+from prepoint.catalog import load_events, load_stations, screen_events, write_screening
+from prepoint.ui import Debouncer, FieldCache, UiCounters, countdown_text, live_readout, \
+    set_label_text
+import prepoint.__main__ as cli
+import prepoint.accuracy as accuracy
+from prepoint.service import PointingService, serve
+import prepoint.timing as timing
+import reference_parsers  # (in test/, alongside this file.)
+
+__author__ = "Eric Dose :: New Mexico Mira Project, Albuquerque"
+
+STATED_ACCURACY = 0.02  # degrees, per README.
+
+
+def _random_sky(n, seed=2018):
+    rng = np.random.default_rng(seed)
+    longitude = rng.uniform(-180, 180, n)
+    latitude = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    ra = rng.uniform(0, 360, n)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    datetimes = [datetime(2000, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=s)
+                 for s in rng.uniform(0, 50 * 365.25 * 86400, n)]
+    return longitude, latitude, ra, dec, datetimes
+
+
+def _angular_separation(az1, alt1, az2, alt2):
+    az1, alt1, az2, alt2 = np.radians([az1, alt1, az2, alt2])
+    cos_sep = np.sin(alt1) * np.sin(alt2) + np.cos(alt1) * np.cos(alt2) * np.cos(az1 - az2)
+    return np.degrees(np.arccos(np.clip(cos_sep, -1, 1)))
+
+
+def test_calc_az_alt_array_vs_calc_az_alt():
+    longitude, latitude, ra, dec, datetimes = _random_sky(2000)
+    expected = np.array([u.calc_az_alt(*args) for args in
+                         zip(longitude.tolist(), latitude.tolist(), ra.tolist(),
+                             dec.tolist(), datetimes)])
+    az, alt = b.calc_az_alt_array(longitude, latitude, ra, dec, datetimes)
+    assert az.shape == alt.shape == (2000,)
+    assert np.all((0 <= az) & (az < 360))
+    separation = _angular_separation(az, alt, expected[:, 0], expected[:, 1])
+    assert separation.max() < STATED_ACCURACY
+    assert np.percentile(separation, 99) < 0.001  # ~ 3.6 arcsec.
+
+
+def test_calc_az_alt_array_fast_tier():
+    longitude, latitude, ra, dec, datetimes = _random_sky(2000)
+    expected = np.array([u.calc_az_alt(*args) for args in
+                         zip(longitude.tolist(), latitude.tolist(), ra.tolist(),
+                             dec.tolist(), datetimes)])
+    az, alt = b.calc_az_alt_array(longitude, latitude, ra, dec, datetimes, tier='fast')
+    assert np.all((0 <= az) & (az < 360))
+    up = expected[:, 1] > 10
+    separation = _angular_separation(az, alt, expected[:, 0], expected[:, 1])[up]
+    assert separation.max() < 1.0 and np.median(separation) < 0.5  # see batch docstring.
+    try:
+        b.calc_az_alt_array(-106.5, 35.1, 100.0, 20.0, datetimes[0], tier='exact')
+        assert False, 'unknown tier'
+    except ValueError:
+        pass
+
+
+def test_accuracy_harness(tmp_path):
+    grid = accuracy.sky_grid(latitudes=(-90.0, -30.0, 0.0, 35.0, 90.0),
+                             decs=(-90.0, -20.0, 0.0, 45.0, 90.0),
+                             hour_angles=(-120.0, -0.01, 0.0, 0.01, 60.0, 180.0),
+                             ras=(0.0, 1e-6, 360.0 - 1e-6), dates=accuracy.GRID_DATES[::4])
+    assert grid.ra.shape == (2, 3, 5, 5, 6)
+    reference = accuracy.reference_az_alt(grid, processes=1)
+    i = (1, 2, 3, 2, 4)
+    assert np.allclose((reference[0][i], reference[1][i]),
+                       u.calc_az_alt(grid.longitude[i], grid.latitude[i], grid.ra[i],
+                                     grid.dec[i], grid.datetime_utc[i].tolist()))
+    pooled = accuracy.reference_az_alt(grid, processes=2, chunk_points=100)
+    assert np.array_equal(pooled[1], reference[1])
+    results = accuracy.compare_engines(grid, accuracy.ENGINES, reference)
+    assert [result.engine for result in results] == ['standard', 'fast']
+    standard = results[0]
+    assert standard.mapped.any() and not standard.mapped.all()
+    assert standard.errors_arcsec[standard.mapped].max() < accuracy.ERROR_LIMITS_ARCSEC['standard']
+    assert np.array_equal(standard.mapped, reference[1] >= 0)
+    # Seam: RA just either side of 0h/24h gives the same place:
+    assert np.allclose(reference[1][:, 1], reference[1][:, 2], atol=1e-6)
+    latitude_dec = standard.maps['latitude_dec']
+    assert latitude_dec['max_arcsec'].shape == (5, 5)
+    assert latitude_dec['count'].sum() == standard.mapped.sum()
+    assert np.all(np.isnan(latitude_dec['max_arcsec']) == (latitude_dec['count'] == 0))
+    assert np.nanmax(latitude_dec['max_arcsec']) == standard.errors_arcsec[standard.mapped].max()
+    assert np.all(np.nan_to_num(latitude_dec['p50_arcsec']) <=
+                  np.nan_to_num(latitude_dec['max_arcsec']))
+    assert 'standard' in accuracy.summary_text(grid, results)
+    accuracy.write_error_maps(str(tmp_path / 'maps.npz'), grid, results)
+    with np.load(str(tmp_path / 'maps.npz')) as columns:
+        assert np.array_equal(columns['axis_dec'], grid.axes['dec'])
+        assert columns['fast_ra_date_p99_arcsec'].shape == (3, 2)
+
+
+def test_calc_az_alt_array_broadcasts():
+    t = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    az, alt = b.calc_az_alt_array(-106.5, 35.1, 100.0, 20.0, t)
+    assert np.ndim(az) == np.ndim(alt) == 0
+    az_expected, alt_expected = u.calc_az_alt(-106.5, 35.1, 100.0, 20.0, t)
+    assert abs(az - az_expected) < STATED_ACCURACY
+    assert abs(alt - alt_expected) < STATED_ACCURACY
+    times = np.datetime64('2024-03-01T05:00:00') + np.arange(4) * np.timedelta64(60, 's')
+    az, alt = b.calc_az_alt_array([[-106.5], [-105.0], [10.0]], 35.1, 100.0, 20.0, times)
+    assert az.shape == alt.shape == (3, 4)
+    assert abs(az[0, 0] - az_expected) < STATED_ACCURACY
+    assert abs(alt[0, 0] - alt_expected) < STATED_ACCURACY
+
+
+def test_pointing_session_matches_calc_az_alt():
+    t_occ = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    t_image = datetime(2024, 3, 1, 4, 30, 0, tzinfo=timezone.utc)
+    session = u.PointingSession(-106.5, 35.1)
+    assert session.target_az_alt() is None
+    session.set_target(100.0, 20.0, t_occ)
+    assert session.target_az_alt() == u.calc_az_alt(-106.5, 35.1, 100.0, 20.0, t_occ)
+    assert session.plate_az_alt(98.0, 21.0, t_image) == \
+        u.calc_az_alt(-106.5, 35.1, 98.0, 21.0, t_image)
+    assert session.plate_az_alt(98.5, 21.0, t_occ) == \
+        u.calc_az_alt(-106.5, 35.1, 98.5, 21.0, t_occ)
+    assert session.target_az_alt() == u.calc_az_alt(-106.5, 35.1, 100.0, 20.0, t_occ)
+    session.set_site(10.0, -30.0)
+    assert session.target_az_alt() == u.calc_az_alt(10.0, -30.0, 100.0, 20.0, t_occ)
+    assert session.plate_az_alt(98.5, 21.0, t_occ) == \
+        u.calc_az_alt(10.0, -30.0, 98.5, 21.0, t_occ)
+
+
+def test_pointing_table_vs_calc_az_alt():
+    occ_time = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    start_time = occ_time - timedelta(hours=12, seconds=0.5)
+    for dec in (20.0, 80.0):  # dec 80 crosses az 0/360 (circumpolar, north meridian).
+        table = PointingTable(-106.5, 35.1, 100.0, dec, start_time, occ_time)
+        assert len(table) == 12 * 3600 + 2
+        assert table.az_alt(start_time - timedelta(seconds=2)) is None
+        assert table.az_alt(occ_time + timedelta(seconds=1)) is None
+        for seconds in np.linspace(0, 12 * 3600, 97):
+            t = occ_time - timedelta(seconds=seconds + 0.37)
+            az, alt = table.az_alt(t)
+            az_expected, alt_expected = u.calc_az_alt(-106.5, 35.1, 100.0, dec, t)
+            assert _angular_separation(az, alt, az_expected, alt_expected) < 0.001
+        az, alt = table.az_alt(occ_time)
+        assert (az, alt) == (float(table.az[-1]), float(table.alt[-1]))
+
+
+def test_pointing_table_file(tmp_path):
+    occ_time = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    table = PointingTable(-106.5, 35.1, 100.0, 20.0, occ_time - timedelta(hours=2, seconds=0.5),
+                          occ_time, cadence_seconds=2.0)
+    path = str(tmp_path / 'night.table')
+    table.save(path)
+    loaded = PointingTable.load(path)
+    assert os.path.getsize(path) == 128 + 8 * len(table)
+    assert not loaded.az.flags.owndata and not loaded.az.flags.writeable  # views of file.
+    assert (loaded.longitude, loaded.latitude, loaded.ra, loaded.dec, loaded.cadence_seconds) \
+        == (-106.5, 35.1, 100.0, 20.0, 2.0)
+    assert (loaded.start_utc, loaded.end_utc, len(loaded)) == \
+        (table.start_utc, table.end_utc, len(table))
+    assert np.array_equal(loaded.az, table.az) and np.array_equal(loaded.alt, table.alt)
+    for seconds in (0.0, 0.7, 3601.3, 7200.0):
+        t = table.start_utc + timedelta(seconds=seconds)
+        assert loaded.az_alt(t) == table.az_alt(t)
+    assert loaded.az_alt(occ_time + timedelta(seconds=1)) is None
+    (tmp_path / 'other.txt').write_bytes(b'RA=12:30:00' + bytes(200))
+    try:
+        PointingTable.load(str(tmp_path / 'other.txt'))
+        assert False, 'not a table file'
+    except ValueError:
+        pass
+
+
+def test_az_alt_cache():
+    t = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    cache = u.AzAltCache(max_size=2)
+    assert cache.az_alt(-106.5, 35.1, 100.0, 20.0, t) == \
+        u.calc_az_alt(-106.5, 35.1, 100.0, 20.0, t)
+    cache.az_alt(-106.5, 35.1, 100.0, 20.0, t)
+    cache.az_alt(-106.5, 35.1, 101.0, 20.0, t)
+    cache.az_alt(-106.5, 35.1, 100.0, 20.0, t)  # now most recently used.
+    cache.az_alt(-106.5, 35.1, 102.0, 20.0, t)  # evicts ra=101.
+    assert cache.cache_info() == u.CacheInfo(hits=2, misses=3, evictions=1,
+                                             size=2, max_size=2)
+    cache.az_alt(-106.5, 35.1, 100.0, 20.0, t)
+    assert cache.hits == 3
+    cache.az_alt(-106.5, 35.1, 101.0, 20.0, t)
+    assert cache.misses == 4
+    calls = []
+
+    def compute(*args):
+        calls.append(args)
+        return 1.0, 2.0
+    assert cache.az_alt(-106.5, 35.1, 103.0, 20.0, t, compute=compute) == (1.0, 2.0)
+    assert cache.az_alt(-106.5, 35.1, 103.0, 20.0, t, compute=compute) == (1.0, 2.0)  # hit.
+    assert calls == [(-106.5, 35.1, 103.0, 20.0, t)]
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_az_alt_cache_time_quantum():
+    t = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    cache = u.AzAltCache(time_quantum_seconds=1.0)
+    az_alt = cache.az_alt(-106.5, 35.1, 100.0, 20.0, t + timedelta(seconds=0.3))
+    assert az_alt == u.calc_az_alt(-106.5, 35.1, 100.0, 20.0, t)
+    cache.az_alt(-106.5, 35.1, 100.0, 20.0, t - timedelta(seconds=0.4))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_pointing_session_with_cache():
+    t_occ = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    cache = u.AzAltCache()
+    session = u.PointingSession(-106.5, 35.1, cache=cache)
+    session.set_target(100.0, 20.0, t_occ)
+    assert session.target_az_alt() == u.calc_az_alt(-106.5, 35.1, 100.0, 20.0, t_occ)
+    session.set_target(101.0, 20.0, t_occ)
+    session.set_target(100.0, 20.0, t_occ)
+    session.target_az_alt()
+    assert (cache.hits, cache.misses) == (1, 1)
+    t_image = t_occ - timedelta(minutes=20)  # misses computed with session's own objects:
+    assert session.plate_az_alt(99.0, 21.0, t_image) == \
+        u.calc_az_alt(-106.5, 35.1, 99.0, 21.0, t_image)
+    assert session._plate_ra_dec == (99.0, 21.0) and cache.misses == 2
+
+
+def _random_angle_texts(n, seed=2018):
+    """ Catalog-style angle texts, plus texts built from the tokens that trip parsers. """
+    rng = random.Random(seed)
+    tokens = ['0', '5', '12', '59', '60', '61', '123', '359', '1_0', '007', '-', '+', '.',
+              ':', ' ', '  ', '\t', '\n', 'e', 'E3', 'nan', 'inf', 'x', ',', '\u00a0', '\u0663']
+    texts = []
+    for _ in range(n):
+        form = rng.random()
+        if form < 0.5:
+            sign = rng.choice(['', '', '-', '+'])
+            separator = rng.choice([':', ' ', '  ', '\t', ' : ', ': '])
+            whole = rng.choice([rng.randint(0, 23), rng.randint(0, 400)])
+            fields = [str(whole), '{:02d}'.format(rng.randint(0, 65)),
+                      '{:0.{}f}'.format(rng.uniform(0, 61), rng.randint(0, 4))]
+            text = sign + separator.join(fields[:rng.randint(1, 3)])
+            if rng.random() < 0.3:
+                text = rng.choice(['', ' ', '  ']) + text + rng.choice(['', ' ', '\n'])
+        elif form < 0.6:
+            text = '{:.{}f}'.format(rng.uniform(-400, 400), rng.randint(0, 6))
+        else:
+            text = ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 8)))
+        texts.append(text)
+    return texts
+
+
+def _same(x, y):
+    if x is None or y is None:
+        return x is y
+    if math.isnan(x) or math.isnan(y):
+        return math.isnan(x) and math.isnan(y)
+    return x == y  # bit-identical floats required.
+
+
+def test_angle_parsers_equivalent_to_parse_hex_versions():
+    for text in _random_angle_texts(50000):
+        old_degrees = reference_parsers.hex_degrees_as_degrees(text)
+        assert _same(u.hex_degrees_as_degrees(text), old_degrees), repr(text)
+        assert _same(u.ra_as_degrees(text), reference_parsers.ra_as_degrees(text)), repr(text)
+        old_longitude = None if old_degrees is None or not (-180 <= old_degrees <= 180) \
+            else old_degrees
+        assert _same(u.longitude_as_degrees(text), old_longitude), repr(text)
+        old_latitude = None if old_degrees is None or not (-90 <= old_degrees <= 90) \
+            else old_degrees
+        assert _same(u.latitude_as_degrees(text), old_latitude), repr(text)
+        assert _same(u.dec_as_degrees(text), old_latitude), repr(text)
+
+
+def test_angle_texts_as_degrees_equivalent_to_util():
+    texts = _random_angle_texts(20000, seed=2019) + \
+        ['', '-0.0', '-0 00', '12.', '00000000000000000012', '1.00000000000000000000001',
+         '0.0000000000000000000000001', '12:30:nan', '24:00:00', '-00:30', '180.0000001']
+    for kind, function in (('longitude', u.longitude_as_degrees),
+                           ('latitude', u.latitude_as_degrees),
+                           ('ra', u.ra_as_degrees), ('dec', u.dec_as_degrees)):
+        degrees, valid = b.angle_texts_as_degrees(texts, kind)
+        for text, value, is_valid in zip(texts, degrees.tolist(), valid.tolist()):
+            expected = function(text)
+            assert is_valid == (expected is not None), (kind, repr(text))
+            if is_valid:
+                assert _same(value, expected) and \
+                    math.copysign(1, value) == math.copysign(1, expected), (kind, repr(text))
+            else:
+                assert math.isnan(value)
+    degrees, valid = b.angle_texts_as_degrees(np.array([[b'12:30', b'-12 30'],
+                                                         [b'-12.5', b'x']]), 'ra')
+    assert degrees.shape == valid.shape == (2, 2)
+    assert valid.tolist() == [[True, False], [False, False]]
+    assert degrees[0, 0] == 187.5
+    try:
+        b.angle_texts_as_degrees(['12:30'], 'azimuth')
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_formatter_arrays_identical_to_util():
+    rng = random.Random(2018)
+    angles = [rng.uniform(-400, 400) for _ in range(20000)] + \
+        [0.0, -0.0, 360.0, 359.99999999, -1e-9, 1e13, 1e20] + \
+        [(rng.randint(0, 1296000000) + rng.choice([-0.5, 0.5])) / 3600000 for _ in range(5000)]
+    for places in (0, 2, 3):
+        for angle, text in zip(angles, b.degrees_as_hex_array(angles, places).tolist()):
+            assert text == u.degrees_as_hex(angle, places), (angle, places)
+    for angle, text in zip(angles, b.ra_as_hours_array(angles).tolist()):
+        assert text == (u.ra_as_hours(angle) or ''), angle
+    assert b.ra_as_hours_array([[359.9999999, float('nan')]]).tolist() == \
+        [['00:00:00.000', '']]
+    start = datetime(2018, 9, 1, tzinfo=timezone.utc)
+    times = [start + timedelta(seconds=rng.uniform(-1e10, 1e9)) for _ in range(5000)] + \
+        [datetime(999, 12, 31, 23, 59, 59, 999999), None, 'x',
+         datetime(2020, 1, 1, tzinfo=timezone(timedelta(hours=5)))]
+    for this_datetime, text in zip(times, b.datetime_as_string_array(times).tolist()):
+        assert text == (u.datetime_as_string(this_datetime) or ''), this_datetime
+    naive_times = [t.replace(tzinfo=None) for t in times[:5000]]
+    assert b.datetime_as_string_array(np.array(naive_times, dtype='datetime64[us]')).tolist() \
+        == [u.datetime_as_string(t) for t in naive_times]
+
+
+def test_angle_parsers_single_pass_cases():
+    assert u.ANGLE_PATTERN.match('-12:34:56.78') is not None
+    assert u.ANGLE_PATTERN.match(' 12 34 56 ') is not None
+    assert u.ANGLE_PATTERN.match('-24.55') is not None
+    assert u.hex_degrees_as_degrees('-12:30') == -12.5
+    assert u.hex_degrees_as_degrees('-0 30') == -0.5
+    assert u.hex_degrees_as_degrees('12:60') is None
+    assert u.hex_degrees_as_degrees('12:30:60') is None
+    assert u.ra_as_degrees('12:00:00') == 180.0
+    assert u.ra_as_degrees('24:00:00.1') is None
+    assert u.ra_as_degrees('-0 30') == 7.5
+    assert u.ra_as_degrees('180.0') is None
+    assert u.az_as_degrees('271:30') == 271.5 and u.az_as_degrees('-0.5') is None
+    assert u.alt_as_degrees('45.25') == 45.25 and u.alt_as_degrees('91') is None
+
+
+def test_compute_moves():
+    site, target = (-105.5, 35.1), (188.7, 23.75)
+    occ_time = datetime(2018, 9, 1, 4, 30, tzinfo=timezone.utc)
+    image_time = datetime(2018, 9, 1, 3, 58, 12, tzinfo=timezone.utc)
+    moves = compute_moves(site, target, occ_time, 187.5, 23.0, image_time)
+    az_now, alt_now = u.calc_az_alt(*site, 187.5, 23.0, image_time)
+    az_occ, alt_occ = u.calc_az_alt(*site, *target, occ_time)
+    assert (moves.az_now, moves.alt_now, moves.az_occ, moves.alt_occ) == \
+        (az_now, alt_now, az_occ, alt_occ)
+    assert moves.az_rightward == az_occ - az_now and moves.left_right == 'RIGHT'
+    assert moves.alt_upward == alt_occ - alt_now and moves.up_down == 'LOWER'
+    session = u.PointingSession()
+    assert compute_moves(site, target, occ_time, 187.5, 23.0, image_time, session) == moves
+    assert session.site == site
+    assert compute_moves(site, target, occ_time, az_occ, alt_occ, occ_time).left_right in \
+        ('LEFT', 'RIGHT', '(ok now)')
+
+
+def test_mount_model_and_refine_session():
+    import ephem
+    mount = MountModel(12.0, -1.5, 1.2, -0.8, 0.0, 0)  # az & alt zero points, base tilt.
+    rng = np.random.default_rng(2018)
+    mount_az, mount_alt = rng.uniform(0, 360, 30), rng.uniform(15, 80, 30)
+    sky_az, sky_alt = mount_to_sky(mount, mount_az, mount_alt)
+    back_az, back_alt = sky_to_mount(mount, sky_az, sky_alt)
+    assert np.allclose(back_az, mount_az) and np.allclose(back_alt, mount_alt)
+    fit = fit_mount_model(mount_az, mount_alt, sky_az + rng.normal(0, 0.01, 30),
+                          sky_alt + rng.normal(0, 0.01, 30))
+    assert np.allclose(fit[:4], mount[:4], atol=0.01)
+    assert 0.005 < fit.rms_residual < 0.02 and fit.n_solutions == 30
+    one = fit_mount_model(mount_az[:1], mount_alt[:1], sky_az[:1], sky_alt[:1])
+    assert (one.tilt_north, one.tilt_east) == (0.0, 0.0) and one.rms_residual < 1e-6
+
+    # Refine cycles on a mount as above, its own az/alt read at each image:
+    site, target = (-106.5, 35.1), (100.0, 20.0)
+    occ_time = datetime(2024, 3, 1, 5, 0, tzinfo=timezone.utc)
+    observer = ephem.Observer()
+    observer.lon, observer.lat = math.radians(site[0]), math.radians(site[1])
+
+    def plate_solution(mount_az_alt, image_time):
+        observer.date = image_time
+        ra, dec = observer.radec_of(*np.radians(mount_to_sky(mount, *mount_az_alt)).tolist())
+        return math.degrees(ra), math.degrees(dec), image_time  # J2000, observer's epoch.
+
+    target_az_alt = u.calc_az_alt(*site, *target, occ_time)
+
+    def error(mount_az_alt):  # how far scope is from target at occ time, in degrees.
+        return _angular_separation(*mount_to_sky(mount, *mount_az_alt), *target_az_alt)
+
+    session = RefineSession(site, target, occ_time)
+    scope = (200.0, 40.0)
+    errors = []
+    for cycle in range(4):
+        solution = plate_solution(scope, occ_time - timedelta(minutes=30 - cycle))
+        session.add_plate_solution(*solution, *scope)
+        session.add_plate_solution(*solution, *scope)  # recalculated: not added again.
+        read = scope
+        moves = session.compute_moves()
+        if cycle == 0:  # with one plate solution, same as without a mount model:
+            plain = compute_moves(site, target, occ_time, *solution)
+            assert np.allclose(moves[:6], plain[:6]) and moves[6:] == plain[6:]
+        errors.append(error(scope))
+        scope = ((scope[0] + moves.az_rightward) % 360.0, scope[1] + moves.alt_upward)
+    errors.append(error(scope))
+    session.add_plate_solution(*solution)  # latest's mount az/alt withdrawn: plain move.
+    assert np.allclose(session.compute_moves()[:6],
+                       compute_moves(site, target, occ_time, *solution)[:6])
+    session.add_plate_solution(*solution, *read)
+    assert len(session) == 4
+    assert errors[0] > 10 and max(errors[2:]) < 0.001
+    # Mount's zero points are as read, and its tilt absolute:
+    fit = session.fit()
+    assert abs(fit.az_zero - 12.0) < 0.2 and abs(fit.alt_zero + 1.5) < 0.1
+    assert abs(fit.tilt_north - 1.2) < 0.2 and abs(fit.tilt_east + 0.8) < 0.4
+
+    # Mount not read, each hand move off by up to 20% (and one image re-solved unmoved):
+    # the latest plate solution alone gives each move.
+    session = RefineSession(site, target, occ_time)
+    scope, image_time = (200.0, 40.0), occ_time - timedelta(minutes=30)
+    errors = []
+    for cycle in range(6):
+        solution = plate_solution(scope, image_time + timedelta(minutes=cycle))
+        session.add_plate_solution(*solution)
+        moves = session.compute_moves()
+        assert np.allclose(moves[:6], compute_moves(site, target, occ_time, *solution)[:6])
+        errors.append(error(scope))
+        if cycle != 2:
+            scope = ((scope[0] + rng.uniform(0.8, 1.2) * moves.az_rightward) % 360.0,
+                     scope[1] + rng.uniform(0.8, 1.2) * moves.alt_upward)
+    assert session.fit() == LEVEL_MOUNT
+    assert errors[0] > 10 and errors[2] == errors[3] and errors[-1] < 0.01 * errors[0]
+    assert all(later < earlier for earlier, later in zip(errors[3:], errors[4:]))
+    try:
+        RefineSession(site, target, occ_time).compute_moves()
+        assert False, 'no plate solution'
+    except ValueError:
+        pass
+
+
+def test_station_manager():
+    occ_time = datetime(2018, 9, 1, 4, 30, 0, tzinfo=timezone.utc)
+    manager = StationManager()
+    manager.add_station('A', -105.5, 35.1)
+    try:
+        manager.compute_moves()
+        assert False, 'target not set'
+    except ValueError:
+        pass
+    manager.set_target(188.7, 23.75, occ_time)
+    sites = {'A': (-105.5, 35.1), 'B': (-105.3, 35.0), 'C': (-104.9, 34.8)}
+    for name, (longitude, latitude) in sites.items():
+        manager.add_station(name, longitude, latitude)
+    image_time = occ_time - timedelta(hours=1)
+    manager.set_plate_solution('A', 187.5, 23.0, image_time)
+    manager.set_plate_solution('C', 190.0, 24.0, image_time + timedelta(minutes=3))
+    rows = manager.compute_moves()
+    assert [row.station.name for row in rows] == ['A', 'B', 'C'] and rows[1].moves is None
+    for row in rows:
+        if row.moves is None:
+            continue
+        station = row.station
+        expected = compute_moves((station.longitude, station.latitude), (188.7, 23.75),
+                                 occ_time, station.plate_ra, station.plate_dec,
+                                 station.image_time)
+        assert _angular_separation(row.az_occ, row.alt_occ,
+                                   expected.az_occ, expected.alt_occ) < STATED_ACCURACY
+        assert abs(row.moves.az_rightward - expected.az_rightward) < 2 * STATED_ACCURACY
+        assert abs(row.moves.alt_upward - expected.alt_upward) < 2 * STATED_ACCURACY
+        assert (row.moves.left_right, row.moves.up_down) == \
+            (expected.left_right, expected.up_down)
+    table_lines = moves_table(rows).splitlines()
+    assert len(table_lines) == 4 and table_lines[2].startswith('B') and '---' in table_lines[2]
+    manager.remove_station('B')
+    assert len(manager) == 2
+
+
+def test_plan_chords():
+    occ_time = datetime(2018, 9, 1, 4, 30, 0, tzinfo=timezone.utc)
+    longitudes, latitudes = polyline_sites([-108.0, -105.0, -100.0], [30.0, 35.0, 35.0], 25.0)
+    assert (longitudes[0], latitudes[0], longitudes[-1], latitudes[-1]) == \
+        (-108.0, 30.0, -100.0, 35.0)
+    assert -105.0 in longitudes
+    steps_km = 111.2 * np.hypot(np.diff(latitudes),
+                                np.diff(longitudes) * np.cos(np.radians(latitudes[1:])))
+    assert steps_km.max() <= 25.0 * 1.01 and steps_km.min() > 20.0
+    plan = plan_chords(longitudes, latitudes, 188.7, 23.75, occ_time, min_altitude=-5.0)
+    for i in range(0, len(longitudes), 7):
+        az, alt = u.calc_az_alt(longitudes[i], latitudes[i], 188.7, 23.75, occ_time)
+        assert _angular_separation(plan.az[i], plan.alt[i], az, alt) < STATED_ACCURACY
+    assert np.array_equal(plan.too_low, plan.alt < -5.0)
+    assert plan.too_low.any() and not plan.too_low.all()  # target setting along the line.
+    assert len(polyline_sites([-106.0], [35.0], 10.0)[0]) == 1
+
+
+def test_catalog_screening(tmp_path):
+    events_path, stations_path = tmp_path / 'events.csv', tmp_path / 'stations.csv'
+    events_path.write_text('name,ra,dec,occ_time,mag\n'
+                           '(1) Ceres,12:34:48,+23:45:00,2018-09-01T04:30:00,11.2\n'
+                           'bad ra,25:00:00,+23:45:00,2018-09-01T04:30:00,11.2\n'
+                           '(2) Pallas,20:00:00,30.0,2018-09-01T04:30:00Z,12.0\n'
+                           'bad time,20:00:00,30.0,2018-09-01 junk,12.0\n'
+                           '(3) Juno,20:00:00,-10:00:00,2018-09-02T03:00:00,10.5\n')
+    stations_path.write_text('name,longitude,latitude\nABQ,-106:39:00,35:05:00\n'
+                             'Sydney,151.2,-33.9\n')
+    malformed = []
+    events = load_events(str(events_path), malformed)
+    stations = load_stations(str(stations_path))
+    assert list(events.name) == ['(1) Ceres', '(2) Pallas', '(3) Juno'] and malformed == [3, 5]
+    assert list(stations.name) == ['ABQ', 'Sydney'] and stations.longitude[0] == -106.65
+    screening = screen_events(events, stations, min_altitude=20.0, processes=1)
+    assert screening.alt.shape == (3, 2) and screening.alt.dtype == np.float32
+    for i in range(3):
+        occ_time = events.occ_time[i].astype(datetime).replace(tzinfo=timezone.utc)
+        for j in range(2):
+            az, alt = u.calc_az_alt(stations.longitude[j], stations.latitude[j],
+                                    events.ra[i], events.dec[i], occ_time)
+            assert _angular_separation(screening.az[i, j], screening.alt[i, j], az, alt) < \
+                STATED_ACCURACY
+            assert screening.high_enough[i, j] == (screening.alt[i, j] >= 20.0)
+    pooled = screen_events(events, stations, min_altitude=20.0, processes=2, chunk_events=2)
+    assert np.array_equal(pooled.alt, screening.alt) and np.array_equal(pooled.az, screening.az)
+    fast = screen_events(events, stations, min_altitude=20.0, processes=1, tier='fast')
+    up = screening.alt > 10
+    assert np.abs(fast.alt - screening.alt)[up].max() < 1.0  # see batch docstring.
+    write_screening(str(tmp_path / 'screening.npz'), screening)
+    with np.load(str(tmp_path / 'screening.npz')) as columns:
+        assert np.array_equal(columns['alt'], screening.alt)
+        assert list(columns['station_name']) == ['ABQ', 'Sydney']
+
+
+def test_cli(capsys, monkeypatch):
+    import io
+    import json
+    arguments = ['--longitude=-105:30:00', '--latitude=35:06:00', '--ra=12:34:48',
+                 '--dec=+23:45:00', '--occ-time=2018-09-01T04:30:00', '--plate-ra=12:30:00',
+                 '--plate-dec=+23:00:00', '--image-time=2018-09-01T03:58:12']
+    assert cli.main(arguments) == 0
+    result = json.loads(capsys.readouterr().out)
+    moves = compute_moves((-105.5, 35.1), (188.7, 23.75),
+                          datetime(2018, 9, 1, 4, 30, tzinfo=timezone.utc), 187.5, 23.0,
+                          datetime(2018, 9, 1, 3, 58, 12, tzinfo=timezone.utc))
+    assert result['az_rightward'] == moves.az_rightward
+    assert result['up_down'] == moves.up_down
+    monkeypatch.setattr('sys.stdin', io.StringIO('{"plate_dec": 23.0}\n[1]\n{"ra": "x"}\n'))
+    assert cli.main(arguments + ['--stream']) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert lines[0] == result
+    assert 'error' in lines[1] and 'ra' in lines[2]['error']
+    # Numbers are held to the same limits as text, and must be finite:
+    monkeypatch.setattr('sys.stdin', io.StringIO('{"latitude": 95}\n{"longitude": 500.0}\n'
+                                                 '{"ra": 1000}\n{"dec": -200}\n'
+                                                 '{"plate_dec": NaN}\n{"ra": 360}\n'))
+    assert cli.main(arguments + ['--stream']) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line.get('error', '').split()[0] for line in lines[:5]] == \
+        ['latitude', 'longitude', 'ra', 'dec', 'plate_dec']
+    assert 'error' not in lines[5]
+
+
+def test_pointing_service():
+    import asyncio
+    import json
+    moves_request = {'longitude': '-105:30:00', 'latitude': '35:06:00', 'ra': '12:34:48',
+                     'dec': '+23:45:00', 'occ_time': '2018-09-01T04:30:00',
+                     'plate_ra': '12:30:00', 'plate_dec': 23.0,
+                     'image_time': '2018-09-01T03:58:12'}
+    t = datetime(2024, 3, 1, 5, 0, 0, tzinfo=timezone.utc)
+    service = PointingService()
+
+    async def client(port, requests):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for request in requests:  # all sent before any response is read.
+            writer.write((request if isinstance(request, str) else json.dumps(request))
+                         .encode() + b'\n')
+        await writer.drain()
+        lines = [await reader.readline() for _ in requests]
+        assert not any(b'NaN' in line for line in lines)  # not JSON: never sent.
+        responses = [json.loads(line) for line in lines]
+        writer.close()
+        await writer.wait_closed()
+        return responses
+
+    async def run():
+        server = await serve(port=0, service=service)
+        port = server.sockets[0].getsockname()[1]
+        requests = [[{'id': [i, j], 'op': 'az_alt', 'longitude': -106.5 + i, 'latitude': 35.1,
+                      'ra': 100.0 + j, 'dec': 20.0, 'time': t.isoformat()}
+                     for j in range(20)] for i in range(3)]
+        requests[0] += [dict(moves_request, id='moves'), 'not json', {'id': 'bad', 'op': 'x'},
+                        {'id': 'short', 'op': 'az_alt', 'ra': 1.0},
+                        dict(requests[1][0], id='latitude', latitude=95.0),
+                        dict(moves_request, id='ra', ra=1000),
+                        dict(requests[1][0], id='nan', longitude=float('nan')),
+                        dict(requests[1][0], id=float('nan'))]
+        responses = await asyncio.gather(*(client(port, these) for these in requests))
+        server.close()
+        await server.wait_closed()
+        return requests, responses
+
+    requests, responses = asyncio.run(run())
+    by_id = {json.dumps(response.get('id')): response for these in responses for response in these}
+    for i in range(3):
+        for j in range(20):
+            response = by_id[json.dumps([i, j])]
+            expected = u.calc_az_alt(-106.5 + i, 35.1, 100.0 + j, 20.0, t)
+            assert _angular_separation(response['az'], response['alt'], *expected) < 0.001
+    moves = by_id['"moves"']
+    expected = cli._moves_for_inputs(moves_request)
+    assert abs(moves['az_rightward'] - expected['az_rightward']) < 0.001
+    assert abs(moves['alt_upward'] - expected['alt_upward']) < 0.001
+    assert (moves['left_right'], moves['up_down'], moves['occ_time']) == \
+        (expected['left_right'], expected['up_down'], expected['occ_time'])
+    assert 'error' in by_id['null'] and by_id['"bad"']['error'] == "op not valid: 'x'"
+    assert by_id['"short"']['error'] == 'missing longitude'
+    assert by_id['"latitude"']['error'] == 'latitude not valid: 95.0'
+    assert by_id['"ra"']['error'] == 'ra not valid: 1000'
+    assert by_id['"nan"']['error'] == 'longitude not valid: nan'
+    assert [response['error'][:23] for response in responses[0] if 'id' not in response] == \
+        ['Expecting value: line 1', 'response not valid JSON']
+    assert sum(service.batch_sizes) == 62 and max(service.batch_sizes) > 20  # batched.
+    assert 'az_alt' in service.report() and 'moves' in service.report()
+
+    class Reader:  # stands in for a connection's reader, at server shutdown.
+        async def readline(self):
+            raise asyncio.CancelledError
+
+    class Writer:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    writer = Writer()
+    asyncio.run(service.handle_client(Reader(), writer))  # returns, without traceback.
+    assert writer.closed
+
+
+HEAVY_MODULES = ('ephem', 'tkinter', 'numpy')  # not to be imported by the light modules.
+IMPORT_TIME_LIMIT_MS = 4 * 50  # loose multiple of bench's IMPORT_BUDGET_MS, not to flake.
+
+
+def _heavy_modules_imported(module_name):
+    """ Returns which of HEAVY_MODULES get imported with module, in a fresh interpreter. """
+    code = 'import sys, {}; print(",".join(m for m in {!r} if m in sys.modules))'
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    completed = subprocess.run([sys.executable, '-c', code.format(module_name, HEAVY_MODULES)],
+                               cwd=root, capture_output=True, text=True, check=True)
+    return completed.stdout.strip()
+
+
+def _import_milliseconds(module_name):
+    """ Returns cumulative import time of module, in a fresh interpreter (python -X importtime). """
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                                'import ' + module_name],
+                               cwd=root, capture_output=True, text=True, check=True)
+    for line in completed.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module_name:
+            return int(fields[1]) / 1000.0
+    raise ValueError('no import time for ' + module_name)
+
+
+def test_timing():
+    import types
+    module = types.ModuleType('timed_module')
+    exec('def square(x):\n    return x * x\n\ndef fail():\n    raise ValueError()\n',
+         module.__dict__)
+
+    class Callbacks:
+        def __init__(self):
+            self.presses = 0
+
+        def pressed(self):
+            self.presses += 1
+            return module.square(self.presses)
+
+    plain_square = module.square
+    timings = timing.Timings()
+    timing.instrument_module(module, timings)
+    timing.instrument_class(Callbacks, timings)
+    timing.instrument_module(module, timings)  # again: not wrapped twice.
+    assert module.square is not plain_square and module.square.__name__ == 'square'
+    callbacks = Callbacks()
+    assert [callbacks.pressed() for _ in range(3)] == [1, 4, 9]
+    try:
+        module.fail()
+    except ValueError:
+        pass
+    rows = {row['name']: row for row in timings.summary()}
+    assert rows['timed_module.square']['calls'] == 3 and rows['Callbacks.pressed']['calls'] == 3
+    assert rows['timed_module.fail']['calls'] == 1
+    row = rows['Callbacks.pressed']
+    assert 0 < row['p50_us'] <= row['p90_us'] <= row['p99_us'] <= row['max_us']
+    assert rows['Callbacks.pressed']['total_ms'] >= rows['timed_module.square']['total_ms']
+    assert timings.report().splitlines()[0].startswith('prepoint timing')
+    assert timing.enable_from_environment((module,)) is None  # not set in tests.
+
+
+def test_util_imports_light():
+    # (Import times against the budget itself are in bench/bench_prepoint.py.)
+    for module_name in ('prepoint.util', 'prepoint.moves', 'prepoint.__main__'):
+        assert _heavy_modules_imported(module_name) == '', module_name
+    milliseconds = _import_milliseconds('prepoint.util')
+    assert 0 < milliseconds < IMPORT_TIME_LIMIT_MS, milliseconds
+
+
+SHARPCAP_TEXT = """RA=12:30:00.0, Dec=+23:00:00 (J2000)
+Solved using 48 stars
+Image taken at 2018-09-01, 01 Sep 2018 03:58:12 GMT
+Orientation is 1.5 degrees W of North
+"""
+
+
+def test_clipboard_reader():
+    import tkinter
+
+    class Root:  # stands in for the app's Tk root.
+        def __init__(self):
+            self.text, self.reads = None, 0
+
+        def clipboard_get(self):
+            self.reads += 1
+            if self.text is None:
+                raise tkinter.TclError('CLIPBOARD selection doesn\'t exist')
+            return self.text
+
+    root = Root()
+    reader = u.ClipboardReader(root, sequence_number=lambda: None)
+    assert reader.polls_cheaply
+    assert reader.read() is None and reader.new_text() is None
+    root.text = SHARPCAP_TEXT
+    assert reader.read() == SHARPCAP_TEXT
+    assert reader.new_text() is None and root.reads == 3  # sequence number unchanged.
+
+    sequence = [0]
+    reader = u.ClipboardReader(root, sequence_number=lambda: sequence[0])
+    assert reader.new_text() == SHARPCAP_TEXT
+    root.reads = 0
+    assert reader.new_text() is None and root.reads == 0
+    sequence[0] += 1
+    assert reader.new_text() is None and root.reads == 1  # same text copied again.
+    root.text, sequence[0] = 'other', 2
+    assert reader.new_text() == 'other'
+    assert u.parse_sharpcap_platesolution_text('a\nb\nc\nd') is None
+    assert u.parse_sharpcap_platesolution_text(None) is None
+    assert u.parse_sharpcap_platesolution_text(SHARPCAP_TEXT) == \
+        (datetime(2018, 9, 1, 3, 58, 12), '12:30:00.0', '+23:00:00', '-1.5')
+
+
+def test_plate_solution_watcher(tmp_path):
+    import time
+
+    class Reader:  # stands in for util.ClipboardReader.
+        def __init__(self):
+            self.texts = []
+
+        def new_text(self):
+            return self.texts.pop(0) if self.texts else None
+
+    def solution_text(seconds):
+        return SHARPCAP_TEXT.replace('03:58:12', '03:58:{:02d}'.format(seconds))
+
+    reader = Reader()
+    (tmp_path / 'old.txt').write_text(solution_text(1))
+    reader.texts = [solution_text(2)]
+    watcher = PlateSolutionWatcher(reader, str(tmp_path), poll_seconds=0.01)
+    watcher.ignore_current()
+    assert watcher.poll() == []
+
+    reader.texts = [solution_text(2), 'not a solution', solution_text(3)]  # 2 already seen.
+    assert [[s[0].second for s in watcher.poll()] for _ in range(4)] == [[], [], [3], []]
+    reader.texts = [solution_text(5)]
+    (tmp_path / 'a.txt').write_text(solution_text(4))
+    (tmp_path / 'b.txt').write_text(solution_text(5))  # same image as clipboard's.
+    (tmp_path / 'c.log').write_text(solution_text(6))  # doesn't match pattern.
+    watcher.start()
+    try:
+        solutions = []
+        for _ in range(200):
+            solutions.extend(watcher.poll())
+            if len(solutions) >= 2:
+                break
+            time.sleep(0.01)
+        time.sleep(0.05)
+        solutions.extend(watcher.poll())
+    finally:
+        watcher.stop()
+    assert sorted(s[0].second for s in solutions) == [4, 5]
+
+
+def test_iter_sharpcap_log(tmp_path):
+    blocks = [SHARPCAP_TEXT.replace('03:58:12', '03:58:{:02d}'.format(i)) for i in range(4)]
+    log_text = 'SharpCap log\r\n\n' + blocks[0] + '\n' + \
+        blocks[1].replace('01 Sep 2018', '31 Feb 2018') + \
+        'RA=12:00:00, Dec=+10:00:00 (J2000)\nshort block\n' + \
+        blocks[2] + 'noise\n' + blocks[3] + blocks[0].splitlines()[0]
+    path = tmp_path / 'sharpcap.log'
+    path.write_text(log_text)
+    lines = log_text.splitlines()
+    for use_mmap in (True, False):
+        malformed = []
+        solutions = list(iter_sharpcap_log(str(path), malformed, use_mmap=use_mmap))
+        assert solutions == [u.parse_sharpcap_platesolution_text(block)
+                             for block in (blocks[0], blocks[2], blocks[3])]
+        assert malformed == [8, lines.index('RA=12:00:00, Dec=+10:00:00 (J2000)') + 1,
+                             len(lines)]
+        assert solutions[0].datetime_utc.second == 0
+    (tmp_path / 'empty.log').write_text('')
+    assert list(iter_sharpcap_log(str(tmp_path / 'empty.log'))) == []
+
+
+def test_ui_debounce_and_incremental_updates():
+    import itertools
+    scheduled, after_ids = {}, itertools.count()  # standing in for Tk's after() queue.
+
+    def after(milliseconds, function):
+        after_id = next(after_ids)
+        scheduled[after_id] = function
+        return after_id
+
+    runs = []
+
+    def update_site_area():
+        runs.append('site')
+
+    def update_target_area():
+        runs.append('target')
+
+    debouncer = Debouncer(after, lambda after_id: scheduled.pop(after_id))
+    for _ in range(5):  # a burst of keystrokes.
+        debouncer.call(update_site_area)
+    debouncer.call(update_target_area)
+    assert len(scheduled) == 2
+    next(iter(scheduled.values()))()  # as Tk would run it, after the delay.
+    assert runs == ['site']
+    debouncer.flush()
+    assert runs == ['site', 'target']
+    debouncer.flush()
+    assert len(runs) == 2
+
+    clock = iter([10.0, 10.5, 11.0])
+    counters = UiCounters(clock=lambda: next(clock))
+    cache = FieldCache(counters)
+    assert cache.parsed('ra', '12:30', u.ra_as_degrees) == 187.5
+    assert cache.parsed('ra', '12:30', u.ra_as_degrees) == 187.5
+    assert cache.parsed('dec', '12:30', u.dec_as_degrees) == 12.5
+    assert counters.recomputes == 2
+
+    label = {'text': ''}
+    assert set_label_text(label, 'x', counters) and not set_label_text(label, 'x', counters)
+    assert label['text'] == 'x' and (counters.label_writes, counters.label_writes_skipped) == \
+        (1, 1)
+    assert counters.rates() is None
+    for _ in range(3):
+        counters.callback()
+    assert counters.rates() == {'callbacks': 3.0, 'recomputes': 2.0, 'label_writes': 1.0,
+                                'label_writes_skipped': 1.0}
+
+
+class _Var:  # stands in for tk.StringVar, with its trace.
+    def __init__(self, on_change):
+        self.value, self.on_change = '', on_change
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        self.on_change()
+
+
+class _Widget(dict):  # stands in for a Tk label, entry or button.
+    def __init__(self):
+        super().__init__(text='')
+        self.states = []
+
+    def state(self, states):
+        self.states = states
+
+
+APP_WIDGETS = ('longitude_entry', 'latitude_entry', 'button_site_lock', 'button_site_unlock',
+               'longitude_ok_label', 'site_readback_longitude_hex',
+               'site_readback_longitude_decimal', 'latitude_ok_label',
+               'site_readback_latitude_hex', 'site_readback_latitude_decimal',
+               'target_ra_entry', 'target_dec_entry', 'occ_time_entry', 'button_target_lock',
+               'button_target_unlock', 'target_ra_ok_label', 'target_readback_ra_hex',
+               'target_readback_ra_decimal', 'target_dec_ok_label', 'target_readback_dec_hex',
+               'target_readback_dec_decimal', 'occ_time_ok_label', 'target_readback_occ_time',
+               'target_readback_az', 'target_readback_alt', 'label_image_datetime',
+               'sharpcap_time_value', 'sharpcap_ra_value', 'sharpcap_dec_value',
+               'sharpcap_rot_value', 'plate_ra_ok_label', 'plate_readback_ra_hex',
+               'plate_readback_ra_decimal', 'plate_dec_ok_label', 'plate_readback_dec_hex',
+               'plate_readback_dec_decimal', 'mount_az_ok_label', 'mount_alt_ok_label',
+               'button_calc_moves', 'left_right_label',
+               'left_right_distance_label', 'left_right_degrees', 'up_down_label',
+               'up_down_distance_label', 'up_down_degrees')
+
+
+def _app_without_tk():
+    """ Returns the app, its widgets and StringVars stood in for, so that no Tk (nor
+        display) is needed. Debounced updates run only on debouncer.flush(); other after()
+        calls are noted in app.scheduled, by function name. """
+    from prepoint.app import ApplicationPrePoint
+    app = ApplicationPrePoint.__new__(ApplicationPrePoint)
+    app.scheduled = set()
+    app.after = lambda milliseconds, function: app.scheduled.add(function.__name__)
+    app.ui_counters = UiCounters()
+    app.field_cache = FieldCache(app.ui_counters)
+    app.debouncer = Debouncer(lambda milliseconds, function: function, lambda after_id: None)
+    app.pointing_session = u.PointingSession()
+    app.refine_session = app.pointing_table = None
+    app.site_is_locked = app.target_is_locked = False
+    app.image_datetime = app.plate_ra_degrees = app.plate_dec_degrees = None
+    for name in ('longitude', 'latitude'):
+        setattr(app, name, _Var(app._site_entry_changed))
+    for name in ('target_ra', 'target_dec', 'occ_time'):
+        setattr(app, name, _Var(app._target_entry_changed))
+    app.mount_az_alt, app.mount_entries_ok = None, True
+    for name in ('plate_ra', 'plate_dec', 'mount_az', 'mount_alt'):
+        setattr(app, name, _Var(app._plate_solution_entry_changed))
+    for name in APP_WIDGETS:
+        setattr(app, name, _Widget())
+    return app
+
+
+def test_app_uses_watched_plate_solution():
+    class Watcher:  # stands in for watch.PlateSolutionWatcher.
+        def poll(self):
+            return [u.parse_sharpcap_platesolution_text(SHARPCAP_TEXT)]
+
+    app = _app_without_tk()
+    app.clipboard_poll_milliseconds = 100
+    app.plate_solution_watcher = Watcher()
+
+    app._watch_plate_solutions()
+    assert '_watch_plate_solutions' in app.scheduled
+    assert (app.plate_ra.get(), app.plate_dec.get()) == ('12:30:00.0', '+23:00:00')
+    assert (app.plate_ra_degrees, app.plate_dec_degrees) == (187.5, 23.0)
+    assert app.image_datetime == datetime(2018, 9, 1, 3, 58, 12, tzinfo=timezone.utc)
+    assert app.sharpcap_time_value['text'] == '2018-09-01 03:58:12  UTC'
+    app._update_plate_solution_area()  # as after a later keystroke.
+    assert app.plate_ra_ok_label['text'] == app.plate_dec_ok_label['text']
+    assert app.plate_ra_degrees == 187.5
+
+    app.site_is_locked = app.target_is_locked = True  # moves labels, each written once:
+    app.refine_session = RefineSession((-105.5, 35.1), (188.7, 23.75), app.image_datetime)
+    app._calc_and_display_moves()
+    writes = app.ui_counters.label_writes
+    app._calc_and_display_moves()
+    assert app.ui_counters.label_writes == writes and app.ui_counters.label_writes_skipped >= 6
+    assert app.left_right_label['text'] == compute_moves(
+        (-105.5, 35.1), (188.7, 23.75), app.image_datetime, 187.5, 23.0,
+        app.image_datetime).left_right
+
+    from prepoint.app import CHECK_MARK
+    app.mount_az.set('95')  # mount's own az/alt, as read, entered for this image:
+    app.debouncer.flush()
+    assert app.mount_az_ok_label['text'] == CHECK_MARK and app.mount_alt_ok_label['text'] == ''
+    assert app.button_calc_moves.states == ['disabled']  # needs both, or neither.
+    app.mount_alt.set('40')
+    app._calc_and_display_moves()
+    assert len(app.refine_session) == 1 and app.refine_session._mount_az_alt == [(95.0, 40.0)]
+    app._watch_plate_solutions()  # a new image: readings were for the last one.
+    assert (app.mount_az.get(), app.mount_alt.get(), app.mount_az_alt) == ('', '', None)
+
+
+def test_app_lock_and_calc_with_text_typed_since_checked():
+    app = _app_without_tk()
+    app.longitude.set('-105:30:00')
+    app.latitude.set('35:06:00')
+    app.debouncer.flush()
+    assert app.button_site_lock.states == ['!disabled']
+    app.longitude.set('-105:30:00x')  # then Lock, before the debounced update runs:
+    app.site_lock_pressed()
+    assert not app.site_is_locked and app.button_site_lock.states == ['disabled']
+    app.longitude.set('-105:30:00')
+    app.site_lock_pressed()
+    assert app.site_is_locked and app.locked_longitude_degrees == -105.5
+
+    app.target_ra.set('12:34:48')
+    app.target_dec.set('+23:45:00')
+    app.occ_time.set('04:30:00')
+    app.debouncer.flush()
+    assert app.button_target_lock.states == ['!disabled']
+    app.target_dec.set('+23:45:00x')
+    app._target_lock_pressed()
+    assert not app.target_is_locked and app.button_target_lock.states == ['disabled']
+    assert 'occ_time' not in app.field_cache._fields  # its next such time is parsed fresh.
+
+    app.target_is_locked = True  # (as if locked, without a pointing table.)
+    app.refine_session = RefineSession((-105.5, 35.1), (188.7, 23.75),
+                                       datetime(2018, 9, 1, 4, 30, tzinfo=timezone.utc))
+    app.image_datetime = datetime(2018, 9, 1, 3, 58, 12, tzinfo=timezone.utc)
+    app.plate_ra.set('12:30:00')
+    app.plate_dec.set('+23:00:00')
+    app.debouncer.flush()
+    app.plate_ra.set('12:30:00x')  # then Calc, before the debounced update runs:
+    app._calc_and_display_moves()
+    assert app.plate_ra_degrees is None and len(app.refine_session) == 0
+    assert app.left_right_label['text'] == app.up_down_label['text'] != ''
+    assert app.button_calc_moves.states == ['disabled']
+
+
+def test_live_readout():
+    occ_time = datetime(2018, 9, 1, 4, 30, 0, tzinfo=timezone.utc)
+    table = PointingTable(-105.5, 35.1, 188.7, 23.75, occ_time - timedelta(minutes=10), occ_time)
+    assert live_readout(None, occ_time) == (None, None)
+    now = occ_time - timedelta(minutes=5, seconds=0.25)
+    seconds_to_occ, (az, alt) = live_readout(table, now)
+    assert seconds_to_occ == 300.25
+    az_direct, alt_direct = u.calc_az_alt(-105.5, 35.1, 188.7, 23.75, now)
+    assert _angular_separation(az, alt, az_direct, alt_direct) < STATED_ACCURACY
+    assert live_readout(table, occ_time + timedelta(seconds=1)) == (-1.0, None)
+    assert countdown_text(300.25) == 'T-00:05:01'
+    assert countdown_text(3 * 3600 + 0.5) == 'T-03:00:01'
+    assert countdown_text(1.0) == 'T-00:00:01'
+    assert countdown_text(0.0) == 'T+00:00:00'
+    assert countdown_text(-61.5) == 'T+00:01:01'